@@ -0,0 +1,148 @@
+# scripts/af_cache.py
+# -*- coding: utf-8 -*-
+"""
+cache ของ response API-Football บนดิสก์ (SQLite) — ใช้โดย af_client.get_json
+
+- key = base URL + endpoint + params ที่เรียงแล้ว (ไม่รวม API key)
+  base URL แยก vendor (apisports/rapidapi) และ stand-in (AF_BASE_URL) ออกจาก production
+- TTL ต่อ endpoint (วินาที; FOREVER = ไม่หมดอายุ):
+    fixtures             : ถ้าทุกแมตช์ใน response จบแล้ว → FOREVER, ไม่งั้น AF_CACHE_TTL_FIXTURES
+    fixtures/statistics  : AF_CACHE_TTL_STATS (ผู้เรียกส่ง ttl=FOREVER ได้เมื่อ stats นิ่งแล้ว — ดู af_results.stats_ttl)
+    odds                 : AF_CACHE_TTL_ODDS
+    อื่น ๆ               : AF_CACHE_TTL_DEFAULT
+- ไม่ cache response ที่มี errors (เช่น rate limit/plan) หรือ ttl <= 0
+- ขนาดรวมเกิน AF_CACHE_MAX_MB → ลบแถวที่ใช้ล่าสุดนานที่สุดก่อน (LRU) จนเหลือ ~90%
+
+Env:
+  AF_CACHE=1|0 (default 1)   AF_CACHE_PATH (default API-Football-auto/cache/af_http.sqlite)
+  AF_CACHE_MAX_MB (default 200)
+  AF_CACHE_TTL_FIXTURES (300)  AF_CACHE_TTL_STATS (3600)  AF_CACHE_TTL_ODDS (600)  AF_CACHE_TTL_DEFAULT (3600)
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+
+AF_CACHE = os.getenv("AF_CACHE", "1").lower() not in ("0", "false", "no")
+AF_CACHE_PATH = os.getenv(
+    "AF_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent / "cache" / "af_http.sqlite"),
+)
+AF_CACHE_MAX_MB = float(os.getenv("AF_CACHE_MAX_MB", "200"))
+
+FOREVER = -1
+TTL = {
+    "fixtures":            int(os.getenv("AF_CACHE_TTL_FIXTURES", "300")),
+    "fixtures/statistics": int(os.getenv("AF_CACHE_TTL_STATS", "3600")),
+    "odds":                int(os.getenv("AF_CACHE_TTL_ODDS", "600")),
+}
+TTL_DEFAULT = int(os.getenv("AF_CACHE_TTL_DEFAULT", "3600"))
+
+# สถานะ (fixture.status.short) ที่ผลไม่เปลี่ยนแล้ว
+FINAL_STATUS = {"FT", "AET", "PEN", "AWD", "WO", "CANC", "ABD"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    endpoint   TEXT NOT NULL,
+    expires_at REAL,
+    used_at    REAL NOT NULL,
+    size       INTEGER NOT NULL,
+    body       BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses(used_at);
+"""
+# 1 = key มี base URL; cache ที่เก่ากว่านี้ไม่รู้ว่ามาจาก vendor/stand-in ไหน → ล้างทิ้ง
+SCHEMA_VERSION = 1
+
+def make_key(base: str, path: str, params) -> str:
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return f"{base.rstrip('/')}/{path.strip('/')}?" + "&".join(f"{k}={v}" for k, v in items)
+
+def ttl_for(path: str, body: dict) -> int:
+    path = path.strip("/")
+    if path == "fixtures":
+        resp = body.get("response") or []
+        if resp and all(((x.get("fixture") or {}).get("status") or {}).get("short") in FINAL_STATUS for x in resp):
+            return FOREVER
+    return TTL.get(path, TTL_DEFAULT)
+
+class ResponseCache:
+    def __init__(self, path: str = AF_CACHE_PATH, max_mb: float = AF_CACHE_MAX_MB):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with self.conn:
+                self.conn.execute("DELETE FROM responses")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._lock = threading.Lock()
+
+    def get(self, base: str, path: str, params):
+        key = make_key(base, path, params)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT expires_at, body FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            expires_at, blob = row
+            if expires_at is not None and expires_at < now:
+                return None
+            self.conn.execute("UPDATE responses SET used_at=? WHERE key=?", (now, key))
+            self.conn.commit()
+        return json.loads(zlib.decompress(blob))
+
+    def put(self, base: str, path: str, params, body: dict, ttl=None):
+        if body.get("errors"):
+            return
+        ttl = ttl_for(path, body) if ttl is None else ttl
+        if ttl == FOREVER and not body.get("response"):
+            ttl = TTL.get(path.strip("/"), TTL_DEFAULT)  # ข้อมูลยังไม่มา (เช่น stats หลังจบเกมไม่นาน) อย่าจำถาวร
+        if ttl != FOREVER and ttl <= 0:
+            return
+        now = time.time()
+        expires_at = None if ttl == FOREVER else now + ttl
+        blob = zlib.compress(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        key = make_key(base, path, params)
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key=?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses(key, endpoint, expires_at, used_at, size, body) VALUES (?,?,?,?,?,?)",
+                (key, path.strip("/"), expires_at, now, len(blob), blob),
+            )
+            self.total += len(blob) - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now: float):
+        """ลบตัวหมดอายุก่อน แล้ว LRU จนเหลือ 90% ของเพดาน"""
+        self.conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > target:
+            drop, freed = [], 0
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+                if total - freed <= target:
+                    break
+                drop.append((key,))
+                freed += size
+            self.conn.executemany("DELETE FROM responses WHERE key=?", drop)
+            total -= freed
+        self.total = total
+
+def open_default():
+    """คืน ResponseCache ตาม ENV หรือ None ถ้าปิดไว้/เปิดไฟล์ไม่ได้"""
+    if not AF_CACHE:
+        return None
+    try:
+        return ResponseCache()
+    except sqlite3.Error as e:
+        print(f"⚠️ เปิด response cache ไม่ได้ ({AF_CACHE_PATH}): {e} — ยิง API ตรง")
+        return None
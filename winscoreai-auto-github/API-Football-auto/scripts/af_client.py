@@ -0,0 +1,227 @@
+# scripts/af_client.py
+# -*- coding: utf-8 -*-
+"""
+HTTP client กลางสำหรับ API-Football (ใช้ร่วมกันทุกสคริปต์ใน scripts/)
+
+- requests.Session เดียว (keep-alive + connection pool)
+- token bucket จำกัดอัตรา request ตาม header ของ API:
+    X-RateLimit-Limit / X-RateLimit-Remaining              (ต่อนาที)
+    x-ratelimit-requests-limit / x-ratelimit-requests-remaining (ต่อวัน)
+  ก่อนเห็น header: ใช้ AF_RATE_PER_MIN ถ้าตั้งไว้ ไม่งั้นไม่จำกัด — แล้วปรับตาม header
+  ของ response แรกเป็นต้นไป (อัตราที่ใช้จริงพิมพ์ออก log ทุกครั้งที่เปลี่ยน)
+- โหลด API-Football-auto/.env เองก่อนอ่าน AF_* (สคริปต์ที่ import โมดูลนี้ก่อน load_dotenv ก็ได้ค่าจาก .env)
+- retry แบบ exponential backoff + jitter เมื่อเจอ 429/5xx/network error (เคารพ Retry-After)
+- response cache บนดิสก์ (af_cache) — hit แล้วไม่ยิง API/ไม่กิน rate limit
+
+Env:
+  API_FOOTBALL_KEY, API_FOOTBALL_VENDOR=apisports|rapidapi
+  AF_BASE_URL          ชี้ไป stand-in ในเครื่องได้
+  AF_RATE_PER_MIN      อัตราเริ่มต้นก่อนเห็น header (default ไม่ตั้ง = ไม่จำกัดจนกว่าจะเห็น X-RateLimit-Limit)
+  AF_BURST             จำนวน request ที่ยิงติดกันได้สูงสุด (default 5)
+  AF_HTTP_RETRIES      (default 5)   AF_HTTP_BASE_SLEEP (default 1.0)   AF_HTTP_MAX_SLEEP (default 30)
+  AF_POOL_SIZE         ขนาด connection pool (default 16)
+  AF_CACHE, AF_CACHE_PATH, AF_CACHE_MAX_MB, AF_CACHE_TTL_*  ดู af_cache.py
+"""
+
+import os
+import time
+import random
+import threading
+from pathlib import Path
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # .env อยู่ที่โฟลเดอร์ API-Football-auto/ — โหลดก่อนอ่าน AF_* ด้านล่างและใน af_cache
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+except Exception:
+    pass
+
+import af_cache
+
+AF_RATE_PER_MIN    = float(os.getenv("AF_RATE_PER_MIN") or 0) or None
+AF_BURST           = float(os.getenv("AF_BURST", "5"))
+AF_HTTP_RETRIES    = int(os.getenv("AF_HTTP_RETRIES", "5"))
+AF_HTTP_BASE_SLEEP = float(os.getenv("AF_HTTP_BASE_SLEEP", "1.0"))
+AF_HTTP_MAX_SLEEP  = float(os.getenv("AF_HTTP_MAX_SLEEP", "30"))
+AF_POOL_SIZE       = int(os.getenv("AF_POOL_SIZE", "16"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def _hdr_int(headers, name):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """
+    token bucket แบบ thread-safe; rate/ความจุปรับตาม header rate-limit ของ API
+    per_min=None → ไม่จำกัดอัตราจนกว่า observe() จะได้ limit จาก header
+    """
+    def __init__(self, per_min: float | None, burst: float):
+        self.rate = max(per_min, 0.1) / 60.0 if per_min else None
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_s = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def per_min(self) -> float | None:
+        return self.rate * 60.0 if self.rate else None
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate is None:
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self.rate is None:
+                    return
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+                self.waited_s += wait
+            time.sleep(wait)
+
+    def observe(self, limit_per_min, remaining) -> bool:
+        """ปรับตาม header; คืน True ถ้าอัตราเปลี่ยน"""
+        with self._lock:
+            self._refill()
+            changed = bool(limit_per_min) and self.per_min != float(limit_per_min)
+            if limit_per_min:
+                self.rate = limit_per_min / 60.0
+                self.capacity = max(1.0, min(float(limit_per_min), AF_BURST))
+            if remaining is not None:
+                # server บอกว่าเหลือน้อยกว่าที่เราคิด → เชื่อ server
+                self.tokens = min(self.tokens, float(remaining))
+            return changed
+
+    def drain(self):
+        with self._lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+class AFClient:
+    def __init__(self, api_key=None, vendor=None, base_url=None, cache="default"):
+        self.api_key = api_key if api_key is not None else os.getenv("API_FOOTBALL_KEY")
+        self.vendor = vendor or os.getenv("API_FOOTBALL_VENDOR", "apisports")
+        if self.vendor == "rapidapi":
+            default_base = "https://api-football-v1.p.rapidapi.com/v3"
+            self.headers = {"X-RapidAPI-Key": self.api_key or "", "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"}
+        else:
+            default_base = "https://v3.football.api-sports.io"
+            self.headers = {"x-apisports-key": self.api_key or ""}
+        self.base = (base_url or os.getenv("AF_BASE_URL") or default_base).rstrip("/")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=AF_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+        self.bucket = TokenBucket(AF_RATE_PER_MIN, AF_BURST)
+        self.cache = af_cache.open_default() if cache == "default" else cache
+        self.counts = Counter()     # request ต่อ endpoint (รวม retry)
+        self.cache_hits = 0
+        self.retries = 0
+        self.daily_remaining = None
+        self._lock = threading.Lock()
+        self._warned_daily = False
+
+    def _observe(self, r: requests.Response):
+        h = r.headers
+        limit = _hdr_int(h, "X-RateLimit-Limit")
+        if self.bucket.observe(limit, _hdr_int(h, "X-RateLimit-Remaining")):
+            print(f"ℹ️ API-Football rate limit: {limit}/min (X-RateLimit-Limit)")
+        daily = _hdr_int(h, "x-ratelimit-requests-remaining")
+        if daily is not None:
+            with self._lock:
+                self.daily_remaining = daily
+            if daily <= 0 and not self._warned_daily:
+                self._warned_daily = True
+                print("⚠️ API-Football: โควต้ารายวันหมดแล้ว (x-ratelimit-requests-remaining=0)")
+
+    def _backoff(self, attempt: int, r: requests.Response | None):
+        sleep = min(AF_HTTP_MAX_SLEEP, AF_HTTP_BASE_SLEEP * (2 ** (attempt - 1))) + random.random() * 0.5
+        retry_after = _hdr_int(r.headers, "Retry-After") if r is not None else None
+        if retry_after:
+            sleep = max(sleep, min(float(retry_after), AF_HTTP_MAX_SLEEP))
+        time.sleep(sleep)
+
+    def get_json(self, path: str, params=None, what: str = "", timeout: float = 30, ttl=None) -> dict:
+        """
+        GET {base}/{path} → JSON ทั้งก้อน; retry เมื่อ 429/5xx/network error
+        ttl: อายุ cache (วินาที / af_cache.FOREVER); None = ตาม endpoint
+        """
+        if self.cache is not None:
+            hit = self.cache.get(self.base, path, params)
+            if hit is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                return hit
+        url = f"{self.base}/{path.lstrip('/')}"
+        last = None
+        for attempt in range(1, AF_HTTP_RETRIES + 1):
+            self.bucket.acquire()
+            with self._lock:
+                self.counts[path] += 1
+                if attempt > 1:
+                    self.retries += 1
+            r = None
+            try:
+                r = self.session.get(url, params=params or {}, timeout=timeout)
+                self._observe(r)
+                if r.status_code == 200:
+                    j = r.json()
+                    if self.cache is not None:
+                        self.cache.put(self.base, path, params, j, ttl=ttl)
+                    return j
+                last = f"HTTP {r.status_code}"
+                if r.status_code == 429:
+                    self.bucket.drain()
+                elif r.status_code not in RETRY_STATUS:
+                    break
+            except (requests.RequestException, ValueError) as e:
+                last = str(e)
+            if attempt < AF_HTTP_RETRIES:
+                self._backoff(attempt, r)
+        raise RuntimeError(f"GET {what or path} failed after retries ({last})")
+
+    def get(self, path: str, params=None, what: str = "", ttl=None):
+        """คืน (response, errors, results) แบบที่สคริปต์เดิมใช้"""
+        j = self.get_json(path, params, what=what, ttl=ttl)
+        return j.get("response", []), j.get("errors", {}), j.get("results", 0)
+
+    def stats_line(self) -> str:
+        per = " ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        daily = f", daily_remaining={self.daily_remaining}" if self.daily_remaining is not None else ""
+        rate = f"{self.bucket.per_min:g}/min" if self.bucket.per_min else "ไม่จำกัด"
+        return (f"📡 API requests: {per or '0'} | cache hits={self.cache_hits} | retries={self.retries} "
+                f"| rate {rate}, throttled {self.bucket.waited_s:.1f}s{daily}")
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> AFClient:
+    """client เดียวต่อ process (สร้างตอนเรียกครั้งแรก หลังสคริปต์โหลด .env แล้ว)"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = AFClient()
+            if AF_RATE_PER_MIN:
+                print(f"ℹ️ API-Football rate เริ่มต้น: {AF_RATE_PER_MIN:g}/min (AF_RATE_PER_MIN) จนกว่าจะเห็น header")
+            else:
+                print("ℹ️ API-Football rate: ไม่จำกัด จนกว่าจะเห็น X-RateLimit-Limit")
+        return _CLIENT
@@ -13,42 +13,36 @@ Args:
   --allow PATH       allowlist leagues (default allowlist_ALL.txt)
   --outdir DIR       output dir (default results)
   --no-xg            skip xG fetching
+  --workers N        จำนวน request พร้อมกัน (fixtures ต่อวัน + stats ต่อแมตช์; default AF_RESULTS_WORKERS=8)
+  --checkpoint [PATH] backfill แบบต่อจากที่ค้างได้: เขียนผลทีละวันลง JSONL (append-only)
+                     รันซ้ำด้วยคำสั่งเดิมจะข้ามวัน/แมตช์ที่เสร็จแล้ว แล้วประกอบ JSON สุดท้ายจาก checkpoint
 Env:
   API_FOOTBALL_KEY
   API_FOOTBALL_VENDOR=apisports|rapidapi  (default apisports)
+  AF_RESULTS_WORKERS  (default 8) — อัตรารวมยังถูกคุมด้วย rate limit ของ af_client
+  AF_STATS_SETTLE_H   (default 6) — stats ของแมตช์ที่ kickoff ผ่านไปเกินกี่ชั่วโมงถึงจะ cache ถาวร
+                      (ก่อนหน้านั้นใช้ AF_CACHE_TTL_STATS เพราะ API ยังเติม stats หลังจบเกมได้)
 """
 
-import os, re, json, time, argparse
+import os, re, json, argparse
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import requests
+import af_client
+import af_cache
 
 load_dotenv()
 API_KEY = os.getenv("API_FOOTBALL_KEY")
 VENDOR = os.getenv("API_FOOTBALL_VENDOR", "apisports")
-
-if VENDOR == "rapidapi":
-    BASE = "https://api-football-v1.p.rapidapi.com/v3"
-    HEAD = {"X-RapidAPI-Key": API_KEY, "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"}
-else:
-    BASE = "https://v3.football.api-sports.io"
-    HEAD = {"x-apisports-key": API_KEY}
+AF_RESULTS_WORKERS = int(os.getenv("AF_RESULTS_WORKERS", "8"))
+AF_STATS_SETTLE_H = float(os.getenv("AF_STATS_SETTLE_H", "6"))
 
 KEEP_STATUS = {"Match Finished", "After Pen." , "After ET"}  # ครอบคลุม FT หลายแบบ
 
-def req_get(path, params, what="", retry=3, wait=1.0):
-    url = f"{BASE}/{path}"
-    for i in range(retry):
-        try:
-            r = requests.get(url, headers=HEAD, params=params, timeout=30)
-            if r.status_code == 200:
-                j = r.json()
-                return j.get("response", []), j.get("errors", {}), j.get("results", 0)
-        except requests.RequestException:
-            pass
-        time.sleep(wait)
-    raise RuntimeError(f"GET {what or path} failed")
+def req_get(path, params, what="", ttl=None):
+    # session/rate limit/retry/cache อยู่ใน af_client
+    return af_client.get_client().get(path, params, what=what, ttl=ttl)
 
 def read_allow(path):
     s=set()
@@ -133,13 +127,24 @@ def estimate_xg_from_stats(team_stat_obj):
     xg_est = base + sog_bonus + add_big + add_pen
     return round(float(xg_est), 3)
 
-def fetch_xg_or_estimate(fixture_id):
+def stats_ttl(kickoff_ts, now=None):
+    """
+    TTL ของ /fixtures/statistics: แมตช์จบแล้วแต่ stats ที่ได้ช่วงแรกหลัง FT อาจยังไม่ครบ
+    → cache ถาวรเฉพาะเมื่อ kickoff ผ่านไปเกิน AF_STATS_SETTLE_H, ไม่งั้นใช้ TTL ปกติของ endpoint (None)
+    """
+    if not isinstance(kickoff_ts, (int, float)):
+        return None
+    now = datetime.now(timezone.utc).timestamp() if now is None else now
+    return af_cache.FOREVER if now - kickoff_ts >= AF_STATS_SETTLE_H * 3600 else None
+
+def fetch_xg_or_estimate(fixture_id, kickoff_ts=None):
     """
     พยายามอ่าน xG จริงจาก /fixtures/statistics
     ถ้าไม่มี ให้คำนวณประมาณ xG_est เองต่อทีม (home, away)
     """
     try:
-        stats, _, _ = req_get("fixtures/statistics", {"fixture": fixture_id}, what=f"xg {fixture_id}")
+        stats, _, _ = req_get("fixtures/statistics", {"fixture": fixture_id}, what=f"xg {fixture_id}",
+                              ttl=stats_ttl(kickoff_ts))
         # พยายามอ่าน xG จริงก่อน
         def read_true_xg(obj):
             for v in (obj.get("statistics") or []):
@@ -208,6 +213,139 @@ def fetch_xg(fixture_id):
     except Exception:
         return None, None
 
+def list_day(ds):
+    fx, _, _ = req_get("fixtures", {"date": ds}, what=f"fixtures?date={ds}")
+    return fx
+
+def pick_finished(ds, fx, lids, skip_fids=()):
+    out = []
+    for x in fx:
+        lgid = int(x.get("league",{}).get("id",-1))
+        if lgid not in lids:
+            continue
+        if status_long(x) not in KEEP_STATUS:
+            continue
+        if int(x.get("fixture",{}).get("id")) in skip_fids:
+            continue
+        out.append((ds, lgid, x))
+    return out
+
+def build_rec(ds, lgid, x, xgH, xgA):
+    fid = int(x.get("fixture",{}).get("id"))
+    season=int(x.get("league",{}).get("season") or 0)
+    home_id = int(x.get("teams",{}).get("home",{}).get("id") or 0)
+    away_id = int(x.get("teams",{}).get("away",{}).get("id") or 0)
+    htH, htA = goals_ht(x)
+    ftH, ftA = goals_ft(x)
+    winner = winner_code(x)
+
+    return {
+        "date": ds,
+        "season": season,
+        "league_id": lgid,
+        "fixture_id": fid,
+        "kickoff_ts": x.get("fixture", {}).get("timestamp"),  # ← เพิ่มบรรทัดนี้
+        "status": {
+            "short": x.get("fixture",{}).get("status",{}).get("short"),
+            "long" : x.get("fixture",{}).get("status",{}).get("long"),
+        },
+        "teams": {
+            "home": {"id": home_id, "name": x.get("teams",{}).get("home",{}).get("name")},
+            "away": {"id": away_id, "name": x.get("teams",{}).get("away",{}).get("name")},
+        },
+        "score": {
+            "ht": {"home": htH, "away": htA},
+            "ft": {"home": ftH, "away": ftA},
+            "winner": winner,
+        },
+        "xg": {"home": xgH, "away": xgA},
+    }
+
+def iter_recs(ex, picked, no_xg):
+    """stats/xG ต่อแมตช์พร้อมกัน; yield rec ตามลำดับ picked"""
+    if no_xg:
+        xgs = ((None, None) for _ in picked)
+    else:
+        xgs = ex.map(fetch_xg_or_estimate,
+                     [int(x.get("fixture",{}).get("id")) for _, _, x in picked],
+                     [x.get("fixture",{}).get("timestamp") for _, _, x in picked])
+    for (ds, lgid, x), (xgH, xgA) in zip(picked, xgs):
+        yield build_rec(ds, lgid, x, xgH, xgA)
+
+# ---------- checkpoint (โหมด backfill ต่อจากที่ค้างได้) ----------
+# JSONL append-only:
+#   {"header": {...}}               บรรทัดแรก: ช่วงวัน/ลีก/xg ที่ checkpoint นี้ใช้
+#   {"rec": {...}}                  ผลต่อแมตช์ (เขียนทันทีที่เสร็จ เรียงตามวัน/ลำดับ API)
+#   {"day_done": "YYYY-MM-DD"}      วันนั้นครบแล้ว
+def read_checkpoint(path: Path):
+    """คืน (header, done_days, done_fids) และตัดบรรทัดท้ายที่เขียนไม่จบ (crash กลางบรรทัด) ทิ้ง"""
+    header, done_days, done_fids = None, set(), set()
+    if not path.exists():
+        return header, done_days, done_fids
+    good = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                break
+            good += len(line)
+            if "header" in obj:
+                header = obj["header"]
+            elif "rec" in obj:
+                done_fids.add(int(obj["rec"]["fixture_id"]))
+            elif "day_done" in obj:
+                done_days.add(obj["day_done"])
+    if good < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(good)
+    return header, done_days, done_fids
+
+def iter_checkpoint_recs(path: Path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            obj = json.loads(line)
+            if "rec" in obj:
+                yield obj["rec"]
+
+def run_checkpointed(ex, ckpt: Path, days, lids, no_xg, workers):
+    header = {"days": [days[0], days[-1]], "leagues": sorted(lids), "xg": (not no_xg)}
+    old, done_days, done_fids = read_checkpoint(ckpt)
+    if old is not None and old != header:
+        raise SystemExit(f"checkpoint {ckpt} เป็นของช่วงวัน/ลีก/xg อื่น — ลบไฟล์หรือใช้ --checkpoint PATH อื่น")
+    todo = [d for d in days if d not in done_days]
+    if done_days or done_fids:
+        print(f"↩️ ต่อจาก checkpoint: วันที่เสร็จแล้ว {len(done_days)}/{len(days)} | fixtures {len(done_fids)}")
+    with open(ckpt, "a", encoding="utf-8") as w:
+        if old is None:
+            w.write(json.dumps({"header": header}) + "\n")
+        # listings ทีละชุด (ขนาด workers) พร้อมกัน แต่เขียนตามลำดับวัน
+        for i in range(0, len(todo), workers):
+            batch = todo[i:i + workers]
+            for ds, fx in zip(batch, ex.map(list_day, batch)):
+                n = 0
+                for rec in iter_recs(ex, pick_finished(ds, fx, lids, done_fids), no_xg):
+                    w.write(json.dumps({"rec": rec}, ensure_ascii=False) + "\n")
+                    n += 1
+                w.write(json.dumps({"day_done": ds}) + "\n")
+                w.flush()
+                print(f"• {ds} +{n} fixtures")
+
+def write_results_json(jpath: Path, recs, meta: dict) -> int:
+    """เขียนแบบ stream (ผลเหมือน json.dump ทั้งก้อน) ไม่ต้องถือทุก rec ไว้ในหน่วยความจำ"""
+    n = 0
+    with open(jpath,"w",encoding="utf-8") as w:
+        w.write('{"fixtures": [')
+        for rec in recs:
+            if n:
+                w.write(", ")
+            w.write(json.dumps(rec, ensure_ascii=False))
+            n += 1
+        w.write('], "meta": ' + json.dumps(meta, ensure_ascii=False) + "}")
+    return n
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--from", dest="date_from", help="YYYY-MM-DD UTC")
@@ -216,6 +354,9 @@ def main():
     ap.add_argument("--allow", default="allowlist_ALL.txt")
     ap.add_argument("--outdir", default="results")
     ap.add_argument("--no-xg", action="store_true")
+    ap.add_argument("--workers", type=int, default=AF_RESULTS_WORKERS)
+    ap.add_argument("--checkpoint", nargs="?", const="auto", default=None,
+                    help="backfill ต่อจากที่ค้างได้ (JSONL; default <outdir>/results_full_<from>_<to>.checkpoint.jsonl)")
     args = ap.parse_args()
 
     outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
@@ -232,66 +373,36 @@ def main():
 
     print(f"ดึงผลแข่งจบแล้ว: {start}..{end} | leagues={len(lids)} | vendor={VENDOR}")
 
-    all_recs=[]
-    # fetch per-day (เร็วและง่าย)
-    day = start
-    while day <= end:
-        ds = day.strftime("%Y-%m-%d")
-        fx,_,_ = req_get("fixtures", {"date": ds}, what=f"fixtures?date={ds}")
-        for x in fx:
-            lgid = int(x.get("league",{}).get("id",-1))
-            if lgid not in lids: 
-                continue
-            if status_long(x) not in KEEP_STATUS:
-                continue
-            fid = int(x.get("fixture",{}).get("id"))
-            season=int(x.get("league",{}).get("season") or 0)
-            home_id = int(x.get("teams",{}).get("home",{}).get("id") or 0)
-            away_id = int(x.get("teams",{}).get("away",{}).get("id") or 0)
-            htH, htA = goals_ht(x)
-            ftH, ftA = goals_ft(x)
-            winner = winner_code(x)
-            xgH, xgA = (None, None)
-            if not args.no_xg:
-                xgH, xgA = fetch_xg_or_estimate(fid)
-
-
-            rec = {
-                "date": ds,
-                "season": season,
-                "league_id": lgid,
-                "fixture_id": fid,
-                "kickoff_ts": x.get("fixture", {}).get("timestamp"),  # ← เพิ่มบรรทัดนี้
-                "status": {
-                    "short": x.get("fixture",{}).get("status",{}).get("short"),
-                    "long" : x.get("fixture",{}).get("status",{}).get("long"),
-                },
-                "teams": {
-                    "home": {"id": home_id, "name": x.get("teams",{}).get("home",{}).get("name")},
-                    "away": {"id": away_id, "name": x.get("teams",{}).get("away",{}).get("name")},
-                },
-                "score": {
-                    "ht": {"home": htH, "away": htA},
-                    "ft": {"home": ftH, "away": ftA},
-                    "winner": winner,
-                },
-                "xg": {"home": xgH, "away": xgA},
-            }
-            all_recs.append(rec)
-        day += timedelta(days=1)
-
     start_s = start.strftime("%Y%m%d")
     end_s   = end.strftime("%Y%m%d")
     jpath = outdir / f"results_full_{start_s}_{end_s}.json"
-    with open(jpath,"w",encoding="utf-8") as w:
-        json.dump({"fixtures": all_recs, "meta":{
-            "date_from": start.strftime("%Y-%m-%d"),
-            "date_to":   end.strftime("%Y-%m-%d"),
-            "vendor": VENDOR,
-            "leagues": len(lids),
-            "xg": (not args.no_xg)
-        }}, w, ensure_ascii=False)
-    print(f"✅ JSON saved: {jpath} | fixtures={len(all_recs)}")
+    meta = {
+        "date_from": start.strftime("%Y-%m-%d"),
+        "date_to":   end.strftime("%Y-%m-%d"),
+        "vendor": VENDOR,
+        "leagues": len(lids),
+        "xg": (not args.no_xg)
+    }
+    workers = max(1, args.workers)
+    days = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+
+    if args.checkpoint:
+        ckpt = Path(args.checkpoint) if args.checkpoint != "auto" else outdir / f"results_full_{start_s}_{end_s}.checkpoint.jsonl"
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            run_checkpointed(ex, ckpt, days, lids, args.no_xg, workers)
+        n = write_results_json(jpath, iter_checkpoint_recs(ckpt), meta)
+        ckpt.unlink()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            # 1) fixtures ของทุกวันพร้อมกัน (ex.map คืนผลเรียงตามวันเหมือนเดิม)
+            picked = []
+            for ds, fx in zip(days, ex.map(list_day, days)):
+                picked.extend(pick_finished(ds, fx, lids))
+            # 2) stats/xG ต่อแมตช์พร้อมกัน (ลำดับผลตรงกับ picked)
+            all_recs = list(iter_recs(ex, picked, args.no_xg))
+        n = write_results_json(jpath, all_recs, meta)
+    print(f"✅ JSON saved: {jpath} | fixtures={n}")
+    print(af_client.get_client().stats_line())
 
 if __name__=="__main__":
     main()
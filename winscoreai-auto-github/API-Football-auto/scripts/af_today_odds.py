@@ -10,6 +10,15 @@ Args:
   --allow PATH          # allowlist file with league_id (integers)
   --bookmaker INT       # if set, restrict to one bookmaker id (e.g., 6 = Bet365). default=ALL
   --outdir DIR          # default=live_odds
+  --odds-mode MODE      # auto|date|league|fixture (default=auto)
+                        #   date   : /odds?date=D (ทุกหน้า) แล้ว join กับ fixtures ในหน่วยความจำ
+                        #   league : /odds?league=L&season=S&date=D ต่อ league ที่มีแมตช์
+                        #   fixture: /odds?fixture=F ทีละแมตช์ (แบบเดิม)
+                        #   auto   : ดูจำนวนหน้าของ date ก่อน แล้วเลือกทางที่ใช้ request น้อยสุด
+                        # fixture ที่ bulk ไม่เจอ odds จะ fallback ไปเรียกทีละ fixture
+  --refresh-state PATH  # เวลาที่ดึง odds ล่าสุดต่อ fixture (default=$ODDS_REFRESH_STATE)
+                        # ดึงเฉพาะแมตช์ที่ถึงรอบตามเวลาก่อน kickoff (ดู odds_refresh.py / ODDS_REFRESH_TIERS)
+  --all                 # ดึงทุกแมตช์ไม่สนรอบ (ยังบันทึกเวลาลง state)
 Notes:
   - Fallback strategy if /fixtures?date=... returns none for some day:
       a) try /fixtures?from=..&to=..&timezone=Asia/Bangkok
@@ -19,7 +28,6 @@ Notes:
 
 import os
 import csv
-import re
 import json
 import time
 import argparse
@@ -27,7 +35,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
 
-import requests
+import af_client
+from odds_markets import extract_markets
+from odds_refresh import RefreshSchedule, ODDS_REFRESH_STATE
 
 # ---------- Config / ENV ----------
 
@@ -38,102 +48,29 @@ VENDOR = os.getenv("API_FOOTBALL_VENDOR", "apisports")
 if not API_KEY:
     raise RuntimeError("Missing API_FOOTBALL_KEY")
 
-if VENDOR == "rapidapi":
-    BASE = "https://api-football-v1.p.rapidapi.com/v3"
-    HEAD = {"X-RapidAPI-Key": API_KEY, "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com"}
-else:
-    BASE = "https://v3.football.api-sports.io"
-    HEAD = {"x-apisports-key": API_KEY}
-
 COMMON_STATUS_KEEP = {"Not Started", "Time to be defined", "Scheduled"}  # ← เพิ่ม Scheduled
 
 # ---------- HTTP helper ----------
-def req_get(path, params, what="", retry=3, wait=1.2):
-    url = f"{BASE}/{path}"
-    for i in range(retry):
-        try:
-            r = requests.get(url, headers=HEAD, params=params, timeout=30)
-            if r.status_code == 200:
-                j = r.json()
-                return j.get("response", []), j.get("errors", {}), j.get("results", 0)
-        except requests.RequestException:
-            pass
-        time.sleep(wait)
-    raise RuntimeError(f"GET {what or path} failed after retries")
+# session/rate limit/retry อยู่ใน af_client (ใช้ร่วมกับสคริปต์อื่น)
+def req_json(path, params, what=""):
+    return af_client.get_client().get_json(path, params, what=what)
+
+def req_get(path, params, what=""):
+    j = req_json(path, params, what=what)
+    return j.get("response", []), j.get("errors", {}), j.get("results", 0)
+
+def req_pages(path, params, what="", first=None, max_pages=200):
+    """ดึงทุกหน้า (paging.current/total) คืน list ของ response รวม; first = json หน้าแรกที่ดึงไว้แล้ว"""
+    j = first or req_json(path, {**params, "page": 1}, what=f"{what} page=1")
+    out = list(j.get("response", []) or [])
+    total = min(int((j.get("paging") or {}).get("total") or 1), max_pages)
+    for page in range(2, total + 1):
+        jp = req_json(path, {**params, "page": page}, what=f"{what} page={page}")
+        out.extend(jp.get("response", []) or [])
+    return out
 
 # ---------- parsing odds ----------
-def parse_1x2(bet):
-    rec = {"home": "", "draw": "", "away": ""}
-    for v in bet.get("values", []):
-        val = (v.get("value") or "").strip().lower()
-        odd = v.get("odd") or ""
-        if val in ("home", "1", "1 (home)"):
-            rec["home"] = odd
-        elif val in ("draw", "x"):
-            rec["draw"] = odd
-        elif val in ("away", "2", "2 (away)"):
-            rec["away"] = odd
-    return rec
-
-def parse_ou(bet):
-    # return mapping line -> {"over": x, "under": y}
-    res = {}
-    for v in bet.get("values", []):
-        val = (v.get("value") or "").strip()
-        odd = v.get("odd") or ""
-        m = re.search(r"([Oo]ver|[Uu]nder)\s*([+-]?\d+(?:\.\d+)?)", val)
-        if not m:
-            m2 = re.search(r"([+-]?\d+(?:\.\d+)?)\s*(Over|Under)", val, flags=re.I)
-            if not m2:
-                continue
-            side = m2.group(2).lower()
-            line = m2.group(1)
-        else:
-            side = m.group(1).lower()
-            line = m.group(2)
-        d = res.setdefault(line, {"over": "", "under": ""})
-        if "over" in side:
-            d["over"] = odd
-        else:
-            d["under"] = odd
-    return res
-
-def parse_hcp(bet):
-    # return mapping line -> {"home": x, "away": y}
-    res = {}
-    for v in bet.get("values", []):
-        val = (v.get("value") or "").strip()
-        odd = v.get("odd") or ""
-        side = "home" if re.search(r"\b(home|^1\b)", val, re.I) else ("away" if re.search(r"\b(away|^2\b)", val, re.I) else None)
-        line = None
-        for tok in re.findall(r"[+-]?\d+(?:\.\d+)?", val.replace(":", " ")):
-            try:
-                float(tok)
-                line = tok
-                break
-            except Exception:
-                pass
-        if side and line is not None:
-            d = res.setdefault(line, {"home": "", "away": ""})
-            d[side] = odd
-    return res
-
-def extract_markets(odds_payload):
-    """Return bookmakers dict: {bm_id: {"1x2":{...}, "ou":{line:{...}}, "hcp":{line:{...}}}}"""
-    books = {}
-    for entry in odds_payload:
-        for bm in entry.get("bookmakers", []):
-            bm_id = bm.get("id")
-            acc = books.setdefault(str(bm_id), {"1x2": {}, "ou": {}, "hcp": {}})
-            for bet in bm.get("bets", []):
-                name = (bet.get("name") or "").lower()
-                if "match winner" in name or name.strip() in ("1x2", "winner", "win/lose", "win-draw-win"):
-                    acc["1x2"] = parse_1x2(bet)
-                elif "over/under" in name or "total goals" in name or "goals over" in name:
-                    acc["ou"] = parse_ou(bet)
-                elif "handicap" in name:
-                    acc["hcp"] = parse_hcp(bet)
-    return books
+# ตัวแปลงตลาด (1X2/OU/HCP) อยู่ใน odds_markets (regex คอมไพล์ครั้งเดียว + ตาราง bet → ตลาด)
 
 # ---------- allowlist ----------
 def read_allowlist(path):
@@ -184,6 +121,54 @@ def fetch_fixtures_for_day(target_date, lids, tz="Asia/Bangkok", per_league_next
                 out.append(x)
     return out
 
+# ---------- bulk odds ----------
+def group_odds_by_fixture(entries):
+    """response ของ /odds (หลาย fixture) → {fixture_id: [entry, ...]}"""
+    out = {}
+    for e in entries or []:
+        fid = (e.get("fixture") or {}).get("id")
+        if fid is not None:
+            out.setdefault(int(fid), []).append(e)
+    return out
+
+def bulk_odds_for_day(ds, fixtures, bookmaker=0, mode="auto"):
+    """
+    odds ของ fixtures ในวัน ds แบบ bulk → {fixture_id: [entry, ...]}
+    fixture ที่ไม่อยู่ในผลลัพธ์ = ช่องว่าง ให้ผู้เรียก fallback ไป /odds?fixture=
+    """
+    if mode == "fixture" or not fixtures:
+        return {}
+    extra = {"bookmaker": bookmaker} if bookmaker else {}
+    wanted = {int(f["fixture"]["id"]) for f in fixtures}
+    by_league = {}
+    for f in fixtures:
+        by_league.setdefault((int(f["league"]["id"]), int(f["league"]["season"])), []).append(f)
+
+    first = None
+    if mode in ("auto", "date"):
+        first = req_json("odds", {"date": ds, "page": 1, **extra}, what=f"odds date={ds} page=1")
+        pages = int((first.get("paging") or {}).get("total") or 1)
+        # date ต้องใช้อีก pages-1 request; league ใช้ ≥1 ต่อ league; ทีละ fixture ใช้ len(wanted)
+        if mode == "auto" and pages - 1 > min(len(by_league), len(wanted)):
+            mode = "league" if len(by_league) < len(wanted) else "fixture"
+            print(f"   odds date={ds}: {pages} หน้า → ใช้โหมด {mode}")
+        else:
+            mode = "date"
+
+    found = group_odds_by_fixture(first.get("response") if first else [])
+    if mode == "date":
+        entries = req_pages("odds", {"date": ds, **extra}, what=f"odds date={ds}", first=first)
+        found = group_odds_by_fixture(entries)
+    elif mode == "league":
+        for (lid, season), fxs in sorted(by_league.items()):
+            if all(int(f["fixture"]["id"]) in found for f in fxs):
+                continue  # ได้ครบจากหน้าแรกของ date แล้ว
+            entries = req_pages("odds", {"league": lid, "season": season, "date": ds, **extra},
+                                what=f"odds league={lid} date={ds}")
+            for fid, es in group_odds_by_fixture(entries).items():
+                found[fid] = es
+    return {fid: es for fid, es in found.items() if fid in wanted}
+
 def status_long(rec):
     return rec.get("fixture", {}).get("status", {}).get("long")
 def keep_before_ko(rec, grace_seconds=900):
@@ -199,6 +184,10 @@ def main():
     ap.add_argument("--allow", default="allowlist_ALL.txt", help="allowlist file (1st col = league_id)")
     ap.add_argument("--bookmaker", type=int, default=0, help="0 or omit = ALL; e.g., 6=Bet365")
     ap.add_argument("--outdir", default="live_odds", help="output folder")
+    ap.add_argument("--odds-mode", default=os.getenv("AF_ODDS_MODE", "auto"),
+                    choices=["auto", "date", "league", "fixture"], help="bulk odds strategy (default=auto)")
+    ap.add_argument("--refresh-state", default=ODDS_REFRESH_STATE, help="per-fixture last-fetch state")
+    ap.add_argument("--all", action="store_true", help="fetch every fixture, ignore refresh schedule")
     args = ap.parse_args()
 
     outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
@@ -210,6 +199,9 @@ def main():
 
     all_fixtures = []   # for JSON
     flat_rows = []      # for CSV
+    sched = RefreshSchedule(args.refresh_state)
+    now = int(time.time())
+    n_not_due = 0
 
     for d in (start + timedelta(days=i) for i in range(args.days)):
         ds = d.strftime("%Y-%m-%d")
@@ -226,18 +218,35 @@ def main():
         print("Raw fixtures fetched:", len(fixtures))
         print("Sample:", fixtures[:3])
 
+        # ดึง odds เฉพาะแมตช์ที่ถึงรอบ (ไกล kickoff = ห่าง, ใกล้ = ทุกรอบ)
+        if not args.all:
+            due = [x for x in fixtures if sched.is_due(int(x["fixture"]["id"]), x["fixture"]["timestamp"], now)]
+            print(f"   refresh: ถึงรอบ {len(due)}/{len(fixtures)} fixtures")
+            n_not_due += len(fixtures) - len(due)
+            fixtures = due
+
+        bulk = bulk_odds_for_day(ds, fixtures, args.bookmaker, args.odds_mode)
+        n_gap = sum(1 for f in fixtures if int(f["fixture"]["id"]) not in bulk)
+        if args.odds_mode != "fixture":
+            print(f"   bulk odds: {len(fixtures) - n_gap}/{len(fixtures)} fixtures, fallback ทีละ fixture {n_gap}")
+
         for f in fixtures:
             fid = int(f["fixture"]["id"])
             lid = int(f["league"]["id"])
             season = int(f["league"]["season"])
             home = f["teams"]["home"]["name"]
             away = f["teams"]["away"]["name"]
-            params = {"fixture": fid}
-            if args.bookmaker:
-                params["bookmaker"] = args.bookmaker
-
-            odds, _, _ = req_get("odds", params, what=f"odds fixture={fid}")
+            if fid in bulk:
+                odds = bulk[fid]
+            else:
+                params = {"fixture": fid}
+                if args.bookmaker:
+                    params["bookmaker"] = args.bookmaker
+                odds, _, _ = req_get("odds", params, what=f"odds fixture={fid}")
             books = extract_markets(odds)
+            # ยังไม่มีเจ้ามือเปิดราคา → ไม่นับว่าดึงแล้ว ให้ถึงรอบอีกครั้งในรอบหน้า
+            if books:
+                sched.mark(fid, f["fixture"]["timestamp"], now)
 
             rec = {
                 "date": ds,
@@ -272,18 +281,18 @@ def main():
                     if v.get("away"):
                         flat_rows.append([season, ds, lid, fid, home, away, "hcp", line, "away", v["away"], bm_id])
 
-            time.sleep(0.2)  # be nice to rate limit
-
     # write JSON
     jpath = outdir / f"odds_full_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.json"
     with open(jpath, "w", encoding="utf-8") as w:
-        json.dump({"fixtures": all_fixtures, "meta": {
+        # meta ก่อน fixtures → ผู้อ่านแบบ stream (odds_history ingest) เห็น meta.bookmaker ตั้งแต่ fixture แรก
+        json.dump({"meta": {
             "date_from": start.strftime("%Y-%m-%d"),
             "date_to": end.strftime("%Y-%m-%d"),
             "vendor": VENDOR,
             "bookmaker": args.bookmaker or "ALL",
             "leagues": len(lids),
-        }}, w, ensure_ascii=False)
+            "refresh": {"fetched": len(all_fixtures), "not_due": n_not_due},
+        }, "fixtures": all_fixtures}, w, ensure_ascii=False)
 
     # write CSV (flat)
     cpath = outdir / f"odds_flat_all_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.csv"
@@ -292,8 +301,11 @@ def main():
         wr.writerow(["season","date","league_id","fixture_id","home","away","market","line","side","odd","bookmaker_id"])
         wr.writerows(flat_rows)
 
-    print(f"✅ JSON: {jpath} | fixtures={len(all_fixtures)}")
+    sched.save(now)
+
+    print(f"✅ JSON: {jpath} | fixtures={len(all_fixtures)} (ยังไม่ถึงรอบ {n_not_due})")
     print(f"✅ CSV : {cpath} | rows={len(flat_rows)}")
+    print(af_client.get_client().stats_line())
     if all_fixtures[:2]:
         print("ตัวอย่าง 1–2 fixtures:")
         for r in all_fixtures[:2]:
@@ -1,7 +1,7 @@
 # common_env.py
 # โหลด ENV/Secrets ให้ใช้ได้ทั้งโลคอลและ CI และรวม helper พื้นฐานที่ใช้ซ้ำ
 import os, json, base64
-import os, requests
+import af_client
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -17,13 +17,9 @@ except Exception:
 API_KEY = os.getenv("API_FOOTBALL_KEY")
 assert API_KEY, "missing API_FOOTBALL_KEY"
 
-BASE_AF = "https://v3.football.api-sports.io"
-HEADERS_AF = {"x-apisports-key": API_KEY}
-
 def af_get(path, params=None, timeout=30):
-    r = requests.get(f"{BASE_AF}/{path}", headers=HEADERS_AF, params=params or {}, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+    # session/rate limit/retry อยู่ใน af_client
+    return af_client.get_client().get_json(path, params, timeout=timeout)
 
 # === Firebase ===
 FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL")  # ต้องตั้งใน Secrets/ENV
@@ -2,6 +2,7 @@
 import os, math, time, random, socket
 from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import firebase_admin
 from firebase_admin import credentials, db, exceptions as fa_ex
@@ -14,6 +15,8 @@ _FB_UPDATE_BASE_SLEEP  = float(os.getenv("FB_UPDATE_BASE_SLEEP", "0.8"))
 _FB_UPDATE_MAX_SLEEP   = float(os.getenv("FB_UPDATE_MAX_SLEEP", "8.0"))
 _FB_UPDATE_CHUNK_SIZE  = int(os.getenv("FB_UPDATE_CHUNK_SIZE", "2000"))
 _FB_UPDATE_JITTER_MAX  = float(os.getenv("FB_UPDATE_JITTER_MAX", "0.5"))
+# จำนวน chunk ที่ส่งพร้อมกัน (1 = ทีละ chunk แบบเดิม)
+_FB_UPDATE_PARALLELISM = max(1, int(os.getenv("FB_UPDATE_PARALLELISM", "1")))
 
 # metrics storage path toggle (None/"" = ปิด)
 _FB_METRICS_PATH       = os.getenv("FB_METRICS_PATH", "")  # e.g. "/_ops/metrics"
@@ -105,6 +108,34 @@ def _update_chunk_with_retry(chunk_items: List[Tuple[str, Any]], chunk_idx: int,
                 }
             _sleep_backoff(attempt_count)
 
+def _dispatch_parallel(items: List[Tuple[str, Any]], cs: int, total_chunks: int,
+                       par: int, cont: bool) -> List[Dict[str, Any]]:
+    """
+    ส่ง chunk ด้วย worker pool ขนาด par (ส่งตามลำดับ index, in-flight ไม่เกิน par)
+    continue_on_error=false: เจอ chunk พังแล้วหยุดส่ง chunk ใหม่ รอเฉพาะตัวที่ส่งไปแล้ว
+    คืน metrics เรียงตาม chunk_index
+    """
+    metrics: List[Dict[str, Any]] = []
+    stop = False
+    next_i = 0
+    with ThreadPoolExecutor(max_workers=par) as ex:
+        inflight = set()
+        while inflight or (next_i < total_chunks and not stop):
+            while not stop and next_i < total_chunks and len(inflight) < par:
+                chunk_items = items[next_i * cs:(next_i + 1) * cs]
+                inflight.add(ex.submit(_update_chunk_with_retry, chunk_items, next_i, total_chunks))
+                next_i += 1
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for f in done:
+                m = f.result()
+                metrics.append(m)
+                if not m["ok"] and not cont and not stop:
+                    stop = True
+                    print("⛔ Stopping due to chunk failure (continue_on_error=false)"
+                          f" — waiting for {len(inflight)} in-flight chunk(s).")
+    metrics.sort(key=lambda m: m["chunk_index"])
+    return metrics
+
 def update_multi(
     updates: Dict[str, Any],
     *,
@@ -112,11 +143,13 @@ def update_multi(
     dry_run: bool = False,
     metrics_path: Optional[str] = None,
     continue_on_error: Optional[bool] = None,
+    parallelism: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Multi-location update ที่ root ("/") พร้อม metrics + retry/backoff ต่อ chunk.
     คืน summary dict: {keys_total, chunks_total, chunks_ok, chunks_fail, duration_s, ...}
     ถ้า metrics_path (หรือ ENV FB_METRICS_PATH) ถูกตั้งค่า จะเขียน metrics เข้า Firebase ด้วย
+    parallelism (หรือ ENV FB_UPDATE_PARALLELISM) > 1 → ส่งหลาย chunk พร้อมกัน (retry แยกต่อ chunk)
     """
     if not updates:
         msg = "ℹ️ update_multi: no updates to write."
@@ -129,6 +162,7 @@ def update_multi(
     cs = chunk_size or _FB_UPDATE_CHUNK_SIZE
     mpath = metrics_path if metrics_path is not None else _FB_METRICS_PATH
     cont = _FB_CONTINUE_ON_ERROR if continue_on_error is None else continue_on_error
+    par = max(1, parallelism or _FB_UPDATE_PARALLELISM)
 
     if dry_run:
         preview = dict(items[:min(10, n)])
@@ -152,16 +186,19 @@ def update_multi(
         chunk_metrics.append(m)
     else:
         total_chunks = math.ceil(n / cs)
-        print(f"🚚 Splitting into {total_chunks} chunks (chunk_size={cs}) — total keys={n}")
-        for i in range(total_chunks):
-            start = i * cs
-            end = min((i + 1) * cs, n)
-            chunk_items = items[start:end]
-            m = _update_chunk_with_retry(chunk_items, i, total_chunks)
-            chunk_metrics.append(m)
-            if not m["ok"] and not cont:
-                print("⛔ Stopping due to chunk failure (continue_on_error=false).")
-                break
+        print(f"🚚 Splitting into {total_chunks} chunks (chunk_size={cs}, parallelism={par}) — total keys={n}")
+        if par > 1:
+            chunk_metrics = _dispatch_parallel(items, cs, total_chunks, par, cont)
+        else:
+            for i in range(total_chunks):
+                start = i * cs
+                end = min((i + 1) * cs, n)
+                chunk_items = items[start:end]
+                m = _update_chunk_with_retry(chunk_items, i, total_chunks)
+                chunk_metrics.append(m)
+                if not m["ok"] and not cont:
+                    print("⛔ Stopping due to chunk failure (continue_on_error=false).")
+                    break
 
     # summary
     dur = time.time() - t0
@@ -171,6 +208,7 @@ def update_multi(
     summary = {
         "keys_total": n,
         "chunk_size": cs,
+        "parallelism": par,
         "chunks_total": len(chunk_metrics),
         "chunks_ok": chunks_ok,
         "chunks_fail": chunks_fail,
@@ -0,0 +1,155 @@
+# scripts/json_stream.py
+# -*- coding: utf-8 -*-
+"""
+อ่าน odds_full_*.json / results_full_*.json ทีละ fixture แบบ stream (ไม่ json.load ทั้งไฟล์)
+
+รองรับ:
+  {"fixtures": [ {...}, ... ], "meta": {...}}   ← รูปแบบที่ af_today_odds / af_results เขียน
+  [ {...}, ... ]                                ← array ล้วน
+  *.jsonl                                       ← 1 fixture ต่อบรรทัด
+
+ใช้ json.JSONDecoder.raw_decode กับ buffer ที่อ่านทีละก้อน → หน่วยความจำ ~ ขนาด fixture ที่ใหญ่สุด
+ไม่ต้องพึ่ง ijson
+
+Usage (CLI สำหรับ workflow):
+  python scripts/json_stream.py count FILE     # จำนวน fixtures
+  python scripts/json_stream.py head FILE [N]  # พิมพ์ N fixtures แรก (default 1)
+"""
+
+import sys
+import json
+
+CHUNK = 1 << 16
+_WS = " \t\r\n"
+
+class _Reader:
+    def __init__(self, f, chunk=None):
+        self.f = f
+        self.chunk = chunk or CHUNK
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.dec = json.JSONDecoder()
+
+    def _fill(self, size=None) -> bool:
+        data = self.f.read(size or self.chunk)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data  # ทิ้งส่วนที่อ่านไปแล้ว
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """ข้าม whitespace แล้วคืนตัวอักษรถัดไป ("" = จบไฟล์)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        c = self.peek()
+        if c != ch:
+            raise ValueError(f"JSON stream: คาดว่าเจอ {ch!r} แต่เจอ {c!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        size = self.chunk
+        while True:
+            try:
+                obj, end = self.dec.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # ค่ายังมาไม่ครบใน buffer → อ่านเพิ่ม (ขยายขนาดเรื่อย ๆ กัน parse ซ้ำหลายรอบ)
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue  # ตัวเลขอาจถูกตัดกลางก้อน → parse ใหม่ให้ชัวร์
+            self.pos = end
+            return obj
+
+    def array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            c = self.peek()
+            self.pos += 1
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError(f"JSON stream: คาดว่าเจอ ',' หรือ ']' แต่เจอ {c!r}")
+
+class FixtureStream:
+    """
+    iterate fixtures ทีละตัว; key อื่นระดับบนสุด (เช่น meta) อยู่ใน .extra หลังวนจบ
+    (ถ้า meta อยู่ก่อน fixtures ในไฟล์ จะมีค่าตั้งแต่ fixture แรก)
+    """
+    def __init__(self, path: str, key: str = "fixtures"):
+        self.path = str(path)
+        self.key = key
+        self.extra = {}
+
+    def __iter__(self):
+        if self.path.endswith(".jsonl"):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            return
+        with open(self.path, encoding="utf-8") as f:
+            r = _Reader(f)
+            c = r.peek()
+            if c == "[":
+                yield from r.array()
+                return
+            r.expect("{")
+            if r.peek() == "}":
+                return
+            while True:
+                k = r.value()
+                r.expect(":")
+                if k == self.key and r.peek() == "[":
+                    yield from r.array()
+                else:
+                    self.extra[k] = r.value()
+                c = r.peek()
+                r.pos += 1
+                if c == "}":
+                    return
+                if c != ",":
+                    raise ValueError(f"JSON stream: คาดว่าเจอ ',' หรือ '}}' แต่เจอ {c!r}")
+
+def iter_batches(items, size: int):
+    """รวม iterator เป็น list ทีละ size ตัว"""
+    batch = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("count", "head"):
+        raise SystemExit("usage: json_stream.py count FILE | head FILE [N]")
+    cmd, path = sys.argv[1], sys.argv[2]
+    if cmd == "count":
+        print(sum(1 for _ in FixtureStream(path)))
+        return
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    for i, fx in enumerate(FixtureStream(path)):
+        if i >= n:
+            break
+        print(json.dumps(fx, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
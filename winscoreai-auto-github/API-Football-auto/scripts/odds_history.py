@@ -0,0 +1,276 @@
+# scripts/odds_history.py
+# -*- coding: utf-8 -*-
+"""
+ประวัติการขยับราคา odds (SQLite, append-only) — ไฟล์ odds_full_* ของแต่ละรอบถูกเขียนทับ
+แต่ที่นี่เก็บเฉพาะ "ราคาที่เปลี่ยน" ไว้ตลอด → ขนาดโตตามจำนวนครั้งที่ราคาขยับ ไม่ใช่จำนวนรอบที่รัน
+
+ตาราง:
+  quotes    1 แถวต่อการเปลี่ยนราคา (fixture, bookmaker, market, line, side, ts, odd)
+            odd = NULL → เจ้ามือถอดราคานั้น (fixture ที่ไม่อยู่ใน snapshot หรือไม่มีราคาเลย ไม่ถือว่าถอด;
+                  snapshot แบบ --bookmaker ถอดได้เฉพาะเจ้านั้น)
+  latest    ราคาล่าสุดต่อ key (ใช้ diff กับ snapshot ถัดไป)
+  fixtures  ฟีเจอร์ต่อแมตช์ที่อัปเดตทีละ snapshot (JSON):
+            open/latest = consensus implied 1×2 (median ข้ามเจ้ามือ) ตอนเปิด/ล่าสุด, drift = latest - open
+            steam       = ครั้งที่หลายเจ้ามือขยับราคาฝั่งเดียวกันพร้อมกัน (ดู STEAM_* ด้านล่าง)
+patch_odds แนบ fixtures.features เป็น odds_features/movement
+
+Usage:
+  python scripts/odds_history.py ingest --json live_odds/odds_full_*.json [--ts EPOCH] [--bookmaker ID]
+  python scripts/odds_history.py show FIXTURE_ID
+Env:
+  ODDS_HISTORY_PATH      (default API-Football-auto/live_odds/odds_history.sqlite)
+  ODDS_HISTORY_TTL_DAYS  ลบแมตช์ที่ kickoff เก่ากว่านี้ (default 14)
+  ODDS_STEAM_MIN_BOOKS   เจ้ามือขั้นต่ำที่ขยับทางเดียวกันใน snapshot เดียว (default 3)
+  ODDS_STEAM_MIN_SHARE   สัดส่วนขั้นต่ำของเจ้ามือที่ให้ราคาฝั่งนั้น (default 0.5)
+  ODDS_STEAM_MIN_MOVE    consensus implied ต้องขยับอย่างน้อยเท่านี้ (default 0.02)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from statistics import median
+
+from json_stream import FixtureStream
+
+ODDS_HISTORY_PATH = os.getenv(
+    "ODDS_HISTORY_PATH",
+    str(Path(__file__).resolve().parent.parent / "live_odds" / "odds_history.sqlite"),
+)
+ODDS_HISTORY_TTL_DAYS = float(os.getenv("ODDS_HISTORY_TTL_DAYS", "14"))
+STEAM_MIN_BOOKS = int(os.getenv("ODDS_STEAM_MIN_BOOKS", "3"))
+STEAM_MIN_SHARE = float(os.getenv("ODDS_STEAM_MIN_SHARE", "0.5"))
+STEAM_MIN_MOVE = float(os.getenv("ODDS_STEAM_MIN_MOVE", "0.02"))
+
+SIDES_1X2 = ("home", "draw", "away")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    fixture_id INTEGER NOT NULL,
+    bookmaker  TEXT NOT NULL,
+    market     TEXT NOT NULL,
+    line       TEXT NOT NULL,
+    side       TEXT NOT NULL,
+    ts         INTEGER NOT NULL,
+    odd        REAL,
+    PRIMARY KEY (fixture_id, bookmaker, market, line, side, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latest (
+    fixture_id INTEGER NOT NULL,
+    bookmaker  TEXT NOT NULL,
+    market     TEXT NOT NULL,
+    line       TEXT NOT NULL,
+    side       TEXT NOT NULL,
+    odd        REAL,
+    ts         INTEGER NOT NULL,
+    PRIMARY KEY (fixture_id, bookmaker, market, line, side)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fixtures (
+    fixture_id INTEGER PRIMARY KEY,
+    league_id  INTEGER,
+    kickoff_ts INTEGER,
+    features   TEXT
+);
+"""
+
+def _odd(x):
+    try:
+        o = float(str(x))
+    except Exception:
+        return None
+    return o if 0 < o < float("inf") else None
+
+def flatten_books(books: dict) -> dict:
+    """bookmakers ของ fixture → {(bookmaker, market, line, side): odd}; 1x2 ใช้ line="" """
+    out = {}
+    for bm, mk in (books or {}).items():
+        for market, body in (mk or {}).items():
+            for k, v in (body or {}).items():
+                if isinstance(v, dict):  # ou/hcp: line → {side: odd}
+                    for side, odd in v.items():
+                        o = _odd(odd)
+                        if o is not None:
+                            out[(str(bm), market, str(k), side)] = o
+                else:                    # 1x2: side → odd
+                    o = _odd(v)
+                    if o is not None:
+                        out[(str(bm), market, "", k)] = o
+    return out
+
+def consensus_1x2(quotes: dict) -> dict:
+    """median implied ต่อฝั่งของ 1×2 ข้ามเจ้ามือ (ฝั่งที่ไม่มีราคา = None)"""
+    imps = {s: [] for s in SIDES_1X2}
+    for (_, market, _, side), odd in quotes.items():
+        if market == "1x2" and side in imps and odd:
+            imps[side].append(1.0 / odd)
+    return {s: (round(median(v), 4) if v else None) for s, v in imps.items()}
+
+def detect_steam(prev: dict, cur: dict, c_prev: dict, c_cur: dict):
+    """
+    ฝั่งที่โดน steam ใน snapshot นี้ → [(side, consensus shift)]
+    ต้องมีเจ้ามือ >= STEAM_MIN_BOOKS และ >= STEAM_MIN_SHARE ของที่ให้ราคา ขยับทางเดียวกับ consensus
+    และ consensus implied ขยับ >= STEAM_MIN_MOVE
+    """
+    out = []
+    for side in SIDES_1X2:
+        a, b = c_prev.get(side), c_cur.get(side)
+        if a is None or b is None or abs(b - a) < STEAM_MIN_MOVE:
+            continue
+        quoting, same_dir = 0, 0
+        for key, odd in cur.items():
+            if key[1] != "1x2" or key[3] != side:
+                continue
+            quoting += 1
+            old = prev.get(key)
+            if old and odd != old and ((odd < old) == (b > a)):  # ราคาลง = implied ขึ้น
+                same_dir += 1
+        if same_dir >= STEAM_MIN_BOOKS and same_dir >= STEAM_MIN_SHARE * quoting:
+            out.append((side, round(b - a, 4)))
+    return out
+
+def update_features(feat: dict, prev: dict, cur: dict, ts: int, n_changed: int) -> dict:
+    """อัปเดตฟีเจอร์ของแมตช์จาก snapshot ใหม่ (prev/cur = ราคาทั้งหมดก่อน/หลัง)"""
+    feat = dict(feat or {})
+    feat["snapshots"] = feat.get("snapshots", 0) + 1
+    feat["changes"] = feat.get("changes", 0) + n_changed
+    feat.setdefault("first_ts", ts)
+    feat["last_ts"] = ts
+    c_cur = consensus_1x2(cur)
+    if not any(v is not None for v in c_cur.values()):
+        return feat
+    latest = {"ts": ts, **c_cur}
+    if "open" not in feat:
+        feat["open"] = latest
+    elif n_changed:
+        c_prev = {s: feat.get("latest", {}).get(s) for s in SIDES_1X2}
+        st = feat.setdefault("steam", {"count": 0})
+        for side, shift in detect_steam(prev, cur, c_prev, c_cur):
+            st["count"] += 1
+            st.update({"last_ts": ts, "last_side": side, "last_move": shift})
+    if n_changed or "latest" not in feat:
+        feat["latest"] = latest
+    feat["drift"] = {s: (round(latest[s] - feat["open"][s], 4)
+                         if latest[s] is not None and feat["open"].get(s) is not None else None)
+                     for s in SIDES_1X2}
+    return feat
+
+# ส่วนที่แนบไป Firebase (ไม่รวม snapshots/last_ts ที่เปลี่ยนทุกรอบ → hash ของ patch_odds คงที่ถ้าราคาไม่ขยับ)
+MOVEMENT_KEYS = ("open", "latest", "drift", "steam", "changes", "first_ts")
+
+def movement(feat: dict) -> dict:
+    return {k: feat[k] for k in MOVEMENT_KEYS if k in (feat or {})}
+
+def requested_books(bookmaker) -> set | None:
+    """meta.bookmaker ของ odds_full ("ALL" หรือ id) → set ของ bookmaker id | None = ทุกเจ้า"""
+    if bookmaker in (None, "", 0, "0") or str(bookmaker).upper() == "ALL":
+        return None
+    return {str(bookmaker)}
+
+class OddsHistory:
+    def __init__(self, path: str = ODDS_HISTORY_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _latest(self, fid: int) -> dict:
+        rows = self.conn.execute(
+            "SELECT bookmaker, market, line, side, odd FROM latest WHERE fixture_id=?", (fid,))
+        return {(bm, m, ln, sd): odd for bm, m, ln, sd, odd in rows}
+
+    def ingest(self, rec: dict, ts: int, books=None) -> int:
+        """
+        snapshot ของ fixture เดียว → จำนวนราคาที่เปลี่ยน (รวมที่ถูกถอด)
+        books: bookmaker ที่ snapshot นี้ขอมา (af_today_odds --bookmaker) — ถือว่าถอดเฉพาะราคาของเจ้าเหล่านี้
+               None = ทุกเจ้า
+        fixture ที่ไม่มีราคาเลย (API เว้นช่วง/หน้า bulk ไม่มี) = ไม่มีข้อมูล ไม่ใช่ถอดทุกราคา → ข้าม
+        """
+        fid = int(rec["fixture_id"])
+        cur = flatten_books(rec.get("bookmakers"))
+        if not cur:
+            return 0
+        prev_all = self._latest(fid)
+        prev = {k: v for k, v in prev_all.items() if v is not None}
+        changed = [(k, o) for k, o in cur.items() if prev_all.get(k) != o]
+        changed += [(k, None) for k in prev if k not in cur and (books is None or k[0] in books)]
+        if changed:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO quotes(fixture_id, bookmaker, market, line, side, ts, odd) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(fid, *k, ts, o) for k, o in changed])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO latest(fixture_id, bookmaker, market, line, side, odd, ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(fid, *k, o, ts) for k, o in changed])
+        row = self.conn.execute("SELECT features FROM fixtures WHERE fixture_id=?", (fid,)).fetchone()
+        feat = update_features(json.loads(row[0]) if row and row[0] else {}, prev, cur, ts, len(changed))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fixtures(fixture_id, league_id, kickoff_ts, features) VALUES (?, ?, ?, ?)",
+            (fid, rec.get("league_id"), rec.get("kickoff_ts"), json.dumps(feat, separators=(",", ":"))))
+        return len(changed)
+
+    def features(self, fids) -> dict:
+        """{fixture_id: features} ของแมตช์ที่มีประวัติ"""
+        out = {}
+        fids = [int(f) for f in fids]
+        for i in range(0, len(fids), 500):
+            part = fids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT fixture_id, features FROM fixtures WHERE fixture_id IN ({','.join('?' * len(part))})", part)
+            out.update({fid: json.loads(f) for fid, f in rows if f})
+        return out
+
+    def prune(self, days: float = ODDS_HISTORY_TTL_DAYS) -> int:
+        """ลบทุกอย่างของแมตช์ที่ kickoff เก่ากว่า days วัน"""
+        cutoff = int(time.time() - days * 86400)
+        old = [r[0] for r in self.conn.execute(
+            "SELECT fixture_id FROM fixtures WHERE kickoff_ts IS NOT NULL AND kickoff_ts < ?", (cutoff,))]
+        for t in ("quotes", "latest", "fixtures"):
+            self.conn.executemany(f"DELETE FROM {t} WHERE fixture_id=?", [(f,) for f in old])
+        return len(old)
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_in = sub.add_parser("ingest", help="บันทึก snapshot จาก odds_full_*.json")
+    p_in.add_argument("--json", required=True)
+    p_in.add_argument("--ts", type=int, default=0, help="เวลา snapshot (epoch, default=ตอนนี้)")
+    p_in.add_argument("--bookmaker", type=int, default=0,
+                      help="bookmaker ที่ไฟล์นี้ดึงมา (default = meta.bookmaker ของไฟล์, ไม่มี = ทุกเจ้า)")
+    p_show = sub.add_parser("show", help="พิมพ์ฟีเจอร์และราคาที่เปลี่ยนของแมตช์")
+    p_show.add_argument("fixture_id", type=int)
+    ap.add_argument("--path", default=ODDS_HISTORY_PATH)
+    args = ap.parse_args()
+
+    hist = OddsHistory(args.path)
+    if args.cmd == "show":
+        print(json.dumps(hist.features([args.fixture_id]).get(args.fixture_id), ensure_ascii=False, indent=2))
+        for r in hist.conn.execute(
+                "SELECT ts, bookmaker, market, line, side, odd FROM quotes WHERE fixture_id=? ORDER BY ts, bookmaker",
+                (args.fixture_id,)):
+            print(*r)
+        return
+
+    ts = args.ts or int(time.time())
+    n_fx = n_changed = 0
+    stream = FixtureStream(args.json)
+    for rec in stream:
+        if n_fx == 0:
+            books = requested_books(args.bookmaker or (stream.extra.get("meta") or {}).get("bookmaker"))
+        n_changed += hist.ingest(rec, ts, books)
+        n_fx += 1
+    n_pruned = hist.prune()
+    hist.commit()
+    n_rows = hist.conn.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+    hist.close()
+    print(f"✅ odds history: fixtures={n_fx} ราคาเปลี่ยน={n_changed} ลบแมตช์เก่า={n_pruned} | quotes ทั้งหมด={n_rows}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# scripts/odds_markets.py
+# -*- coding: utf-8 -*-
+"""
+แปลง response ของ /odds → ตลาด 1X2 / Over-Under / Handicap ต่อ bookmaker (ใช้โดย af_today_odds)
+
+ทำงานแบบ table-driven:
+- ชนิดตลาดของ bet ถูกจำไว้ในตาราง (bet id, ชื่อ) → "1x2" | "ou" | "hcp" | None
+  (bet id ของ API-Football คงที่ → แต่ละ bet ถูกจัดประเภทด้วยกฎชื่อแค่ครั้งแรกที่เจอ)
+- regex คอมไพล์ครั้งเดียว และผลแปลง value string → (side, line) ถูก memoize
+  (ค่าอย่าง "Over 2.5" / "Home -0.75" ซ้ำกันทุก bookmaker ทุกแมตช์)
+ผลลัพธ์เหมือนตัวแปลงเดิมทุกประการ (ตรวจด้วย tools/bench_market_parser.py)
+"""
+
+import re
+from functools import lru_cache
+
+_RE_OU_SIDE_FIRST = re.compile(r"([Oo]ver|[Uu]nder)\s*([+-]?\d+(?:\.\d+)?)")
+_RE_OU_LINE_FIRST = re.compile(r"([+-]?\d+(?:\.\d+)?)\s*(Over|Under)", re.I)
+_RE_HCP_HOME = re.compile(r"\b(home|^1\b)", re.I)
+_RE_HCP_AWAY = re.compile(r"\b(away|^2\b)", re.I)
+_RE_NUMBER = re.compile(r"[+-]?\d+(?:\.\d+)?")
+
+_1X2_SIDE = {"home": "home", "1": "home", "1 (home)": "home",
+             "draw": "draw", "x": "draw",
+             "away": "away", "2": "away", "2 (away)": "away"}
+_1X2_NAMES = ("1x2", "winner", "win/lose", "win-draw-win")
+
+# (bet id, bet name) → ชนิดตลาด; เติมเองระหว่างใช้งาน
+BET_KIND = {}
+
+def classify_bet(name: str):
+    """กฎเดิมจากชื่อ bet → "1x2" | "ou" | "hcp" | None"""
+    name = (name or "").lower()
+    if "match winner" in name or name.strip() in _1X2_NAMES:
+        return "1x2"
+    if "over/under" in name or "total goals" in name or "goals over" in name:
+        return "ou"
+    if "handicap" in name:
+        return "hcp"
+    return None
+
+def bet_kind(bet: dict):
+    key = (bet.get("id"), bet.get("name"))
+    try:
+        return BET_KIND[key]
+    except KeyError:
+        kind = BET_KIND[key] = classify_bet(bet.get("name"))
+        return kind
+    except TypeError:  # id/name แปลก (unhashable) → ไม่ cache
+        return classify_bet(bet.get("name"))
+
+@lru_cache(maxsize=4096)
+def _side_1x2(val: str):
+    return _1X2_SIDE.get(val.strip().lower())
+
+@lru_cache(maxsize=4096)
+def _ou_key(val: str):
+    """'Over 2.5' → ('over', '2.5'); แปลงไม่ได้ → None"""
+    val = val.strip()
+    m = _RE_OU_SIDE_FIRST.search(val)
+    if m:
+        side, line = m.group(1).lower(), m.group(2)
+    else:
+        m2 = _RE_OU_LINE_FIRST.search(val)
+        if not m2:
+            return None
+        side, line = m2.group(2).lower(), m2.group(1)
+    return ("over" if "over" in side else "under"), line
+
+@lru_cache(maxsize=4096)
+def _hcp_key(val: str):
+    """'Home -0.75' → ('home', '-0.75'); ไม่มีฝั่งหรือเส้น → None"""
+    val = val.strip()
+    side = "home" if _RE_HCP_HOME.search(val) else ("away" if _RE_HCP_AWAY.search(val) else None)
+    if not side:
+        return None
+    m = _RE_NUMBER.search(val.replace(":", " "))
+    if not m:
+        return None
+    return side, m.group(0)
+
+def parse_1x2(bet):
+    rec = {"home": "", "draw": "", "away": ""}
+    for v in bet.get("values", []):
+        side = _side_1x2(v.get("value") or "")
+        if side:
+            rec[side] = v.get("odd") or ""
+    return rec
+
+def parse_ou(bet):
+    # return mapping line -> {"over": x, "under": y}
+    res = {}
+    for v in bet.get("values", []):
+        k = _ou_key(v.get("value") or "")
+        if k is None:
+            continue
+        d = res.get(k[1])
+        if d is None:
+            d = res[k[1]] = {"over": "", "under": ""}
+        d[k[0]] = v.get("odd") or ""
+    return res
+
+def parse_hcp(bet):
+    # return mapping line -> {"home": x, "away": y}
+    res = {}
+    for v in bet.get("values", []):
+        k = _hcp_key(v.get("value") or "")
+        if k is None:
+            continue
+        d = res.get(k[1])
+        if d is None:
+            d = res[k[1]] = {"home": "", "away": ""}
+        d[k[0]] = v.get("odd") or ""
+    return res
+
+_PARSERS = {"1x2": parse_1x2, "ou": parse_ou, "hcp": parse_hcp}
+
+def extract_markets(odds_payload):
+    """Return bookmakers dict: {bm_id: {"1x2":{...}, "ou":{line:{...}}, "hcp":{line:{...}}}}"""
+    books = {}
+    for entry in odds_payload:
+        for bm in entry.get("bookmakers", []):
+            bm_id = str(bm.get("id"))
+            acc = books.get(bm_id)
+            if acc is None:
+                acc = books[bm_id] = {"1x2": {}, "ou": {}, "hcp": {}}
+            for bet in bm.get("bets", []):
+                kind = bet_kind(bet)
+                if kind:
+                    acc[kind] = _PARSERS[kind](bet)
+    return books
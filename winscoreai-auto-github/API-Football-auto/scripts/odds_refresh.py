@@ -0,0 +1,89 @@
+# scripts/odds_refresh.py
+# -*- coding: utf-8 -*-
+"""
+ตารางรอบดึง odds ต่อ fixture ตามเวลาที่เหลือก่อน kickoff (ใช้โดย af_today_odds)
+แมตช์ที่ยังอีกนานราคาแทบไม่ขยับ → ดึงห่าง ๆ, ใกล้ kickoff → ดึงทุกรอบ
+เวลาที่ดึงล่าสุดต่อ fixture เก็บใน state JSON ข้ามรอบ (workflow cache ไว้)
+
+Env:
+  ODDS_REFRESH_STATE      (default API-Football-auto/live_odds/odds_refresh_state.json)
+  ODDS_REFRESH_TIERS      "ชั่วโมงก่อน KO:นาทีต่อรอบ,..." (default "2:0,6:30,24:60,*:180")
+                          เช่น <2h ทุกรอบ, <6h ทุก 30 นาที, <24h ทุกชั่วโมง, ไกลกว่านั้นทุก 3 ชั่วโมง
+  ODDS_REFRESH_SLACK_MIN  เผื่อเวลาให้ cron ที่เหลื่อมเล็กน้อย (default 5) — ไม่งั้น 60 นาทีอาจกลายเป็น 90
+"""
+
+import os
+import json
+from pathlib import Path
+
+ODDS_REFRESH_STATE = os.getenv(
+    "ODDS_REFRESH_STATE",
+    str(Path(__file__).resolve().parent.parent / "live_odds" / "odds_refresh_state.json"),
+)
+ODDS_REFRESH_TIERS = os.getenv("ODDS_REFRESH_TIERS", "2:0,6:30,24:60,*:180")
+ODDS_REFRESH_SLACK_MIN = float(os.getenv("ODDS_REFRESH_SLACK_MIN", "5"))
+STATE_VERSION = 1
+# ลบ fixture ที่ kickoff ผ่านไปนานกว่านี้ออกจาก state
+STATE_KEEP_AFTER_KO_S = 86400
+
+def parse_tiers(spec: str) -> list:
+    """ "2:0,6:30,*:180" → [(7200, 0), (21600, 1800), (inf, 10800)] (วินาที) เรียงตามชั่วโมง"""
+    tiers = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        h, m = part.split(":")
+        hours = float("inf") if h.strip() == "*" else float(h)
+        tiers.append((hours * 3600, float(m) * 60))
+    tiers.sort()
+    if not tiers or tiers[-1][0] != float("inf"):
+        tiers.append((float("inf"), tiers[-1][1] if tiers else 0))
+    return tiers
+
+class RefreshSchedule:
+    def __init__(self, path: str = ODDS_REFRESH_STATE, tiers: str = ODDS_REFRESH_TIERS,
+                 slack_min: float = ODDS_REFRESH_SLACK_MIN):
+        self.path = path
+        self.tiers = parse_tiers(tiers)
+        self.slack = slack_min * 60
+        self.fixtures = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                st = json.load(f)
+            if st.get("version") == STATE_VERSION and isinstance(st.get("fixtures"), dict):
+                return st["fixtures"]
+            print(f"⚠️ refresh state {self.path} เวอร์ชันไม่ตรง — เริ่มใหม่")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ อ่าน refresh state {self.path} ไม่ได้ ({e}) — เริ่มใหม่")
+        return {}
+
+    def interval(self, kickoff_ts: int, now: int) -> float:
+        """วินาทีระหว่างรอบดึงของแมตช์ที่ kickoff_ts"""
+        ttk = kickoff_ts - now
+        for limit, every in self.tiers:
+            if ttk < limit:
+                return every
+        return self.tiers[-1][1]
+
+    def is_due(self, fid: int, kickoff_ts: int, now: int) -> bool:
+        last = (self.fixtures.get(str(fid)) or {}).get("fetched_at")
+        if last is None or not isinstance(kickoff_ts, int):
+            return True
+        return now - last >= self.interval(kickoff_ts, now) - self.slack
+
+    def mark(self, fid: int, kickoff_ts: int, now: int):
+        self.fixtures[str(fid)] = {"fetched_at": now, "kickoff_ts": kickoff_ts}
+
+    def save(self, now: int):
+        keep = {k: v for k, v in self.fixtures.items()
+                if not isinstance(v.get("kickoff_ts"), int) or v["kickoff_ts"] >= now - STATE_KEEP_AFTER_KO_S}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "fixtures": keep}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
@@ -0,0 +1,223 @@
+# scripts/odds_vec.py
+# -*- coding: utf-8 -*-
+"""
+คำนวณฟีเจอร์ odds ทั้ง slate ทีเดียวด้วย NumPy (ใช้โดย patch_odds.build_features_batch)
+
+ทุกราคาใน batch ถูกแปลงเป็น float ครั้งเดียว แล้ววางเป็นคอลัมน์แบน (fixture, ฝั่ง/เส้น, ค่า)
+— เท่ากับ tensor fixture × bookmaker × market × line แบบ sparse — แล้วสรุปต่อกลุ่มด้วย reduceat/lexsort:
+- xbm_1x2_batch        : mean/stdev/min/max/spread ของราคา 1×2 + implied เฉลี่ย/overround/entropy
+- LineMatrix           : ราคา line × bookmaker ต่อตลาด → consensus/best/spread ต่อเส้น + เส้นหลักที่บาลานซ์สุด
+
+xbm_1x2_batch ให้ผลตรงกับ bookmaker_stats_1x2 ต่อ fixture (ต่างได้แค่หลักสุดท้ายของ float)
+ตรวจ/วัดเวลาด้วย tools/bench_odds_features.py
+"""
+
+import warnings
+from functools import lru_cache
+
+import numpy as np
+
+SIDES_1X2 = ("home", "draw", "away")
+
+@lru_cache(maxsize=16384, typed=True)
+def _num_cached(x):
+    try:
+        return float(str(x))
+    except Exception:
+        return None
+
+def to_float(x):
+    """float(str(x)) แบบ memoize (ราคาอย่าง "1.85" ซ้ำกันทั้ง slate); แปลงไม่ได้ → None"""
+    try:
+        return _num_cached(x)
+    except TypeError:  # unhashable (dict/list) → แปลงไม่ได้อยู่แล้ว
+        return None
+
+def _group_stats(keys: np.ndarray, vals: np.ndarray, n_groups: int):
+    """สถิติต่อกลุ่ม (count/mean/pstdev/min/max) — กลุ่มที่ไม่มีค่า count=0, ที่เหลือ nan"""
+    cnt = np.zeros(n_groups, dtype=np.int64)
+    out = {k: np.full(n_groups, np.nan) for k in ("mean", "stdev", "min", "max")}
+    if len(keys) == 0:
+        return cnt, out
+    order = np.argsort(keys, kind="stable")
+    k, v = keys[order], vals[order]
+    g, starts, counts = np.unique(k, return_index=True, return_counts=True)
+    mu = np.add.reduceat(v, starts) / counts
+    dev = v - np.repeat(mu, counts)
+    cnt[g] = counts
+    out["mean"][g] = mu
+    out["stdev"][g] = np.sqrt(np.add.reduceat(dev * dev, starts) / counts)
+    out["min"][g] = np.minimum.reduceat(v, starts)
+    out["max"][g] = np.maximum.reduceat(v, starts)
+    return cnt, out
+
+def _agg(cnt, st, j):
+    n = int(cnt[j])
+    if not n:
+        return {"mean": None, "stdev": None, "min": None, "max": None, "count": 0, "spread": None}
+    mn, mx = float(st["min"][j]), float(st["max"][j])
+    return {
+        "mean": float(st["mean"][j]),
+        "stdev": (float(st["stdev"][j]) if n > 1 else 0.0),
+        "min": mn,
+        "max": mx,
+        "count": n,
+        "spread": (mx - mn) if n >= 2 else 0.0,
+    }
+
+def _none(x):
+    return None if np.isnan(x) else float(x)
+
+def xbm_1x2_batch(books_list) -> list:
+    """books ต่อ fixture → [xbm_1x2 dict] รูปเดียวกับ patch_odds.bookmaker_stats_1x2"""
+    n = len(books_list)
+    keys, vals = [], []
+    for i, books in enumerate(books_list):
+        for mk in (books or {}).values():
+            one = mk.get("1x2") or {}
+            for s, side in enumerate(SIDES_1X2):
+                v = to_float(one.get(side))
+                if v is not None:
+                    keys.append(i * 3 + s)
+                    vals.append(v)
+    keys = np.asarray(keys, dtype=np.int64)
+    vals = np.asarray(vals, dtype=float)
+
+    # ราคา: นับเฉพาะค่าที่ truthy (เหมือน `if h:`) / implied: เฉพาะราคา > 1e-9
+    m_odd = vals != 0
+    m_imp = vals > 1e-9
+    c_odd, s_odd = _group_stats(keys[m_odd], vals[m_odd], n * 3)
+    c_imp, s_imp = _group_stats(keys[m_imp], 1.0 / vals[m_imp], n * 3)
+
+    # implied เฉลี่ยต่อฝั่ง → overround (ผลรวมฝั่งที่มี) และ entropy ของสัดส่วน
+    P = s_imp["mean"].reshape(n, 3)
+    has = ~np.isnan(P)
+    ov = np.where(has.any(axis=1), np.where(has, P, 0.0).sum(axis=1), np.nan)
+    pos = has & (np.where(has, P, 0.0) > 0)
+    tot = np.where(pos, P, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = np.where(pos, P, 1.0) / np.where(tot > 0, tot, 1.0)[:, None]
+        ent = np.where(tot > 0, -np.where(pos, q * np.log(q), 0.0).sum(axis=1), np.nan)
+
+    out = []
+    for i in range(n):
+        b = i * 3
+        out.append({
+            "odds": {side: _agg(c_odd, s_odd, b + s) for s, side in enumerate(SIDES_1X2)},
+            "implied_avg": {
+                "home": _none(P[i, 0]), "draw": _none(P[i, 1]), "away": _none(P[i, 2]),
+                "overround": _none(ov[i]), "entropy": _none(ent[i]),
+            },
+        })
+    return out
+
+class LineMatrix:
+    """
+    ราคาทุกเส้นของตลาดหนึ่ง (ou/hcp/ou_ht/hcp_ht) ทั้ง batch เป็น array เดียว:
+      odds[row, book, side]  row = (fixture, line) เรียงตาม fixture, book = ลำดับเจ้ามือใน fixture นั้น
+      ช่องที่เจ้ามือไม่ได้ให้ราคา (หรือราคาใช้ไม่ได้) = nan
+    สร้างในรอบเดียวแล้วสรุปต่อเส้นแบบ vectorized:
+      imp_med/imp_mean = consensus implied, best = ราคาดีสุด, spread = ดีสุด - แย่สุด, n = จำนวนเจ้าที่ให้ราคา
+    """
+    def __init__(self, books_list, key: str, sides):
+        self.sides = tuple(sides)
+        self.row_fx, self.row_line = [], []
+        ri, ci, si, vals = [], [], [], []
+        width = 1
+        for i, books in enumerate(books_list):
+            rows = {}
+            for j, mk in enumerate((books or {}).values()):
+                for line, v in ((mk or {}).get(key) or {}).items():
+                    line = str(line)
+                    r = rows.get(line)
+                    if r is None:
+                        r = rows[line] = len(self.row_fx)
+                        self.row_fx.append(i)
+                        self.row_line.append(line)
+                    for s, side in enumerate(self.sides):
+                        o = to_float(v.get(side))
+                        if o is not None and 0 < o < np.inf:
+                            ri.append(r); ci.append(j); si.append(s); vals.append(o)
+            width = max(width, len(books or {}))
+        self.odds = np.full((len(self.row_fx), width, len(self.sides)), np.nan)
+        self.odds[ri, ci, si] = vals
+        fx = np.asarray(self.row_fx, dtype=np.int64)
+        self.start = np.searchsorted(fx, np.arange(len(books_list) + 1))
+        self.line_f = np.array([to_float(x) for x in self.row_line], dtype=float)  # None → nan
+
+        imp = 1.0 / self.odds
+        self.n = (~np.isnan(self.odds)).sum(axis=1)  # (rows, sides)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # เส้นที่ฝั่งหนึ่งไม่มีราคาเลย → nan
+            self.imp_med = np.nanmedian(imp, axis=1)
+            self.imp_mean = np.nanmean(imp, axis=1)
+            self.best = np.nanmax(self.odds, axis=1)
+            self.spread = self.best - np.nanmin(self.odds, axis=1)
+
+    def encode(self, i: int) -> dict:
+        """
+        ทุกเส้นของ fixture i แบบ columnar (ขนาดโตตามจำนวนเส้น ไม่ใช่จำนวนเจ้ามือ; เส้นไม่ได้เป็น key ของ node)
+        {"line": ["2.5", ...], "<side>": {"n": [...], "imp_med": [...], "imp_mean": [...], "best": [...], "spread": [...]}}
+        ฝั่งที่ไม่มีเจ้าไหนให้ราคาในเส้นนั้น → n=0 และค่าอื่นเป็น 0
+        (RTDB ไม่เก็บ null ใน array — ถ้าใส่ null ลำดับของแต่ละ list จะเลื่อนไม่ตรงกับ "line")
+        ไม่มีเส้นเลย → {}
+        """
+        a, b = self.start[i], self.start[i + 1]
+        if a == b:
+            return {}
+        out = {"line": self.row_line[a:b]}
+        for s, side in enumerate(self.sides):
+            out[side] = {
+                "n": self.n[a:b, s].tolist(),
+                "imp_med": _round_list(self.imp_med[a:b, s], 4),
+                "imp_mean": _round_list(self.imp_mean[a:b, s], 4),
+                "best": _round_list(self.best[a:b, s], 3),
+                "spread": _round_list(self.spread[a:b, s], 3),
+            }
+        return out
+
+    def _sel(self, r: int) -> dict:
+        """ราคา consensus ของเส้น r (1 / median implied) รูปเดียวกับราคาจาก API"""
+        return {side: _fmt_odd(self.imp_med[r, s]) for s, side in enumerate(self.sides)}
+
+    def pick_balanced(self, anchor=None) -> list:
+        """
+        เส้นหลักต่อ fixture จาก consensus implied → [(line, {side: odd}) | (None, None)]
+        - anchor เป็นตัวเลข (OU): เรียงตาม (gap, |line-anchor|, line)
+        - anchor=None (HCP)     : เรียงตาม (|line|, gap, line)
+        gap = |imp_med(side0) - imp_med(side1)|; เสมอกันทุกคีย์ → เส้นที่เจอก่อน
+        fixture ที่ไม่มีเส้นไหนครบสองฝั่ง → เส้นใกล้ anchor (HCP ใกล้ 0) ที่สุด
+        """
+        n_fx = len(self.start) - 1
+        out = [(None, None)] * n_fx
+        ln = self.line_f
+        ok = ~np.isnan(self.imp_med).any(axis=1) & ~np.isnan(ln)
+        rows = np.flatnonzero(ok)
+        if len(rows):
+            fx = np.asarray(self.row_fx, dtype=np.int64)[rows]
+            gap = np.abs(self.imp_med[rows, 0] - self.imp_med[rows, 1])
+            if anchor is None:
+                order = np.lexsort((ln[rows], gap, np.abs(ln[rows]), fx))
+            else:
+                order = np.lexsort((ln[rows], np.abs(ln[rows] - float(anchor)), gap, fx))
+            _, first = np.unique(fx[order], return_index=True)
+            for r in rows[order[first]]:
+                out[self.row_fx[r]] = (str(float(ln[r])), self._sel(r))
+        dist = np.abs(ln - float(anchor or 0))
+        for i in range(n_fx):
+            a, b = self.start[i], self.start[i + 1]
+            if a == b or out[i][0] is not None:
+                continue
+            d = dist[a:b]
+            r = a + (int(np.nanargmin(d)) if not np.isnan(d).all() else 0)
+            out[i] = (self.row_line[r], self._sel(r))
+        return out
+
+def _round_list(arr, nd: int) -> list:
+    """nan → 0 (ดู LineMatrix.encode)"""
+    return [0 if v != v else round(v, nd) for v in arr.tolist()]
+
+def _fmt_odd(imp) -> str:
+    if not imp == imp or imp <= 0:
+        return ""
+    return f"{round(1.0 / float(imp), 3):g}"
@@ -7,8 +7,11 @@ What it does:
 - อ่านไฟล์ JSON: odds_full_YYYYMMDD_YYYYMMDD.json
 - คำนวณฟีเจอร์ & สรุปต่อแมตช์:
     * ไม่ฟิกซ์ OU=2.5 หรือ HCP=-1 อีกต่อไป
-    * เลือก "เส้นหลัก" แบบบาลานซ์ (over≈under สำหรับ OU, home≈away สำหรับ HCP)
+    * เลือก "เส้นหลัก" แบบบาลานซ์ (over≈under สำหรับ OU, home≈away สำหรับ HCP) จาก consensus ของทุกเจ้ามือ
+      ราคาของเส้นหลัก = 1 / median implied ข้ามเจ้ามือ (สังเคราะห์ ไม่ใช่ราคาของเจ้าใดเจ้าหนึ่ง) → "source": "consensus"
     * เก็บทุกเส้นสำหรับ FT/HT: ou_all, hcp_all, ou_ht_all, hcp_ht_all
+      (columnar ต่อเส้น: n / implied median+mean / ราคาดีสุด / spread — ไม่มีราคา = n 0, ค่าอื่น 0
+       ดู odds_vec.LineMatrix.encode)
     * เก็บ 1×2 implied (normalize), cross-bookmaker stats
 - เขียนขึ้น Firebase:
     matches/{league_id}/{fixture_id}/odds_features  = {...}
@@ -17,7 +20,17 @@ What it does:
 CLI:
   --json PATH               (required) ไฟล์จาก af_today_odds.py
   --dry-run                 พิมพ์ preview ไม่เขียน Firebase
+  --state PATH              state file เก็บ hash ของ odds_features ต่อ fixture
+                            (default=$ODDS_STATE_PATH หรือ <API-Football-auto>/live_odds/odds_features_state.json)
+                            fixture ที่ hash ไม่เปลี่ยน (ไม่นับ meta.updated_at) จะไม่ถูกเขียนซ้ำ
+  --force                   เขียนทุก fixture ไม่สน state
   --monitor-path PATH       default=monitoring/odds/last_run
+  --batch N                 อ่าน/เขียนทีละ N fixtures (default=$ODDS_PATCH_BATCH หรือ 500)
+                            ไฟล์ถูกอ่านแบบ stream (json_stream) → หน่วยความจำคงที่ไม่ว่าไฟล์จะใหญ่แค่ไหน
+  --engine numpy|python     วิธีคำนวณฟีเจอร์ (default=$ODDS_FEATURES_ENGINE หรือ numpy)
+                            numpy = ทั้ง batch ทีเดียว (odds_vec), python = ทีละ fixture แบบเดิม
+  --history PATH            odds_history.sqlite (default=$ODDS_HISTORY_PATH) → แนบ odds_features/movement
+                            (open/latest/drift/steam จาก odds_history.py ingest); ไม่มีไฟล์ = ข้าม
   --bm INT                  (unused inเวอร์ชันนี้, กันไว้อนาคต)
 
 Env for writing:
@@ -28,9 +41,30 @@ Env for writing:
 import os
 import json
 import math
+import hashlib
 import argparse
+from pathlib import Path
 from statistics import mean, pstdev
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+
+from json_stream import FixtureStream, iter_batches
+import odds_vec
+import odds_history
+
+# ---------- change detection state ----------
+ODDS_STATE_PATH = os.getenv(
+    "ODDS_STATE_PATH",
+    str(Path(__file__).resolve().parent.parent / "live_odds" / "odds_features_state.json"),
+)
+ODDS_STATE_VERSION = 1
+# เขียนซ้ำแม้ hash เดิม ถ้าเขียนครั้งล่าสุดนานกว่านี้ (กัน node ถูกลบ/แก้จากที่อื่น)
+ODDS_STATE_REFRESH_HOURS = float(os.getenv("ODDS_STATE_REFRESH_HOURS", "6"))
+# ลบ fixture ที่ไม่ได้เห็นนานกว่านี้ออกจาก state
+ODDS_STATE_TTL_DAYS = float(os.getenv("ODDS_STATE_TTL_DAYS", "7"))
+# จำนวน fixtures ต่อรอบอ่าน/เขียน
+ODDS_PATCH_BATCH = int(os.getenv("ODDS_PATCH_BATCH", "500"))
+# numpy = คำนวณฟีเจอร์ทั้ง batch แบบ vectorized, python = ทีละ fixture
+ODDS_FEATURES_ENGINE = os.getenv("ODDS_FEATURES_ENGINE", "numpy")
 
 # ---------- FB client (optional import) ----------
 def load_fb_update_multi():
@@ -108,95 +142,50 @@ def bookmaker_stats_1x2(books):
         "implied_avg": {"home": pH, "draw": pD, "away": pA, "overround": ov, "entropy": ent},
     }
 
-# ---------- NEW helpers: balanced line picking & merging all lines ----------
-def _imp(odd):
-    try:
-        o = float(str(odd))
-        return 1.0 / o if o > 0 else None
-    except:
-        return None
+# ---------- line matrix: ทุกเส้นจากทุกเจ้ามือ (odds_vec.LineMatrix) ----------
+LINE_KEYS = ("ou", "hcp", "ou_ht", "hcp_ht")
+# (ฝั่งของตลาด, anchor ของการเลือกเส้นหลัก) — OU ใกล้ 2.5, HCP ใกล้ 0
+LINE_MARKETS = {"ou": (("over", "under"), 2.5), "hcp": (("home", "away"), None),
+                "ou_ht": (("over", "under"), 2.5), "hcp_ht": (("home", "away"), None)}
 
-def choose_ou_balanced(ou_map: dict, anchor=2.5):
-    """
-    เลือก line ที่ over/under 'บาลานซ์' สุด (gap น้อย) และใกล้ anchor (2.5) รองลงมา
-    ไม่ฟิกซ์ 2.5 — ถ้า 3.0 หรือ 2.25 บาลานซ์กว่า ก็เลือกได้
-    """
-    if not ou_map: return None, None
-    best = None
-    for line, v in ou_map.items():
-        po, pu = _imp(v.get("over")), _imp(v.get("under"))
-        if po is None or pu is None:
-            continue
-        gap = abs(po - pu)
-        cand = (gap, abs(float(line) - float(anchor)), float(line), v)
-        if best is None or cand < best:
-            best = cand
-    if best:
-        _, _, line, val = best
-        return str(line), val
-    # fallback: เลือกใกล้ anchor ที่สุด
-    try:
-        k = min(ou_map.keys(), key=lambda x: abs(float(x) - float(anchor)))
-    except Exception:
-        k = list(ou_map.keys())[0]
-    return str(k), ou_map[k]
+# ราคาเส้นหลักมาจาก LineMatrix._sel (1 / median implied) ไม่ใช่ราคาที่เจ้ามือไหนเสนอจริง
+MAIN_LINE_SOURCE = "consensus"
 
-def choose_hcp_balanced(hcp_map: dict):
-    """
-    เลือก handicap ที่ |line| ใกล้ 0 สุด และราคาบาลานซ์ระหว่าง home/away (gap น้อย)
-    ไม่ฟิกซ์ -1 — ถ้า 0, ±0.25, ±0.5 มี ก็จะถูกเลือกก่อน
-    """
-    if not hcp_map: return None, None
-    best = None
-    for line, v in hcp_map.items():
-        ph, pa = _imp(v.get("home")), _imp(v.get("away"))
-        if ph is None or pa is None:
-            continue
-        cand = (abs(float(line)), abs(ph - pa), float(line), v)
-        if best is None or cand < best:
-            best = cand
-    if best:
-        _, _, line, val = best
-        return str(line), val
-    # fallback: ใกล้ 0 ที่สุด
-    try:
-        k = min(hcp_map.keys(), key=lambda x: abs(float(x)))
-    except Exception:
-        k = list(hcp_map.keys())[0]
-    return str(k), hcp_map[k]
+def main_line(line, sel) -> dict:
+    return {"line": line, **(sel or {}), "source": MAIN_LINE_SOURCE} if line else {"line": None}
 
-def merge_all_lines(books: dict, key: str) -> dict:
+def build_lines(books_list) -> list:
     """
-    รวมทุกเส้นจากทุกเจ้ามือเป็น map รวม (เช่น key='ou', 'hcp', 'ou_ht', 'hcp_ht')
+    ต่อ fixture: {key: (all_encoded, (main_line, main_sel))} สำหรับ ou/hcp/ou_ht/hcp_ht
+    ทุกเจ้ามือถูกนับ (ไม่ใช่เจ้าแรกที่เจอ) → เส้นหลักเลือกจาก consensus implied ของทั้งตลาด
     """
-    out = {}
-    for mk in (books or {}).values():
-        for line, val in (mk.get(key) or {}).items():
-            out.setdefault(str(line), val)
+    out = [{} for _ in books_list]
+    for k in LINE_KEYS:
+        sides, anchor = LINE_MARKETS[k]
+        lm = odds_vec.LineMatrix(books_list, k, sides)
+        for i, pick in enumerate(lm.pick_balanced(anchor)):
+            out[i][k] = (lm.encode(i), pick)
     return out
 
 # ---------- core: build features for one fixture ----------
-def build_features_per_fixture(rec):
+def build_features_per_fixture(rec, lines=None, xbm=None):
     """
     คืน dict ของ odds_features สำหรับ fixture เดียว (ไม่ fix เส้น)
     - เลือกเส้นหลักแบบ balanced-picked (FT/HT)
     - เก็บทุกเส้น *_all เพื่อให้ downstream ใช้เต็ม
     - เก็บ implied 1×2 + cross-bookmaker stats
+    lines/xbm = ผลที่ build_features_batch คำนวณไว้แล้วทั้ง batch (ไม่ส่ง = คำนวณที่นี่)
     """
     lid = rec["league_id"]; fid = rec["fixture_id"]
     books = rec.get("bookmakers", {}) or {}
 
-    # รวมทุกเส้นจากทุกเจ้า (FT/HT)
-    ou_all      = merge_all_lines(books, "ou")
-    hcp_all     = merge_all_lines(books, "hcp")
-    ou_ht_all   = merge_all_lines(books, "ou_ht")
-    hcp_ht_all  = merge_all_lines(books, "hcp_ht")
-
-    # เลือกเส้นหลักแบบบาลานซ์
-    ou_line_key,   ou_sel     = choose_ou_balanced(ou_all)       if ou_all     else (None, None)
-    hcp_line_key,  hcp_sel    = choose_hcp_balanced(hcp_all)     if hcp_all    else (None, None)
-    ou_ht_line,    ou_ht_sel  = choose_ou_balanced(ou_ht_all)    if ou_ht_all  else (None, None)
-    hcp_ht_line,   hcp_ht_sel = choose_hcp_balanced(hcp_ht_all)  if hcp_ht_all else (None, None)
+    # ทุกเส้นจากทุกเจ้า (FT/HT) + เส้นหลักแบบบาลานซ์
+    if lines is None:
+        lines = build_lines([books])[0]
+    ou_all,     (ou_line_key,  ou_sel)     = lines["ou"]
+    hcp_all,    (hcp_line_key, hcp_sel)    = lines["hcp"]
+    ou_ht_all,  (ou_ht_line,   ou_ht_sel)  = lines["ou_ht"]
+    hcp_ht_all, (hcp_ht_line,  hcp_ht_sel) = lines["hcp_ht"]
 
     # 1×2 implied baseline (ใช้เจ้ามือแรกที่มี)
     one_any = next((mk.get("1x2") for mk in books.values() if mk.get("1x2")), {})
@@ -213,16 +202,17 @@ def build_features_per_fixture(rec):
     }
 
     markets_present = sorted({k for _, mk in books.items() for k in mk.keys() if (mk or {}).get(k)})
-    xbm = bookmaker_stats_1x2(books)
+    if xbm is None:
+        xbm = bookmaker_stats_1x2(books)
 
     features = {
         # FT/HT – เส้นหลัก (balanced-picked)
         "one": one_any,
-        "ou":    ({"line": ou_line_key,    **(ou_sel or {})}    if ou_line_key    else {"line": None}),
-        "hcp":   ({"line": hcp_line_key,   **(hcp_sel or {})}   if hcp_line_key   else {"line": None}),
+        "ou":     main_line(ou_line_key, ou_sel),
+        "hcp":    main_line(hcp_line_key, hcp_sel),
         "one_ht": next((mk.get("1x2_ht") for mk in books.values() if mk.get("1x2_ht")), {}) or {},
-        "ou_ht": ({"line": ou_ht_line,     **(ou_ht_sel or {})} if ou_ht_line     else {"line": None}),
-        "hcp_ht":({"line": hcp_ht_line,    **(hcp_ht_sel or {})}if hcp_ht_line    else {"line": None}),
+        "ou_ht":  main_line(ou_ht_line, ou_ht_sel),
+        "hcp_ht": main_line(hcp_ht_line, hcp_ht_sel),
 
         # FT/HT – เก็บทุกเส้น
         "ou_all": ou_all,
@@ -251,6 +241,52 @@ def build_features_per_fixture(rec):
     }
     return features
 
+def build_features_batch(recs):
+    """
+    odds_features ของทั้ง batch: line matrix + cross-bookmaker stats คำนวณทีเดียวด้วย odds_vec
+    ผลเท่ากับ [build_features_per_fixture(r) for r in recs]
+    """
+    books = [rec.get("bookmakers", {}) or {} for rec in recs]
+    xbms = odds_vec.xbm_1x2_batch(books)
+    return [build_features_per_fixture(r, lines=ln, xbm=x)
+            for r, ln, x in zip(recs, build_lines(books), xbms)]
+
+# ---------- change detection ----------
+def features_hash(feat: dict) -> str:
+    """sha1 ของ odds_features โดยไม่นับ meta.updated_at (เปลี่ยนทุกครั้งที่รัน)"""
+    body = dict(feat)
+    body["meta"] = {k: v for k, v in (feat.get("meta") or {}).items() if k != "updated_at"}
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def load_state(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            st = json.load(f)
+        if st.get("version") == ODDS_STATE_VERSION and isinstance(st.get("fixtures"), dict):
+            return st
+        print(f"⚠️ state {path} เวอร์ชันไม่ตรง — เริ่มใหม่")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ อ่าน state {path} ไม่ได้ ({e}) — เริ่มใหม่")
+    return {"version": ODDS_STATE_VERSION, "fixtures": {}}
+
+def save_state(path: str, state: dict):
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=ODDS_STATE_TTL_DAYS)).isoformat()
+    state["fixtures"] = {k: v for k, v in state["fixtures"].items() if v.get("seen_at", "") >= cutoff}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def is_unchanged(entry: dict | None, h: str) -> bool:
+    if not entry or entry.get("hash") != h:
+        return False
+    refresh_before = (datetime.now(timezone.utc) - timedelta(hours=ODDS_STATE_REFRESH_HOURS)).isoformat()
+    return entry.get("written_at", "") >= refresh_before
+
 # ---------- preview ----------
 def preview_updates(updates, limit=8):
     print("\n---- PREVIEW (first {} nodes) ----".format(limit))
@@ -269,37 +305,95 @@ def main():
     ap.add_argument("--bm", type=int, default=0, help="reserved (not used)")
     ap.add_argument("--dry-run", action="store_true", help="preview only, do not write Firebase")
     ap.add_argument("--monitor-path", default="monitoring/odds/last_run", help="Firebase path for run summary")
+    ap.add_argument("--state", default=ODDS_STATE_PATH, help="per-fixture hash state file (skip unchanged odds)")
+    ap.add_argument("--force", action="store_true", help="write every fixture, ignore state")
+    ap.add_argument("--batch", type=int, default=ODDS_PATCH_BATCH, help="fixtures per read/write batch")
+    ap.add_argument("--engine", choices=["numpy", "python"], default=ODDS_FEATURES_ENGINE,
+                    help="numpy = vectorized ทั้ง batch, python = ทีละ fixture")
+    ap.add_argument("--history", default=odds_history.ODDS_HISTORY_PATH,
+                    help="odds movement store (odds_history.py); missing file = no movement")
     args = ap.parse_args()
 
-    with open(args.json, encoding="utf-8") as f:
-        payload = json.load(f)
+    stream = FixtureStream(args.json)
+    print(f"อ่านไฟล์ (stream): {args.json} | batch={args.batch} | engine={args.engine}")
 
-    fixtures = payload.get("fixtures", []) or []
-    meta_in = payload.get("meta", {}) or {}
-    print(f"อ่านไฟล์: {args.json} | fixtures={len(fixtures)}")
+    update_multi = None
+    if not args.dry_run:
+        update_multi = load_fb_update_multi()
+        if not update_multi:
+            print("⚠️ ไม่พบ fb_client.update_multi — ข้ามการเขียน Firebase (พิมพ์อย่างเดียว)")
 
-    updates = {}
+    n_fixtures = 0
     n_feat_nodes = 0
-
-    for rec in fixtures:
-        lid = int(rec["league_id"])
-        fid = int(rec["fixture_id"])
-
-        # เขียน odds_features ต่อแมตช์
-        feat = build_features_per_fixture(rec)
-        updates[f"matches/{lid}/{fid}/odds_features"] = feat
-        n_feat_nodes += 1
-
-        if n_feat_nodes % 50 == 0:
-            print(f"เตรียมอัปเดตครบ {n_feat_nodes} fixtures ...")
+    n_unchanged = 0
+    n_batches = 0
+    chunks_fail = 0
+    state = load_state(args.state)
+    run_at = now_iso()
+    hist = None
+    if args.history and os.path.exists(args.history):
+        hist = odds_history.OddsHistory(args.history)
+    else:
+        print(f"ℹ️ ไม่มี odds history ({args.history}) — ไม่แนบ movement")
+
+    for batch in iter_batches(stream, max(1, args.batch)):
+        updates = {}
+        written = {}  # key → hash ของ fixture ที่จะเขียนใน batch นี้
+        if args.engine == "numpy":
+            feats = build_features_batch(batch)
+        else:
+            feats = [build_features_per_fixture(rec) for rec in batch]
+        moves = hist.features(int(rec["fixture_id"]) for rec in batch) if hist else {}
+        for rec, feat in zip(batch, feats):
+            n_fixtures += 1
+            lid = int(rec["league_id"])
+            fid = int(rec["fixture_id"])
+
+            mv = odds_history.movement(moves.get(fid))
+            if mv:
+                feat["movement"] = mv
+
+            # เขียน odds_features ต่อแมตช์ (ข้ามถ้าราคาไม่เปลี่ยนจากรอบก่อน)
+            key = f"{lid}/{fid}"
+            h = features_hash(feat)
+            entry = state["fixtures"].setdefault(key, {})
+            entry["seen_at"] = run_at
+            if not args.force and is_unchanged(entry, h):
+                n_unchanged += 1
+                continue
+            updates[f"matches/{lid}/{fid}/odds_features"] = feat
+            written[key] = h
+            n_feat_nodes += 1
+
+        print(f"เตรียมอัปเดตครบ {n_feat_nodes} fixtures (อ่านแล้ว {n_fixtures}) ...")
+        if not updates:
+            continue
+        if n_batches == 0:
+            preview_updates(updates)
+        n_batches += 1
+        if not update_multi:
+            continue
+        ok = update_multi(updates)
+        # บันทึก hash เฉพาะ batch ที่เขียนครบทุก chunk (ไม่งั้นรอบหน้าจะเขียนใหม่)
+        if isinstance(ok, dict) and not ok.get("chunks_fail"):
+            for key, h in written.items():
+                state["fixtures"][key].update({"hash": h, "written_at": run_at})
+        else:
+            chunks_fail += ok.get("chunks_fail", 1) if isinstance(ok, dict) else 1
+            print("⚠️ มี chunk ล้มเหลว — ไม่อัปเดต hash ของ batch นี้ใน state")
+
+    if hist:
+        hist.close()
 
     # monitoring summary
     summary = {
         "run_at": now_iso(),
         "input_json": os.path.basename(args.json),
-        "fixtures": len(fixtures),
+        "fixtures": n_fixtures,
         "feature_nodes": n_feat_nodes,
-        "meta_in": meta_in,
+        "unchanged_skipped": n_unchanged,
+        "batches": n_batches,
+        "meta_in": stream.extra.get("meta", {}) or {},
         "env": {
             "GITHUB_WORKFLOW": os.getenv("GITHUB_WORKFLOW"),
             "GITHUB_JOB": os.getenv("GITHUB_JOB"),
@@ -308,22 +402,18 @@ def main():
             "GITHUB_REPOSITORY": os.getenv("GITHUB_REPOSITORY"),
         }
     }
-    updates[args.monitor_path] = summary
 
-    # preview
-    preview_updates(updates)
+    print(f"odds เปลี่ยน {n_feat_nodes} fixtures, ไม่เปลี่ยน {n_unchanged} (ข้าม)")
 
     if args.dry_run:
         print("\nDRY-RUN: ข้ามการเขียน Firebase")
         return
-
-    update_multi = load_fb_update_multi()
     if not update_multi:
-        print("⚠️ ไม่พบ fb_client.update_multi — ข้ามการเขียน Firebase (พิมพ์อย่างเดียว)")
         return
 
-    ok = update_multi(updates)
-    print("\n✅ Firebase update_multi:", ok)
+    update_multi({args.monitor_path: summary})
+    print(f"\n✅ Firebase update_multi: batches={n_batches}, chunks_fail={chunks_fail}")
+    save_state(args.state, state)
     print("สรุป:", json.dumps(summary, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
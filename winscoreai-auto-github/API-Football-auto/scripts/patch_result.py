@@ -1,27 +1,24 @@
 # API-Football/scripts/patch_result.py
-import os, sys, json, argparse, time
+import os, sys, json, argparse
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from firebase_admin import db
-from fb_client import update_multi
+from fb_client import update_multi, init_firebase
+import af_client
 
 API_KEY = os.getenv("API_FOOTBALL_KEY")
-BASE = "https://v3.football.api-sports.io"
-HEADERS = {"x-apisports-key": API_KEY}
+# จำนวน read พร้อมกันตอน prefetch node ของแหล่ง xG
+PATCH_RESULT_READ_WORKERS = int(os.getenv("PATCH_RESULT_READ_WORKERS", "16"))
 
 FINISHED_STATES = {"Match Finished", "AET", "Penalty", "Awarded", "WO", "Abandoned"}
 
 # -------------------- Utilities --------------------
-def get(url, params, what="", max_retry=4, wait=1.2):
-    for i in range(max_retry):
-        r = requests.get(url, headers=HEADERS, params=params, timeout=30)
-        if r.status_code == 200:
-            j = r.json()
-            return j.get("response", []), j.get("errors", {})
-        time.sleep(wait * (1 + 0.5*i))
-    raise RuntimeError(f"GET {what or url} failed after retries")
+def get(path, params, what=""):
+    # session/rate limit/retry อยู่ใน af_client
+    resp, errors, _ = af_client.get_client().get(path, params, what=what)
+    return resp, errors
 
 def safe(x):
     return None if x in ("", None) else x
@@ -137,7 +134,11 @@ def build_result_payload_from_json_item(item: dict) -> Dict[str, Any]:
         "stats": item.get("stats") or {},
     }
 
-def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=True, dry_run=False):
+def build_fixture_updates(league_id: int, fixture_id: int, res_payload: dict, node, do_xg=True) -> Dict[str, Any]:
+    """
+    สร้าง updates ของ fixture เดียว; node(sub) คืน subtree ใต้ matches/{lid}/{fid}/
+    (understat, footystats, result/stats, api_football_enriched) — อ่านเฉพาะที่ cascade ต้องใช้จริง
+    """
     base = f"matches/{league_id}/{fixture_id}/result"
     ts_iso = datetime.now(timezone.utc).isoformat()
 
@@ -149,7 +150,7 @@ def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=
 
     if do_xg:
         # 1) Understat → postmatch
-        us = read_node(f"matches/{league_id}/{fixture_id}/understat")
+        us = node("understat")
         xg_us = compute_xg_from_understat(us)
         if xg_us:
             updates[f"{base}/xg/postmatch/home"] = xg_us["home"]
@@ -157,7 +158,7 @@ def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=
             updates[f"{base}/xg/method"] = "understat"
         else:
             # 2) FootyStats → prematch
-            fs = read_node(f"matches/{league_id}/{fixture_id}/footystats")
+            fs = node("footystats")
             xg_fs = compute_xg_from_footystats(fs)
             if xg_fs:
                 updates[f"{base}/xg/prematch/home"] = xg_fs["home"]
@@ -165,13 +166,13 @@ def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=
                 updates[f"{base}/xg/method"] = "footystats"
             else:
                 # 3) Heuristic (stats-first → enriched-fallback)
-                stats = res_payload.get("stats") or read_node(f"{base}/stats")
+                stats = res_payload.get("stats") or node("result/stats")
                 if stats:
                     xg_h = compute_xg_heuristic_from_stats(stats.get("home", {}), stats.get("away", {}), res_payload.get("score") or {})
                 else:
                     xg_h = None
                 if not xg_h:
-                    en = read_node(f"matches/{league_id}/{fixture_id}/api_football_enriched")
+                    en = node("api_football_enriched")
                     xg_h = compute_xg_heuristic_fallback(en)
                 if xg_h:
                     updates[f"{base}/xg/postmatch/home"] = xg_h["home"]
@@ -179,29 +180,96 @@ def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=
                     # ถ้ามี prematch จาก FS อยู่แล้วจะเก็บทับตามแหล่ง
                     if "xg/method" not in updates:
                         updates[f"{base}/xg/method"] = "heuristic"
+    return updates
+
+def _print_dry(league_id: int, fixture_id: int, updates: Dict[str, Any]):
+    print(f"[DRY] {league_id}/{fixture_id} KEYS={len(updates)}")
+    for i, (k, v) in enumerate(updates.items()):
+        if i >= 14: break
+        print(" ", k, "=>", v)
+
+def patch_one_fixture(league_id: int, fixture_id: int, res_payload: dict, do_xg=True, dry_run=False):
+    node = lambda sub: read_node(f"matches/{league_id}/{fixture_id}/{sub}")
+    updates = build_fixture_updates(league_id, fixture_id, res_payload, node, do_xg=do_xg)
 
     if dry_run:
-        print(f"[DRY] {league_id}/{fixture_id} KEYS={len(updates)}")
-        for i, (k, v) in enumerate(updates.items()):
-            if i >= 14: break
-            print(" ", k, "=>", v)
+        _print_dry(league_id, fixture_id, updates)
         return
 
     #db.reference("/").update(updates)
     update_multi(updates)
     print(f"✅ patched → matches/{league_id}/{fixture_id}/result")
 
+class _NeedNode(Exception):
+    """cascade ต้องการ subtree ที่ยังไม่ได้ prefetch"""
+    def __init__(self, sub: str):
+        self.sub = sub
+
+def prefetch_xg_nodes(items, workers: int = PATCH_RESULT_READ_WORKERS) -> Dict[tuple, Dict[str, dict]]:
+    """
+    อ่าน subtree ที่ cascade xG ต้องใช้ของทุก fixture แบบเป็นรอบ (สูงสุด 4 รอบ) อ่านพร้อมกันในแต่ละรอบ
+    รอบแรก understat ทุกตัว → รอบถัดไปเฉพาะตัวที่ยังหา xG ไม่ได้ (footystats → result/stats → enriched)
+    items: [(league_id, fixture_id, res_payload)] → {(lid, fid): {sub: node}}
+    """
+    nodes: Dict[tuple, Dict[str, dict]] = {(lid, fid): {} for lid, fid, _ in items}
+    pending = list(items)
+    reads = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        while pending:
+            need, asked = [], {}
+            for lid, fid, payload in pending:
+                got = nodes[(lid, fid)]
+                def node(sub, got=got):
+                    if sub not in got:
+                        raise _NeedNode(sub)
+                    return got[sub]
+                try:
+                    build_fixture_updates(lid, fid, payload, node)
+                except _NeedNode as e:
+                    need.append((lid, fid, payload))
+                    asked[(lid, fid, e.sub)] = None
+            if not need:
+                break
+            keys = list(asked)
+            vals = ex.map(lambda k: read_node(f"matches/{k[0]}/{k[1]}/{k[2]}"), keys)
+            for (lid, fid, sub), v in zip(keys, vals):
+                nodes[(lid, fid)][sub] = v
+            reads += len(keys)
+            pending = need
+    print(f"📥 prefetch xG sources: fixtures={len(nodes)} reads={reads}")
+    return nodes
+
+def patch_fixtures(items, do_xg=True, dry_run=False):
+    """patch หลาย fixture: prefetch แหล่ง xG พร้อมกัน → cascade ในหน่วยความจำ → update_multi ครั้งเดียว"""
+    if not items:
+        print("ไม่มี fixture ให้ patch")
+        return
+    nodes = prefetch_xg_nodes(items) if do_xg else {}
+    updates: Dict[str, Any] = {}
+    for lid, fid, payload in items:
+        got = nodes.get((lid, fid), {})
+        one = build_fixture_updates(lid, fid, payload, lambda sub: got.get(sub) or {}, do_xg=do_xg)
+        if dry_run:
+            _print_dry(lid, fid, one)
+        updates.update(one)
+
+    if dry_run:
+        return
+    update_multi(updates)
+    print(f"✅ patched {len(items)} fixtures → matches/*/*/result")
+
 # -------------------- Entrypoints --------------------
 def run_from_json(json_path: str, do_xg=True, dry_run=False):
     with open(json_path, "r", encoding="utf-8") as f:
         items = json.load(f)
+    batch = []
     for it in items:
         lid = int(it["league_id"]); fid = int(it["fixture_id"])
-        payload = build_result_payload_from_json_item(it)
-        patch_one_fixture(lid, fid, payload, do_xg=do_xg, dry_run=dry_run)
+        batch.append((lid, fid, build_result_payload_from_json_item(it)))
+    patch_fixtures(batch, do_xg=do_xg, dry_run=dry_run)
 
 def run_single_fixture(fixture_id: int, league_id: int, do_xg=True, dry_run=False):
-    resp, _ = get(f"{BASE}/fixtures", {"id": fixture_id}, what=f"fixture {fixture_id}")
+    resp, _ = get("fixtures", {"id": fixture_id}, what=f"fixture {fixture_id}")
     if not resp:
         print("ไม่พบ fixture จาก API"); return
     fx = resp[0]
@@ -218,10 +286,11 @@ def run_single_fixture(fixture_id: int, league_id: int, do_xg=True, dry_run=Fals
 
 def run_by_dates(start_date: str, days: int, do_xg=True, dry_run=False):
     start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    batch = []
     for i in range(days):
         d = start + timedelta(days=i)
         ds = d.strftime("%Y-%m-%d")
-        fx, _ = get(f"{BASE}/fixtures", {"date": ds}, what=f"fixtures {ds}")
+        fx, _ = get("fixtures", {"date": ds}, what=f"fixtures {ds}")
         finished = [x for x in fx if (x.get("fixture", {}).get("status", {}).get("long") in FINISHED_STATES)]
         print(f"• {ds} finished: {len(finished)}")
         for f in finished:
@@ -234,8 +303,8 @@ def run_by_dates(start_date: str, days: int, do_xg=True, dry_run=False):
                 "winner": winner_from_fixture_like(f.get("goals") or {}, f.get("teams") or {}),
                 "stats": {},  # ถ้าต้องการ stats ควรใช้ af_results.py สร้าง JSON แล้วโหมด --json
             }
-            patch_one_fixture(lid, fid, payload, do_xg=do_xg, dry_run=dry_run)
-        time.sleep(0.2)
+            batch.append((lid, fid, payload))
+    patch_fixtures(batch, do_xg=do_xg, dry_run=dry_run)
 
 def main():
     ap = argparse.ArgumentParser()
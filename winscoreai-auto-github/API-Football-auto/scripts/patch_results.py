@@ -10,7 +10,14 @@ Patch finished results (HT/FT + xG) into Firebase:
 
 Usage:
   python .\scripts\patch_results.py --json results\results_full_YYYYMMDD_YYYYMMDD.json
-    [--mirror-old] [--index] [--last N] [--dry-run]
+    [--mirror-old] [--index] [--last N] [--dry-run] [--store PATH | --no-store] [--batch N]
+
+ไฟล์ถูกอ่านแบบ stream (json_stream) และเขียน Firebase ทีละ --batch fixtures (default $RESULTS_PATCH_BATCH หรือ 500)
+
+Team form:
+  ประวัติต่อทีมสะสมใน team_form_store (SQLite) → summary/last5 คำนวณจาก N นัดล่าสุดจริง
+  และเขียนเฉพาะทีมที่มีแมตช์ใหม่ในไฟล์นี้ (form/last5 ถูกแทนทั้ง node = ตัดนัดที่หลุด window)
+  --no-store = แบบเดิม (คิดจากแมตช์ในไฟล์นี้อย่างเดียว)
 
 Env needed when writing:
   FIREBASE_CREDENTIALS  (base64 of service-account JSON)  OR  FIREBASE_SA_PATH
@@ -20,6 +27,12 @@ Env needed when writing:
 import os, sys, json, argparse
 from datetime import datetime, timezone
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from team_form_store import TeamFormStore, TEAM_FORM_STORE_PATH
+from json_stream import FixtureStream, iter_batches
+
+RESULTS_PATCH_BATCH = int(os.getenv("RESULTS_PATCH_BATCH", "500"))
 
 ISO = lambda: datetime.now(timezone.utc).isoformat()
 
@@ -107,7 +120,75 @@ def parse_fixture(rec):
         "kickoff_ts": rec.get("kickoff_ts"),  # ← รับค่าที่ af_results.py ใส่มา
     }
 
-# -------- team form builder (from batch fixtures) --------
+# -------- team form builder --------
+def team_rows(r):
+    """แถวของแมตช์นี้ในมุมมองทีมเหย้า/เยือน: [(team_id, row), (team_id, row)]"""
+    fid = r["fixture_id"]
+    date = r["date"]
+    lid = r["league_id"]
+    h = r["teams"]["home"]["id"]
+    a = r["teams"]["away"]["id"]
+    ft = r["ft"]
+    xg = r["xg"]
+
+    # home perspective
+    resH, ptsH = wdl_and_pts(ft["h"], ft["a"])
+    rowH = {
+        "date": date, "fixture_id": fid, "league_id": lid,
+        "opp_id": a,
+        "res": resH, "pts": ptsH,
+        "gf": ft["h"] or 0, "ga": ft["a"] or 0, "gd": (0 if ft["h"] is None or ft["a"] is None else (ft["h"]-ft["a"])),
+        "xg_for": xg["h"] if xg["h"] is not None else 0.0,
+        "xg_against": xg["a"] if xg["a"] is not None else 0.0,
+        "xg_diff": ( (xg["h"] or 0.0) - (xg["a"] or 0.0) ),
+    }
+    # away perspective
+    resA, ptsA = wdl_and_pts(ft["a"], ft["h"])
+    rowA = {
+        "date": date, "fixture_id": fid, "league_id": lid,
+        "opp_id": h,
+        "res": resA, "pts": ptsA,
+        "gf": ft["a"] or 0, "ga": ft["h"] or 0, "gd": (0 if ft["h"] is None or ft["a"] is None else (ft["a"]-ft["h"])),
+        "xg_for": xg["a"] if xg["a"] is not None else 0.0,
+        "xg_against": xg["h"] if xg["h"] is not None else 0.0,
+        "xg_diff": ( (xg["a"] or 0.0) - (xg["h"] or 0.0) ),
+    }
+    return [(h, rowH), (a, rowA)]
+
+def summarize_team(last):
+    """last: แถวของทีม (เรียงเก่า→ใหม่ ตัดเหลือ N แล้ว) → {"last5": {...}, "summary": {...}}"""
+    # build last5 map
+    last_map = {int(r["fixture_id"]): {
+        "date": r["date"], "league_id": r["league_id"], "opp_id": r["opp_id"],
+        "res": r["res"], "pts": r["pts"],
+        "gf": r["gf"], "ga": r["ga"], "gd": r["gd"],
+        "xg_for": round(float(r["xg_for"]), 3),
+        "xg_against": round(float(r["xg_against"]), 3),
+        "xg_diff": round(float(r["xg_diff"]), 3),
+    } for r in last}
+
+    # aggregate summary
+    W = sum(1 for r in last if r["res"] == "W")
+    D = sum(1 for r in last if r["res"] == "D")
+    L = sum(1 for r in last if r["res"] == "L")
+    GF = sum(int(r["gf"]) for r in last)
+    GA = sum(int(r["ga"]) for r in last)
+    GD = GF - GA
+    xG_for = round(sum(float(r["xg_for"]) for r in last), 3)
+    xG_against = round(sum(float(r["xg_against"]) for r in last), 3)
+    xG_diff = round(xG_for - xG_against, 3)
+
+    return {
+        "last5": last_map,
+        "summary": {
+            "n": len(last),
+            "W": W, "D": D, "L": L,
+            "GF": GF, "GA": GA, "GD": GD,
+            "xG_for": xG_for, "xG_against": xG_against, "xG_diff": xG_diff,
+            "updated_at": ISO(),
+        }
+    }
+
 def build_team_forms(fixtures, last_n=5):
     """
     fixtures: list of normalized fixtures (from parse_fixture)
@@ -116,78 +197,55 @@ def build_team_forms(fixtures, last_n=5):
         "summary": {...}
     }
     """
+    return build_team_forms_from_rows([p for r in fixtures for p in team_rows(r)], last_n=last_n)
+
+def build_team_forms_from_rows(pairs, last_n=5):
+    """pairs: [(team_id, row)] จาก team_rows"""
     # collect per team, per date
     by_team = defaultdict(list)
-    for r in fixtures:
-        fid = r["fixture_id"]
-        date = r["date"]
-        lid = r["league_id"]
-        h = r["teams"]["home"]["id"]
-        a = r["teams"]["away"]["id"]
-        ht = r["ht"]; ft = r["ft"]
-        xg = r["xg"]
-
-        # home perspective
-        resH, ptsH = wdl_and_pts(ft["h"], ft["a"])
-        by_team[h].append({
-            "date": date, "fixture_id": fid, "league_id": lid,
-            "opp_id": a,
-            "res": resH, "pts": ptsH,
-            "gf": ft["h"] or 0, "ga": ft["a"] or 0, "gd": (0 if ft["h"] is None or ft["a"] is None else (ft["h"]-ft["a"])),
-            "xg_for": xg["h"] if xg["h"] is not None else 0.0,
-            "xg_against": xg["a"] if xg["a"] is not None else 0.0,
-            "xg_diff": ( (xg["h"] or 0.0) - (xg["a"] or 0.0) ),
-        })
-        # away perspective
-        resA, ptsA = wdl_and_pts(ft["a"], ft["h"])
-        by_team[a].append({
-            "date": date, "fixture_id": fid, "league_id": lid,
-            "opp_id": h,
-            "res": resA, "pts": ptsA,
-            "gf": ft["a"] or 0, "ga": ft["h"] or 0, "gd": (0 if ft["h"] is None or ft["a"] is None else (ft["a"]-ft["h"])),
-            "xg_for": xg["a"] if xg["a"] is not None else 0.0,
-            "xg_against": xg["h"] if xg["h"] is not None else 0.0,
-            "xg_diff": ( (xg["a"] or 0.0) - (xg["h"] or 0.0) ),
-        })
+    for tid, row in pairs:
+        by_team[tid].append(row)
 
     # sort by date and take last N, then aggregate
     out = {}
     for tid, rows in by_team.items():
         rows.sort(key=lambda r: r["date"])  # asc
         last = rows[-last_n:] if last_n > 0 else rows[:]
-        # build last5 map
-        last_map = {int(r["fixture_id"]): {
-            "date": r["date"], "league_id": r["league_id"], "opp_id": r["opp_id"],
-            "res": r["res"], "pts": r["pts"],
-            "gf": r["gf"], "ga": r["ga"], "gd": r["gd"],
-            "xg_for": round(float(r["xg_for"]), 3),
-            "xg_against": round(float(r["xg_against"]), 3),
-            "xg_diff": round(float(r["xg_diff"]), 3),
-        } for r in last}
-
-        # aggregate summary
-        W = sum(1 for r in last if r["res"] == "W")
-        D = sum(1 for r in last if r["res"] == "D")
-        L = sum(1 for r in last if r["res"] == "L")
-        GF = sum(int(r["gf"]) for r in last)
-        GA = sum(int(r["ga"]) for r in last)
-        GD = GF - GA
-        xG_for = round(sum(float(r["xg_for"]) for r in last), 3)
-        xG_against = round(sum(float(r["xg_against"]) for r in last), 3)
-        xG_diff = round(xG_for - xG_against, 3)
-
-        out[int(tid)] = {
-            "last5": last_map,
-            "summary": {
-                "n": len(last),
-                "W": W, "D": D, "L": L,
-                "GF": GF, "GA": GA, "GD": GD,
-                "xG_for": xG_for, "xG_against": xG_against, "xG_diff": xG_diff,
-                "updated_at": ISO(),
-            }
-        }
+        out[int(tid)] = summarize_team(last)
     return out
 
+def seed_store_from_firebase(store, team_ids, dry_run=False):
+    """
+    เติม store ด้วย teams/{tid}/form/last5 จาก Firebase สำหรับทีมที่ store ยังไม่รู้จัก
+    คืน set ของทีมที่ store มีประวัติครบ (เขียน last5 แทนทั้ง node ได้)
+    dry_run: ไม่อ่าน Firebase — ทีมที่ยังไม่ seed จะ preview แบบเพิ่มทีละนัด
+    init/credential พัง = error ของรอบนี้ (ไม่ใช่ "ยังไม่ seed")
+    """
+    todo = store.unseeded(team_ids)
+    if not todo:
+        return set(team_ids)
+    if dry_run:
+        print(f"ไม่เขียน Firebase รอบนี้: ข้ามการ seed team form ({len(todo)} ทีม)")
+        return set(team_ids) - set(todo)
+    import fb_client
+    from firebase_admin import exceptions as fa_ex
+    fb_client.init_firebase()  # ครั้งเดียวก่อนแตก thread (init_firebase ไม่ thread-safe)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as ex:
+            nodes = list(ex.map(lambda t: fb_client.get(f"teams/{t}/form/last5"), todo))
+    except fa_ex.FirebaseError as e:
+        print(f"⚠️ ดึง form เดิมจาก Firebase ไม่ได้ ({e}) — {len(todo)} ทีมจะเขียน last5 แบบเพิ่มทีละนัด (ไม่ตัดของเก่า)")
+        return set(team_ids) - set(todo)
+    for t, node in zip(todo, nodes):
+        store.seed(t, node if isinstance(node, dict) else {})
+    print(f"🌱 seed team form store จาก Firebase: {len(todo)} ทีม")
+    return set(team_ids)
+
+def build_team_forms_from_store(store, pairs, last_n=5):
+    """เพิ่มแมตช์ (pairs จาก team_rows) ลง store แล้วคำนวณ form จาก N นัดล่าสุดจริง เฉพาะทีมที่ถูกแตะ"""
+    touched = store.add(pairs)
+    return {int(tid): summarize_team(store.last_n(tid, last_n)) for tid in sorted(touched)}
+
 # -------- main --------
 def main():
     ap = argparse.ArgumentParser()
@@ -196,87 +254,130 @@ def main():
     ap.add_argument("--index", action="store_true", help="write simple indexes under /idx/*")
     ap.add_argument("--last", type=int, default=5, help="team form windows (default=5)")
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--store", default=TEAM_FORM_STORE_PATH, help="SQLite ประวัติต่อทีม (team_form_store)")
+    ap.add_argument("--no-store", action="store_true", help="คิด form จากไฟล์นี้อย่างเดียว (แบบเดิม)")
+    ap.add_argument("--batch", type=int, default=RESULTS_PATCH_BATCH, help="fixtures per read/write batch")
     args = ap.parse_args()
 
-    with open(args.json, encoding="utf-8") as f:
-        payload = json.load(f)
-
-    fixtures_in = payload.get("fixtures", [])
-    print(f"อ่าน: {args.json} | fixtures={len(fixtures_in)}")
-
-    # normalize all fixtures
-    fixtures = [parse_fixture(rec) for rec in fixtures_in]
-
-    updates = {}
-
-    # 1) matches/{lid}/{fid}/result  (+ optional legacy mirror)
-    for r in fixtures:
-        lid = r["league_id"]; fid = r["fixture_id"]
-        node = f"matches/{lid}/{fid}/result"
-        updates[node] = {
-            "date": r["date"],
-            "kickoff_ts": r.get("kickoff_ts"),  # ← เพิ่มบรรทัดนี้
-            "season": r["season"],
-            "league_id": lid,
-            "fixture_id": fid,
-            "teams": r["teams"],
-            "ht": r["ht"],
-            "ft": r["ft"],
-            "winner": r["winner"],
-            "xg": {"home": r["xg"]["h"], "away": r["xg"]["a"]},
-            "meta": {
-                "ingested_at": ISO(),
-                "source": "api-sports-v3",
-            }
-        }
-        if args.mirror_old:
-            legacy = f"matches/{lid}/{fid}/results"
-            updates[legacy] = {
+    stream = FixtureStream(args.json)
+    print(f"อ่าน (stream): {args.json} | batch={args.batch}")
+
+    update_multi = None
+    if not args.dry_run:
+        update_multi = load_update_multi()
+        if not update_multi:
+            print("⚠️ ไม่พบ fb_client.update_multi — ข้ามการเขียน Firebase (พิมพ์อย่างเดียว)")
+
+    run = {"batches": 0, "keys_total": 0, "chunks_fail": 0}
+
+    def write(updates):
+        """preview batch แรก แล้วส่ง update_multi ทีละ batch"""
+        if not updates:
+            return
+        if run["batches"] == 0:
+            preview(updates)
+        run["batches"] += 1
+        run["keys_total"] += len(updates)
+        if not update_multi:
+            return
+        ok = update_multi(updates)
+        if not isinstance(ok, dict) or ok.get("chunks_fail"):
+            run["chunks_fail"] += ok.get("chunks_fail", 1) if isinstance(ok, dict) else 1
+
+    n_fixtures = 0
+    pairs = []  # (team_id, row) ต่อแมตช์ — เก็บไว้คิด team form ตอนท้าย (เล็กกว่า record เต็มมาก)
+
+    for batch in iter_batches(stream, max(1, args.batch)):
+        # normalize fixtures ของ batch นี้
+        fixtures = [parse_fixture(rec) for rec in batch]
+        n_fixtures += len(fixtures)
+        updates = {}
+
+        # 1) matches/{lid}/{fid}/result  (+ optional legacy mirror)
+        for r in fixtures:
+            lid = r["league_id"]; fid = r["fixture_id"]
+            node = f"matches/{lid}/{fid}/result"
+            updates[node] = {
                 "date": r["date"],
+                "kickoff_ts": r.get("kickoff_ts"),  # ← เพิ่มบรรทัดนี้
                 "season": r["season"],
-                "teams": {
-                    "home": r["teams"]["home"]["name"],
-                    "away": r["teams"]["away"]["name"],
-                },
-                "score": {
-                    "ht": {"home": r["ht"]["h"], "away": r["ht"]["a"]},
-                    "ft": {"home": r["ft"]["h"], "away": r["ft"]["a"]},
-                    "winner": r["winner"],
-                },
+                "league_id": lid,
+                "fixture_id": fid,
+                "teams": r["teams"],
+                "ht": r["ht"],
+                "ft": r["ft"],
+                "winner": r["winner"],
                 "xg": {"home": r["xg"]["h"], "away": r["xg"]["a"]},
-                "ingested_at": ISO()
+                "meta": {
+                    "ingested_at": ISO(),
+                    "source": "api-sports-v3",
+                }
             }
-            
-
-            
-
-    # 2) team forms (last N) + summary (single path)
-    team_forms = build_team_forms(fixtures, last_n=args.last)
+            if args.mirror_old:
+                legacy = f"matches/{lid}/{fid}/results"
+                updates[legacy] = {
+                    "date": r["date"],
+                    "season": r["season"],
+                    "teams": {
+                        "home": r["teams"]["home"]["name"],
+                        "away": r["teams"]["away"]["name"],
+                    },
+                    "score": {
+                        "ht": {"home": r["ht"]["h"], "away": r["ht"]["a"]},
+                        "ft": {"home": r["ft"]["h"], "away": r["ft"]["a"]},
+                        "winner": r["winner"],
+                    },
+                    "xg": {"home": r["xg"]["h"], "away": r["xg"]["a"]},
+                    "ingested_at": ISO()
+                }
+            pairs.extend(team_rows(r))
+
+        # 3) (optional) indexes for faster lookup
+        if args.index:
+            for r in fixtures:
+                ds = r["date"]; lid = r["league_id"]; fid = r["fixture_id"]
+                h = r["teams"]["home"]["id"]; a = r["teams"]["away"]["id"]
+                # ค่า = league_id → predictor หา matches/{lid}/{fid} ได้จากการอ่านวันเดียว
+                updates[f"idx/date_fixtures/{ds}/{fid}"] = lid
+                updates[f"idx/team_fixtures/{h}/{ds}/{fid}"] = True
+                updates[f"idx/team_fixtures/{a}/{ds}/{fid}"] = True
+                updates[f"idx/league_fixtures/{lid}/{ds}/{fid}"] = True
+
+        write(updates)
+
+    print(f"อ่าน: {args.json} | fixtures={n_fixtures}")
+
+    # 2) team forms (last N) + summary (single path) — หลังอ่านครบทุก batch
+    updates = {}
+    store = None
+    full_history = set()
+    if args.no_store:
+        team_forms = build_team_forms_from_rows(pairs, last_n=args.last)
+    else:
+        store = TeamFormStore(args.store)
+        full_history = seed_store_from_firebase(store, {tid for tid, _ in pairs}, dry_run=not update_multi)
+        team_forms = build_team_forms_from_store(store, pairs, last_n=args.last)
     for tid, obj in team_forms.items():
         # last5
-        for fid, row in obj["last5"].items():
-            updates[f"teams/{tid}/form/last5/{fid}"] = row
+        if tid in full_history:
+            # แทนทั้ง node → นัดที่หลุด window ถูกลบไปด้วย
+            updates[f"teams/{tid}/form/last5"] = obj["last5"]
+        else:
+            for fid, row in obj["last5"].items():
+                updates[f"teams/{tid}/form/last5/{fid}"] = row
         # single summary path (แก้เรื่องมี 2 summary → เขียน path เดียว)
         updates[f"teams/{tid}/summary"] = obj["summary"]
 
-    # 3) (optional) indexes for faster lookup
-    if args.index:
-        for r in fixtures:
-            ds = r["date"]; lid = r["league_id"]; fid = r["fixture_id"]
-            h = r["teams"]["home"]["id"]; a = r["teams"]["away"]["id"]
-            updates[f"idx/date_fixtures/{ds}/{fid}"] = True
-            updates[f"idx/team_fixtures/{h}/{ds}/{fid}"] = True
-            updates[f"idx/team_fixtures/{a}/{ds}/{fid}"] = True
-            updates[f"idx/league_fixtures/{lid}/{ds}/{fid}"] = True
-
     # summary/monitor
     updates["monitoring/results/last_run"] = {
         "run_at": ISO(),
         "input_json": os.path.basename(args.json),
-        "fixtures": len(fixtures),
+        "fixtures": n_fixtures,
         "last_window": args.last,
         "mirror_old": bool(args.mirror_old),
         "indexed": bool(args.index),
+        "teams_updated": len(team_forms),
+        "batches": run["batches"] + 1,
         "env": {
             "GITHUB_WORKFLOW": os.getenv("GITHUB_WORKFLOW"),
             "GITHUB_JOB": os.getenv("GITHUB_JOB"),
@@ -285,22 +386,25 @@ def main():
             "GITHUB_REPOSITORY": os.getenv("GITHUB_REPOSITORY"),
         }
     }
-
-    # show
-    preview(updates)
+    write(updates)
 
     if args.dry_run:
         print("DRY-RUN: ข้ามการเขียน Firebase")
+        if store: store.close()  # ไม่จำแมตช์ของ dry-run
         return
-
-    update_multi = load_update_multi()
     if not update_multi:
-        print("⚠️ ไม่พบ fb_client.update_multi — ข้ามการเขียน Firebase (พิมพ์อย่างเดียว)")
+        if store: store.close()
         return
 
-    ok = update_multi(updates)
-    print("\n✅ Firebase update_multi:", ok)
-    print("keys_total:", len(updates))
+    print(f"\n✅ Firebase update_multi: batches={run['batches']}, chunks_fail={run['chunks_fail']}")
+    print("keys_total:", run["keys_total"])
+    if store:
+        # จำประวัติเฉพาะเมื่อเขียนครบ ไม่งั้นรอบหน้าจะคิดว่าทีมเหล่านี้ seed/อัปเดตแล้ว
+        if run["chunks_fail"]:
+            print("⚠️ มี chunk ล้มเหลว — ไม่บันทึก team form store รอบนี้")
+        else:
+            store.commit()
+        store.close()
 
 if __name__ == "__main__":
     main()
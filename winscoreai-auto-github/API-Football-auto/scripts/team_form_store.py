@@ -0,0 +1,106 @@
+# scripts/team_form_store.py
+# -*- coding: utf-8 -*-
+"""
+ประวัติผลแข่งต่อทีมบนดิสก์ (SQLite) สำหรับ patch_results — ให้ form/summary เป็น last-N จริง
+ไม่ใช่แค่แมตช์ในไฟล์ results_full ของวันนั้น
+
+- 1 แถวต่อ (team_id, fixture_id) ในมุมมองของทีมนั้น (res/pts/gf/ga/xg ...)
+- add() คืนชุดทีมที่มีแมตช์ใหม่ → patch_results เขียนเฉพาะทีมเหล่านี้
+- ทีมที่ยังไม่เคยมีใน store (เช่น runner ใหม่/cache หาย) ดึง teams/{tid}/form/last5 จาก Firebase มาเติมก่อน
+- add()/seed() ยังไม่ commit — ผู้เรียก commit() หลังเขียน Firebase สำเร็จ (dry-run/ล้มเหลว = ไม่จำ)
+
+Env:
+  TEAM_FORM_STORE_PATH  (default API-Football-auto/results/team_form.sqlite)
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+TEAM_FORM_STORE_PATH = os.getenv(
+    "TEAM_FORM_STORE_PATH",
+    str(Path(__file__).resolve().parent.parent / "results" / "team_form.sqlite"),
+)
+
+FIELDS = ["date", "fixture_id", "league_id", "opp_id", "res", "pts",
+          "gf", "ga", "gd", "xg_for", "xg_against", "xg_diff"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS team_matches (
+    team_id    INTEGER NOT NULL,
+    fixture_id INTEGER NOT NULL,
+    date       TEXT,
+    league_id  INTEGER,
+    opp_id     INTEGER,
+    res        TEXT,
+    pts        INTEGER,
+    gf         INTEGER,
+    ga         INTEGER,
+    gd         INTEGER,
+    xg_for     REAL,
+    xg_against REAL,
+    xg_diff    REAL,
+    PRIMARY KEY (team_id, fixture_id)
+);
+CREATE INDEX IF NOT EXISTS team_matches_date ON team_matches(team_id, date);
+CREATE TABLE IF NOT EXISTS teams_seeded (
+    team_id INTEGER PRIMARY KEY
+);
+"""
+
+class TeamFormStore:
+    def __init__(self, path: str = TEAM_FORM_STORE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()  # ส่วนที่ยังไม่ commit ถูกทิ้ง
+
+    def _upsert(self, tid: int, row: dict):
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO team_matches(team_id, {', '.join(FIELDS)}) "
+            f"VALUES (?, {', '.join('?' * len(FIELDS))})",
+            [int(tid)] + [row.get(k) for k in FIELDS],
+        )
+
+    def add(self, team_rows) -> set:
+        """team_rows: [(team_id, row)] → คืน set ของ team_id ที่ถูกแตะ"""
+        touched = set()
+        for tid, row in team_rows:
+            self._upsert(tid, row)
+            touched.add(int(tid))
+        return touched
+
+    def unseeded(self, team_ids) -> list:
+        seeded = {r[0] for r in self.conn.execute("SELECT team_id FROM teams_seeded")}
+        return [t for t in team_ids if t not in seeded]
+
+    def seed(self, tid: int, last5: dict):
+        """เติมประวัติจาก teams/{tid}/form/last5 ใน Firebase (ไม่ทับแถวที่มีอยู่แล้ว)"""
+        for fid, row in (last5 or {}).items():
+            if not isinstance(row, dict):
+                continue
+            vals = [int(fid) if k == "fixture_id" else row.get(k) for k in FIELDS]
+            vals = [0 if v is None and k not in ("date", "res") else v for k, v in zip(FIELDS, vals)]
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO team_matches(team_id, {', '.join(FIELDS)}) "
+                f"VALUES (?, {', '.join('?' * len(FIELDS))})",
+                [int(tid)] + vals,
+            )
+        self.conn.execute("INSERT OR IGNORE INTO teams_seeded(team_id) VALUES (?)", (int(tid),))
+
+    def last_n(self, tid: int, n: int) -> list:
+        """แมตช์ล่าสุด n นัดของทีม เรียงเก่า→ใหม่ (n <= 0 = ทั้งหมด)"""
+        sql = (f"SELECT {', '.join(FIELDS)} FROM team_matches WHERE team_id=? "
+               "ORDER BY date DESC, fixture_id DESC")
+        args = [int(tid)]
+        if n > 0:
+            sql += " LIMIT ?"
+            args.append(n)
+        rows = [dict(zip(FIELDS, r)) for r in self.conn.execute(sql, args)]
+        rows.reverse()
+        return rows
@@ -2,6 +2,9 @@
 import os
 import re
 import json
+import math
+import time
+import random
 import firebase_admin
 from typing import Any
 from firebase_admin import credentials, db
@@ -66,20 +69,67 @@ def sanitize_for_firebase(obj: Any) -> Any:
         return [sanitize_for_firebase(v) for v in obj]
     return obj
 
-def push_ai_prediction(ai_data: dict, date_str: str, fixture_id: str):
-    from firebase_admin import db
+def build_prediction_update(ai_data: dict, date_str: str, fixture_id: str) -> tuple[str, dict]:
+    """คืน (path, data) ของ predictions/{fixture_id}/{date} ที่ sanitize แล้ว"""
     safe_fixture_id = safe_key(str(fixture_id))
     clean_data = sanitize_for_firebase(ai_data)  # ✅ สำคัญ
 
     # (ถ้าจะกันวันที่มีปัญหา ก็ใช้ safe_key ได้เช่นกัน)
     safe_date = safe_key(str(date_str))
 
-    path = f"predictions/{safe_fixture_id}/{safe_date}"
+    return f"predictions/{safe_fixture_id}/{safe_date}", clean_data
+
+def push_ai_prediction(ai_data: dict, date_str: str, fixture_id: str):
+    from firebase_admin import db
+    path, clean_data = build_prediction_update(ai_data, date_str, fixture_id)
     print(f"[push] → {path}")  # debug path
     ref = db.reference(path)
     ref.set(clean_data)
     print("✅ pushed prediction")
-    
+
+# ---------- B) batched prediction writer ----------
+# env แยกจาก FB_UPDATE_* ของ API-Football-auto/scripts/fb_client.py (default chunk ต่างกัน: 500 vs 2000)
+# ไม่ import fb_client ตรง ๆ เพราะอยู่อีก tree และ init firebase_admin จาก credential คนละชุด
+_PRED_CHUNK_SIZE = int(os.getenv("FB_PRED_CHUNK_SIZE", "500"))
+_PRED_RETRIES    = int(os.getenv("FB_PRED_RETRIES", "5"))
+_PRED_BASE_SLEEP = float(os.getenv("FB_PRED_BASE_SLEEP", "0.8"))
+_PRED_MAX_SLEEP  = float(os.getenv("FB_PRED_MAX_SLEEP", "8.0"))
+
+def _update_root_with_retry(payload: dict, label: str) -> int:
+    """multi-location update ที่ root พร้อม retry/backoff+jitter; คืนจำนวน attempt"""
+    for attempt in range(1, _PRED_RETRIES + 1):
+        try:
+            db.reference("/").update(payload)
+            return attempt
+        except Exception as e:
+            print(f"⚠️  {label} failed attempt {attempt}/{_PRED_RETRIES}: {e}")
+            if attempt >= _PRED_RETRIES:
+                raise
+            base = min(_PRED_MAX_SLEEP, _PRED_BASE_SLEEP * (2 ** (attempt - 1)))
+            time.sleep(base + random.random() * 0.5)
+
+def push_ai_predictions(updates: dict, chunk_size: int | None = None) -> dict:
+    """
+    เขียน predictions หลายรายการเป็น multi-location update ที่ root ทีละ chunk
+    updates = {path: data} จาก build_prediction_update
+    """
+    if not updates:
+        print("ℹ️ push_ai_predictions: no predictions to write.")
+        return {"keys_total": 0, "chunks_total": 0, "retries_used": 0}
+
+    items = list(updates.items())
+    cs = chunk_size or _PRED_CHUNK_SIZE
+    total_chunks = math.ceil(len(items) / cs)
+    t0 = time.time()
+    retries = 0
+    for i in range(total_chunks):
+        chunk = dict(items[i * cs:(i + 1) * cs])
+        attempts = _update_root_with_retry(chunk, f"predictions chunk {i+1}/{total_chunks}")
+        retries += attempts - 1
+    dur = time.time() - t0
+    print(f"✅ pushed {len(items)} predictions in {total_chunks} request(s), retries={retries}, took {dur:.2f}s")
+    return {"keys_total": len(items), "chunks_total": total_chunks, "retries_used": retries, "duration_s": round(dur, 3)}
+
 def push_team_mapping_to_firebase(map_dict: dict, path: str = "team_mapping/eng_to_th"):
     ref = db.reference(path)
     ref.set(map_dict)
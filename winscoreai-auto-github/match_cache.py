@@ -0,0 +1,287 @@
+# match_cache.py
+# -*- coding: utf-8 -*-
+"""
+cache ของ Firebase matches บนดิสก์ (SQLite) + delta refresh
+
+- โหลดครั้งแรก: ดึง matches/{league_id} ทีละลีก แล้วเก็บ 1 แถวต่อ fixture
+  (league_id, fixture_id, date, home, away, stamp, body=JSON ของ node)
+- ครั้งต่อไป: ต่อลีกจะ query เฉพาะ fixture ที่ stamp (meta.ingested_at / meta.updated_at)
+  ใหม่กว่า high-water mark ที่ cache จำไว้ → โหลดแค่ส่วนที่เปลี่ยน
+- fixture ที่ถูกลบใน Firebase จะไม่ถูกลบจาก cache จนกว่าจะ --full
+- โครงเก่า matches/{league_id}/{season}/{fixture_id}: จำ season ที่เจอตอนโหลดเต็มไว้ แล้ว query ต่อ season
+  (season ใหม่ในโครงเก่าจะเห็นหลัง --full)
+
+delta query = orderByChild บน path ลึก → Firebase ต้องมี .indexOn ไม่งั้นตอบ 400 "Index not defined"
+  index ที่ต้องใช้อยู่ใน database.rules.json (matches/$league_id และ matches/$league_id/$season)
+  ไฟล์นั้นมีแค่ .indexOn — merge เข้า rules เดิมของโปรเจ็คก่อน deploy (firebase deploy --only database ทับทั้งไฟล์)
+  MATCH_CACHE (enabled()) คุมทุกผู้เรียก: 1=delta, 0=ไม่ใช้ delta (default จนกว่าจะ deploy index), auto=delta เมื่อมีไฟล์ cache แล้ว
+  predictor ใช้ cache เฉพาะเมื่อ enabled(); tools เรียก sync() → ปิดอยู่ = โหลดเต็ม (ไม่ยิง delta query ที่ต้องมี index)
+
+ใช้โดย predictor.build_match_index, tools/suggest_aliases.py, tools/inspect_matches.py
+(ผู้เรียกต้อง init firebase_admin เอง)
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python match_cache.py [--full]
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase_admin import db, exceptions
+
+MATCH_CACHE_PATH = os.getenv(
+    "MATCH_CACHE_PATH",
+    str(Path(__file__).resolve().parent / "understat_scraper_auto" / "data" / "match_cache.sqlite"),
+)
+# 1=ใช้ delta sync, 0=ไม่ใช้ (default), auto=ใช้เมื่อมีไฟล์ cache แล้ว (python match_cache.py)
+MATCH_CACHE = os.getenv("MATCH_CACHE", "0").strip().lower()
+MATCH_CACHE_WORKERS = int(os.getenv("MATCH_CACHE_WORKERS", "8"))
+# ถอย high-water mark ไปเล็กน้อย กันนาฬิกาของแต่ละ runner ไม่ตรงกัน
+MATCH_CACHE_OVERLAP_SEC = int(os.getenv("MATCH_CACHE_OVERLAP_SEC", "600"))
+
+# child path (ใต้ fixture) ที่ใช้เป็น stamp สำหรับ delta query
+STAMP_FIELDS = [
+    "result/meta/ingested_at",          # patch_results.py
+    "result/meta/updated_at",           # patch_result.py
+    "results/ingested_at",              # legacy mirror
+    "odds_features/meta/updated_at",    # patch_odds.py
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixtures (
+    league_id  TEXT NOT NULL,
+    fixture_id TEXT NOT NULL,
+    date       TEXT,
+    home       TEXT,
+    away       TEXT,
+    stamp      TEXT,
+    body       TEXT NOT NULL,
+    PRIMARY KEY (league_id, fixture_id)
+);
+CREATE INDEX IF NOT EXISTS fixtures_date ON fixtures(date);
+CREATE TABLE IF NOT EXISTS hwm (
+    league_id TEXT NOT NULL,
+    field     TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    PRIMARY KEY (league_id, field)
+);
+CREATE TABLE IF NOT EXISTS legacy_seasons (
+    league_id TEXT NOT NULL,
+    season    TEXT NOT NULL,
+    PRIMARY KEY (league_id, season)
+);
+"""
+# 1 = จำ legacy_seasons แล้ว; cache ที่เก่ากว่านี้ไม่รู้ season → โหลดเต็มใหม่ทุกลีก
+SCHEMA_VERSION = 1
+
+# ---------- node helpers ----------
+def extract_results_node(node: dict) -> dict | None:
+    """คืน dict ที่มี fields date, teams.home.name, teams.away.name ไม่ว่ามันจะอยู่ที่ results หรือระดับบน"""
+    if not isinstance(node, dict):
+        return None
+    # กรณีมาตรฐาน: มี result (patch_results) / results (legacy)
+    for key in ("result", "results"):
+        res = node.get(key)
+        if isinstance(res, dict) and isinstance(res.get("teams"), dict) and res.get("date"):
+            return res
+    # กรณีบาง feed ใส่ไว้บนสุดเลย
+    if node.get("date") and isinstance(node.get("teams"), dict):
+        return node
+    return None
+
+def team_name(team) -> str | None:
+    # result ใหม่: {"id", "name"} / results (legacy mirror): ชื่อเป็น string
+    return team.get("name") if isinstance(team, dict) else team
+
+def fixture_summary(node: dict) -> tuple[str | None, str | None, str | None]:
+    """(date, home, away) ของ fixture node — ไม่พบคืน None"""
+    res = extract_results_node(node)
+    if not res:
+        return None, None, None
+    teams = res.get("teams", {}) or {}
+    home = team_name(teams.get("home")) or res.get("home_name") or res.get("home")
+    away = team_name(teams.get("away")) or res.get("away_name") or res.get("away")
+    return (str(res["date"]), home, away)
+
+def _child(node, path: str):
+    cur = node
+    for p in path.split("/"):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(p)
+    return cur
+
+def _stamps(node: dict) -> dict:
+    return {f: v for f in STAMP_FIELDS if isinstance(v := _child(node, f), str) and v}
+
+def _is_fixture(node) -> bool:
+    return isinstance(node, dict) and (
+        extract_results_node(node) is not None
+        or any(k in node for k in ("result", "results", "odds_features"))
+    )
+
+def flatten_league(league_node, seasons: list | None = None) -> dict:
+    """
+    {fixture_id: node} — รองรับ matches/{lid}/{fid} และแบบเก่า matches/{lid}/{season}/{fid}
+    seasons: ถ้าส่ง list มา จะเติม key ของ season (โครงเก่า) ที่เจอ
+    """
+    out = {}
+    for key, node in (league_node or {}).items():
+        if not isinstance(node, dict):
+            continue
+        if not _is_fixture(node) and node and all(_is_fixture(v) for v in node.values()):
+            out.update({str(fid): sub for fid, sub in node.items()})
+            if seasons is not None:
+                seasons.append(str(key))
+        else:
+            out[str(key)] = node
+    return out
+
+def _rewind(stamp: str) -> str:
+    try:
+        return (datetime.fromisoformat(stamp) - timedelta(seconds=MATCH_CACHE_OVERLAP_SEC)).isoformat()
+    except ValueError:
+        return stamp
+
+# ---------- SQLite ----------
+def connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or MATCH_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        with conn:
+            conn.execute("DELETE FROM hwm")  # ไม่มี hwm = โหลดเต็มรอบหน้า
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+def exists(path: str | None = None) -> bool:
+    return os.path.exists(path or MATCH_CACHE_PATH)
+
+def enabled(path: str | None = None) -> bool:
+    """เปิด delta sync ตาม MATCH_CACHE ไหม"""
+    if MATCH_CACHE == "auto":
+        return exists(path)
+    return MATCH_CACHE in ("1", "true", "yes")
+
+def _upsert(conn, lid: str, fixtures: dict):
+    rows = []
+    for fid, node in fixtures.items():
+        date, home, away = fixture_summary(node)
+        stamps = _stamps(node)
+        rows.append((lid, fid, date, home, away, max(stamps.values(), default=None),
+                     json.dumps(node, ensure_ascii=False, separators=(",", ":"))))
+    conn.executemany("INSERT OR REPLACE INTO fixtures VALUES (?,?,?,?,?,?,?)", rows)
+
+def _bump_hwm(conn, lid: str, fixtures: dict, hwm: dict):
+    for f in STAMP_FIELDS:
+        seen = [s[f] for s in map(_stamps, fixtures.values()) if f in s]
+        value = max([hwm.get(f, ""), *seen])
+        conn.execute("INSERT OR REPLACE INTO hwm VALUES (?,?,?)", (lid, f, value))
+
+# ---------- refresh ----------
+def _fetch_league_full(lid: str) -> tuple[dict, list]:
+    """(fixtures, season ของโครงเก่าที่เจอ)"""
+    seasons = []
+    return flatten_league(db.reference(f"matches/{lid}").get(), seasons), seasons
+
+def _fetch_league_delta(lid: str, hwm: dict, seasons=()) -> dict:
+    out = {}
+    # ลูกตรงของ matches/{lid} (โครงใหม่) + ลูกของแต่ละ season (โครงเก่า)
+    for base in [f"matches/{lid}", *(f"matches/{lid}/{s}" for s in seasons)]:
+        for f in STAMP_FIELDS:
+            # ยังไม่เคยเห็น stamp นี้ในลีก → "" = เอาทุก fixture ที่เพิ่งมี field นี้
+            since = hwm.get(f, "")
+            got = db.reference(base).order_by_child(f).start_at(_rewind(since) if since else "").get() or {}
+            out.update({str(k): v for k, v in got.items() if isinstance(v, dict)})
+    return out
+
+def refresh(full: bool = False, path: str | None = None) -> dict:
+    """
+    sync cache กับ Firebase
+    - ลีกที่ยังไม่มีใน cache หรือ full=True → โหลดทั้งลีก
+    - ลีกที่มีแล้ว → โหลดเฉพาะ fixture ที่ stamp ใหม่กว่า high-water mark
+    """
+    conn = connect(path)
+    try:
+        leagues = sorted(str(k) for k in (db.reference("matches").get(shallow=True) or {}))
+        hwm_all, seasons_all = {}, {}
+        for lid, f, v in conn.execute("SELECT league_id, field, value FROM hwm"):
+            hwm_all.setdefault(lid, {})[f] = v
+        for lid, season in conn.execute("SELECT league_id, season FROM legacy_seasons"):
+            seasons_all.setdefault(lid, []).append(season)
+
+        def _one(lid):
+            if full or lid not in hwm_all:
+                return lid, True, *_fetch_league_full(lid)
+            try:
+                return lid, False, _fetch_league_delta(lid, hwm_all[lid], seasons_all.get(lid, ())), None
+            except exceptions.FirebaseError as e:
+                # ส่วนใหญ่คือยังไม่ได้ deploy .indexOn (400 Index not defined)
+                print(f"⚠️ delta query ลีก {lid} ไม่ผ่าน ({e}) — โหลดทั้งลีกแทน")
+                return lid, True, *_fetch_league_full(lid)
+
+        with ThreadPoolExecutor(max_workers=MATCH_CACHE_WORKERS) as ex:
+            results = list(ex.map(_one, leagues))
+
+        stats = {"leagues": len(leagues), "full_leagues": 0, "fixtures_fetched": 0}
+        with conn:
+            for lid, is_full, fixtures, seasons in results:
+                if is_full:
+                    conn.execute("DELETE FROM fixtures WHERE league_id = ?", (lid,))
+                    conn.execute("DELETE FROM hwm WHERE league_id = ?", (lid,))
+                    conn.execute("DELETE FROM legacy_seasons WHERE league_id = ?", (lid,))
+                    conn.executemany("INSERT INTO legacy_seasons VALUES (?,?)", [(lid, s) for s in seasons])
+                    stats["full_leagues"] += 1
+                _upsert(conn, lid, fixtures)
+                _bump_hwm(conn, lid, fixtures, {} if is_full else hwm_all.get(lid, {}))
+                stats["fixtures_fetched"] += len(fixtures)
+            # ลีกที่หายไปจาก Firebase
+            gone = set(hwm_all) - set(leagues)
+            for lid in gone:
+                conn.execute("DELETE FROM fixtures WHERE league_id = ?", (lid,))
+                conn.execute("DELETE FROM hwm WHERE league_id = ?", (lid,))
+                conn.execute("DELETE FROM legacy_seasons WHERE league_id = ?", (lid,))
+        stats["fixtures_total"] = conn.execute("SELECT COUNT(*) FROM fixtures").fetchone()[0]
+        print(f"🗃️ match cache: {stats['fixtures_fetched']} fixtures โหลดใหม่ "
+              f"({stats['full_leagues']}/{stats['leagues']} ลีกโหลดเต็ม), ทั้งหมด {stats['fixtures_total']}")
+        return stats
+    finally:
+        conn.close()
+
+def sync(path: str | None = None) -> dict:
+    """refresh ตาม MATCH_CACHE: เปิด → delta, ปิด → โหลดเต็มทุกลีก (ไม่ใช้ orderByChild ที่ต้องมี .indexOn)"""
+    return refresh(full=not enabled(path), path=path)
+
+# ---------- read ----------
+def iter_fixtures(dates=None, path: str | None = None, with_body: bool = True):
+    """
+    yield (league_id, fixture_id, date, home, away, node|None) จาก cache
+    dates: จำกัดเฉพาะวันที่ (date ของ result) ที่ระบุ
+    """
+    conn = connect(path)
+    try:
+        cols = "league_id, fixture_id, date, home, away" + (", body" if with_body else "")
+        if dates is None:
+            cur = conn.execute(f"SELECT {cols} FROM fixtures ORDER BY league_id, fixture_id")
+        else:
+            dates = sorted(set(map(str, dates)))
+            marks = ",".join("?" * len(dates))
+            cur = conn.execute(f"SELECT {cols} FROM fixtures WHERE date IN ({marks}) ORDER BY league_id, fixture_id", dates)
+        for row in cur:
+            yield (*row[:5], json.loads(row[5]) if with_body else None)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import firebase_push  # noqa: F401  (init firebase_admin จาก FIREBASE_ADMIN_KEY)
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="ล้าง cache แล้วโหลดทุกลีกใหม่")
+    args = ap.parse_args()
+    refresh(full=args.full)
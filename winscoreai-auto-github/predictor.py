@@ -1,15 +1,20 @@
 # understat_scraper_auto/predictor.py
 # -*- coding: utf-8 -*-
 
+import os
 import re
 import unicodedata
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 import pandas as pd
 
 from firebase_admin import db
-from firebase_push import push_ai_prediction
+from firebase_push import build_prediction_update, push_ai_predictions
+import match_cache
+from understat_scraper_auto.storage import read_win_data
+from win_data import latest_form_by_team
 
 # =========================
 # Config
@@ -19,6 +24,11 @@ MAP_PATH = ROOT / "team_mapping" / "eng_to_th.csv"
 ALIAS_PATH = ROOT / "team_mapping" / "aliases.csv"
 WIN_DATA_PATH = Path("understat_scraper_auto/data/win_data.csv")
 OUT_CSV = Path("understat_scraper_auto/data/predict_result.csv")
+INDEX_WORKERS = int(os.getenv("MATCH_INDEX_WORKERS", "8"))  # thread ดึง idx/result แบบเจาะจงวัน
+# หา fixture เฉพาะทีมที่แข่งนัดล่าสุดภายใน N วัน (ทีมที่ตกชั้นไปแล้วไม่ต้องหา → ไม่ต้องโหลด matches ทั้งก้อน)
+MATCH_INDEX_DAYS = int(os.getenv("MATCH_INDEX_DAYS", "14"))
+# match cache บนดิสก์: MATCH_CACHE (อ่านใน match_cache.enabled) 1=ใช้เสมอ, 0=ไม่ใช้ (default), auto=ใช้เมื่อมีไฟล์ cache แล้ว
+# delta sync ต้องมี .indexOn จาก database.rules.json บน Firebase ก่อน → เปิดหลัง deploy rules แล้วเท่านั้น
 
 # =========================
 # Helpers
@@ -68,77 +78,104 @@ def to_thai(name_en: str) -> str:
 # =========================
 # Build matches index
 # =========================
-def _extract_results_node(node: dict) -> dict | None:
-    """คืน dict ที่มี fields date, teams.home.name, teams.away.name ไม่ว่ามันจะอยู่ที่ results หรือระดับบน"""
-    if not isinstance(node, dict):
+def _use_match_cache() -> bool:
+    return match_cache.enabled()
+
+def _index_add(index: dict, fixture_id, date_str, home, away, node: dict):
+    if not date_str or not home:
+        return
+    h_slug = slugify(normalize_en(home))
+    a_slug = slugify(normalize_en(away or ""))
+    index.setdefault(str(date_str), {})[h_slug] = (str(fixture_id), a_slug, node)
+
+def _fixtures_for_dates(dates: set) -> list[tuple[str, str]] | None:
+    """
+    (league_id, fixture_id) ของวันที่ต้องการ จาก index ที่ patch_results.py --index เขียนไว้
+      idx/date_fixtures/{date}/{fid} = league_id  → อ่านวันละ 1 ครั้ง
+    วันที่ไม่มีใน index = ไม่มี fixture วันนั้น
+    entry แบบเก่า (ค่า true ไม่มี league_id) ถูกข้าม → รัน patch_results.py --index ซ้ำเพื่อเขียนใหม่
+    คืน None เฉพาะเมื่อยังไม่มี idx/date_fixtures เลย → ให้ไปเดิน matches ทั้งก้อนแทน
+    """
+    if "date_fixtures" not in (db.reference("idx").get(shallow=True) or {}):
         return None
-    # กรณีมาตรฐาน: มี results
-    if isinstance(node.get("results"), dict):
-        res = node["results"]
-        if isinstance(res.get("teams"), dict) and res.get("date"):
-            return res
-    # กรณีบาง feed ใส่ไว้บนสุดเลย
-    if node.get("date") and isinstance(node.get("teams"), dict):
-        return node
-    return None
-
-def build_match_index() -> dict:
+    dates = sorted(dates)
+    if not dates:
+        return []
+    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as ex:
+        by_date = dict(zip(dates, ex.map(
+            lambda d: db.reference(f"idx/date_fixtures/{d}").get() or {}, dates)))
+
+    out, legacy = [], 0
+    for d, fids in by_date.items():
+        if not isinstance(fids, dict):
+            continue
+        for fid, lid in fids.items():
+            if isinstance(lid, bool) or lid in (None, ""):
+                legacy += 1
+                continue
+            out.append((str(lid), str(fid)))
+    if legacy:
+        print(f"⚠️ idx/date_fixtures มี {legacy} entry แบบเก่า (ไม่มี league_id) — ข้าม; รัน patch_results.py --index ซ้ำ")
+    return out
+
+def _fetch_fixture_node(lid: str, fid: str) -> dict:
+    """เฉพาะ result/results ของ fixture (ไม่ดึง odds ฯลฯ) ในรูปเดียวกับ node เต็ม"""
+    base = f"matches/{lid}/{fid}"
+    node = {}
+    for key in ("result", "results"):
+        val = db.reference(f"{base}/{key}").get()
+        if val is not None:
+            node[key] = val
+    return node
+
+def build_match_index(dates: set | None = None) -> dict:
+    """
+    index[date_str][home_slug] = (fixture_id, away_slug, fixture_node)
+
+    dates: วันที่ต้องการ (เช่น latest_date ใน win_data) → ดึงเฉพาะ fixture ของวันเหล่านั้นผ่าน idx/date_fixtures
+    ถ้าไม่ส่ง dates หรือยังไม่มี idx/date_fixtures → เดิน matches ทั้งก้อนแบบเดิม
+    ถ้าเปิด match cache (MATCH_CACHE) → sync แบบ delta แล้วอ่านจาก SQLite ในเครื่อง
+    ทุกทางอ่าน date/home/away ด้วย match_cache.fixture_summary → ได้ชุด fixture เดียวกัน
+    """
+    if _use_match_cache():
+        match_cache.refresh()
+        index = {}
+        for _, fid, date_str, home, away, node in match_cache.iter_fixtures(dates):
+            _index_add(index, fid, date_str, home, away, node)
+        return index
+    if dates is not None:
+        pairs = _fixtures_for_dates(set(map(str, dates)))
+        if pairs is not None:
+            with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as ex:
+                nodes = list(ex.map(lambda p: _fetch_fixture_node(*p), pairs))
+            index: dict[str, dict[str, tuple[str, str, dict]]] = {}
+            for (_, fid), node in zip(pairs, nodes):
+                _index_add(index, fid, *match_cache.fixture_summary(node), node)
+            print(f"🔎 match index: {len(pairs)} fixtures / {len(dates)} วัน (idx/date_fixtures)")
+            return index
+        print("⚠️ ไม่พบ idx/date_fixtures — ดึง matches ทั้งหมดแทน")
+    return _build_match_index_full()
+
+def _build_match_index_full() -> dict:
     """
-    index[date_str][home_slug] = (fixture_id, away_slug, full_obj)
-    เดินทุกระดับแบบกันพัง: matches -> league -> season -> fixture_id -> {results|top-level}
+    เดินทุกระดับแบบกันพัง: matches -> league -> [season ->] fixture_id -> {result|results|top-level}
     """
     root = db.reference("matches").get() or {}
     index: dict[str, dict[str, tuple[str, str, dict]]] = {}
+    if not isinstance(root, dict):
+        return index
 
-    # บางโปรเจ็คอาจไม่มีแบ่ง league/season ก็รองรับด้วย
-    def _walk(fixtures_level):
-        if not isinstance(fixtures_level, dict):
-            return []
-        return fixtures_level.items()
-
-    for _, seasons in _walk(root):
-        for _, fixtures in _walk(seasons):
-            for fixture_id, node in _walk(fixtures):
-                if not isinstance(node, (dict, str)):
-                    continue
-                # ถ้า node เป็น string/ค่าอื่น ข้าม
-                if not isinstance(node, dict):
-                    continue
-                res = _extract_results_node(node)
-                if not res:
-                    continue
-
-                date_str = res.get("date")
-                teams = res.get("teams", {}) or {}
-                home = (teams.get("home") or {}).get("name") or res.get("home_name") or res.get("home")
-                away = (teams.get("away") or {}).get("name") or res.get("away_name") or res.get("away")
-                if not date_str or not home:
-                    continue
-
-                h_en = normalize_en(home)
-                a_en = normalize_en(away or "")
-                h_slug = slugify(h_en)
-                a_slug = slugify(a_en)
-
-                index.setdefault(str(date_str), {})[h_slug] = (str(fixture_id), a_slug, node)
+    for _, league_node in root.items():
+        if not isinstance(league_node, dict):
+            continue
+        for fixture_id, node in match_cache.flatten_league(league_node).items():
+            _index_add(index, fixture_id, *match_cache.fixture_summary(node), node)
 
     # เผื่อรูปแบบที่ matches ไม่มีชั้น league/season (rare)
-    if not index and isinstance(root, dict):
+    if not index:
         for fixture_id, node in root.items():
-            if not isinstance(node, dict):
-                continue
-            res = _extract_results_node(node)
-            if not res:
-                continue
-            date_str = res.get("date")
-            teams = res.get("teams", {}) or {}
-            home = (teams.get("home") or {}).get("name")
-            away = (teams.get("away") or {}).get("name")
-            if not date_str or not home:
-                continue
-            h_en = normalize_en(home); a_en = normalize_en(away or "")
-            h_slug = slugify(h_en); a_slug = slugify(a_en)
-            index.setdefault(str(date_str), {})[h_slug] = (str(fixture_id), a_slug, node)
+            if isinstance(node, dict):
+                _index_add(index, fixture_id, *match_cache.fixture_summary(node), node)
 
     return index
 
@@ -159,7 +196,7 @@ def pick_fixture_id(match_index: dict, date_str: str, home_en: str, away_en: str
 # =========================
 # Simple rule model (MVP)
 # =========================
-def simple_rules(h_row: pd.Series, a_row: pd.Series):
+def simple_rules(h_row: dict, a_row: dict):
     lam_h = float(round(h_row["avg_xG"], 2))
     lam_a = float(round(a_row["avg_xG"], 2))
     p_over25 = round(min(1.0, (h_row["avg_xG"] + a_row["avg_xG"]) / 3), 2)
@@ -179,24 +216,26 @@ def simple_rules(h_row: pd.Series, a_row: pd.Series):
 # MAIN
 # =========================
 def run_prediction():
-    df = pd.read_csv(WIN_DATA_PATH)
-    df_home = df[df["side"] == "home"]
-    df_away = df[df["side"] == "away"]
-
-    match_index = build_match_index()
+    df = read_win_data(str(WIN_DATA_PATH.parent))  # win_data.csv หรือ win_data.parquet
+    # ฟอร์มล่าสุดต่อทีม คำนวณครั้งเดียว → lookup O(1) ในลูป
+    latest_home, latest_away = latest_form_by_team(df)
 
     tz = pytz.timezone("Asia/Bangkok")
-    today_str = datetime.now(tz).strftime("%Y-%m-%d")
+    today = datetime.now(tz)
+    today_str = today.strftime("%Y-%m-%d")
+
+    # ต้องการแค่วันที่ล่าสุดของทีมที่ยังแข่งอยู่ (ภายใน MATCH_INDEX_DAYS วัน) → ปริมาณที่โหลดโตตาม window
+    since = (today - timedelta(days=MATCH_INDEX_DAYS)).strftime("%Y-%m-%d")
+    match_index = build_match_index({d for h in latest_home.values() if (d := str(h["latest_date"])) >= since})
 
     rows_out = []
+    pred_updates = {}  # predictions/{fixture}/{date} → data (flush ทีเดียวตอนจบ)
 
-    for home_en in df_home["team"].unique():
-        if home_en not in df_away["team"].values:
+    for home_en, h in latest_home.items():
+        a = latest_away.get(home_en)
+        if a is None:
             continue
 
-        h = df_home[df_home["team"] == home_en].iloc[0]
-        a = df_away[df_away["team"] == home_en].iloc[0]
-
         home_en_norm = normalize_en(home_en)
         away_en_norm = normalize_en(a["team"])
         home_th = to_thai(home_en_norm)
@@ -227,12 +266,11 @@ def run_prediction():
         fixture_id = pick_fixture_id(match_index, latest_date, home_en_norm, away_en_norm)
 
         if not fixture_id:
-            fixture_key = f"{slugify(home_en_norm)}_{latest_date}"
-            push_ai_prediction(ai_data, date_str=today_str, fixture_id=fixture_key)
-            fixture_out = fixture_key
+            fixture_out = f"{slugify(home_en_norm)}_{latest_date}"
         else:
-            push_ai_prediction(ai_data, date_str=today_str, fixture_id=str(fixture_id))
             fixture_out = str(fixture_id)
+        path, clean = build_prediction_update(ai_data, date_str=today_str, fixture_id=fixture_out)
+        pred_updates[path] = clean
 
         rows_out.append({
             "date": latest_date,
@@ -240,6 +278,8 @@ def run_prediction():
             **ai_data,
         })
 
+    push_ai_predictions(pred_updates)
+
     OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
     pd.DataFrame(rows_out).to_csv(OUT_CSV, index=False, encoding="utf-8-sig")
     print("✅ วิเคราะห์และเขียน Firebase เสร็จ (predictions_ai/)")
@@ -0,0 +1,75 @@
+# tools/bench_fb_update.py
+# -*- coding: utf-8 -*-
+"""
+วัดเวลา fb_client.update_multi แบบส่งทีละ chunk เทียบกับ FB_UPDATE_PARALLELISM
+กับ fake RTDB ในเครื่อง (tools/fake_rtdb.py) ที่หน่วงทุก request — ไม่แตะ Firebase จริง
+ตรวจด้วยว่า tree ที่เขียนได้ตรงกันทุกโหมด
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_fb_update.py [--keys 20000] [--chunk-size 500] [--latency 0.15] [--parallel 1,4,8]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT / "tools"))
+sys.path.insert(0, str(ROOT / "API-Football-auto" / "scripts"))
+
+import fake_rtdb  # noqa: E402
+
+def fake_updates(n: int) -> dict:
+    """ขนาด/รูปแบบใกล้ patch_results: matches/{lid}/{fid}/result + teams/{tid}/form"""
+    out = {}
+    for i in range(n):
+        lid, fid = 39 + i % 7, 1_000_000 + i
+        if i % 2:
+            out[f"matches/{lid}/{fid}/result"] = {
+                "date": "2025-02-01", "league_id": lid, "fixture_id": fid,
+                "ft": {"h": i % 4, "a": i % 3}, "xg": {"home": 1.23, "away": 0.87},
+            }
+        else:
+            out[f"teams/{i % 900}/form/last5/{fid}"] = {"res": "W", "pts": 3, "gf": 2, "ga": 1}
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keys", type=int, default=20000)
+    ap.add_argument("--chunk-size", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.15, help="หน่วงต่อ request (วินาที)")
+    ap.add_argument("--parallel", default="1,4,8")
+    ap.add_argument("--port", type=int, default=9321)
+    args = ap.parse_args()
+
+    os.environ["FIREBASE_DATABASE_EMULATOR_HOST"] = f"127.0.0.1:{args.port}"
+    os.environ.setdefault("API_FOOTBALL_KEY", "bench")  # common_env ต้องการตอน import
+    srv, store = fake_rtdb.serve(args.port, latency=args.latency)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    import firebase_admin
+    firebase_admin.initialize_app(options={"databaseURL": "https://bench-default-rtdb.firebaseio.com"})
+    import fb_client
+
+    updates = fake_updates(args.keys)
+    base_t, base_tree = None, None
+    print(f"{'parallel':>8s} {'chunks':>7s} {'seconds':>8s} {'x':>6s}")
+    for par in [int(p) for p in args.parallel.split(",")]:
+        store.root = {}
+        t0 = time.perf_counter()
+        summary = fb_client.update_multi(updates, chunk_size=args.chunk_size, parallelism=par)
+        dt = time.perf_counter() - t0
+        if summary["chunks_fail"]:
+            sys.exit(f"❌ มี chunk ล้มเหลวที่ parallel={par}")
+        if base_tree is None:
+            base_t, base_tree = dt, store.root
+        elif store.root != base_tree:
+            sys.exit(f"❌ ข้อมูลที่เขียนไม่ตรงกันที่ parallel={par}")
+        print(f"{par:8d} {summary['chunks_total']:7d} {dt:8.2f} {base_t / dt:6.1f}")
+    print("✅ tree ที่เขียนตรงกันทุกโหมด")
+
+if __name__ == "__main__":
+    main()
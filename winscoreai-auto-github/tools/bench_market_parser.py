@@ -0,0 +1,175 @@
+# tools/bench_market_parser.py
+# -*- coding: utf-8 -*-
+"""
+วัด throughput (values/second) ของตัวแปลงตลาด odds: แบบเดิม (regex ต่อ value + เทียบชื่อ bet ทุกครั้ง)
+เทียบ scripts/odds_markets.py (regex คอมไพล์แล้ว + ตาราง bet → ตลาด + memoize value)
+และตรวจว่าผลลัพธ์ตรงกันทุก fixture
+
+payload:
+  --payload FILE   response ของ /odds ที่บันทึกไว้ ({"response": [...]} หรือ list ของ entry)
+  (ไม่ระบุ)        สร้าง payload จำลองรูปแบบเดียวกับ API (หลาย bookmaker, หลายเส้น OU/AH, ตลาดที่ไม่ใช้)
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_market_parser.py [--payload odds.json] [--fixtures 300] [--bookmakers 12] [--repeat 5]
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT / "API-Football-auto" / "scripts"))
+
+import odds_markets  # noqa: E402
+
+# ---------- ตัวแปลงเดิม (ก่อนย้ายไป odds_markets) ไว้เทียบ ----------
+def legacy_parse_1x2(bet):
+    rec = {"home": "", "draw": "", "away": ""}
+    for v in bet.get("values", []):
+        val = (v.get("value") or "").strip().lower()
+        odd = v.get("odd") or ""
+        if val in ("home", "1", "1 (home)"):
+            rec["home"] = odd
+        elif val in ("draw", "x"):
+            rec["draw"] = odd
+        elif val in ("away", "2", "2 (away)"):
+            rec["away"] = odd
+    return rec
+
+def legacy_parse_ou(bet):
+    res = {}
+    for v in bet.get("values", []):
+        val = (v.get("value") or "").strip()
+        odd = v.get("odd") or ""
+        m = re.search(r"([Oo]ver|[Uu]nder)\s*([+-]?\d+(?:\.\d+)?)", val)
+        if not m:
+            m2 = re.search(r"([+-]?\d+(?:\.\d+)?)\s*(Over|Under)", val, flags=re.I)
+            if not m2:
+                continue
+            side = m2.group(2).lower()
+            line = m2.group(1)
+        else:
+            side = m.group(1).lower()
+            line = m.group(2)
+        d = res.setdefault(line, {"over": "", "under": ""})
+        if "over" in side:
+            d["over"] = odd
+        else:
+            d["under"] = odd
+    return res
+
+def legacy_parse_hcp(bet):
+    res = {}
+    for v in bet.get("values", []):
+        val = (v.get("value") or "").strip()
+        odd = v.get("odd") or ""
+        side = "home" if re.search(r"\b(home|^1\b)", val, re.I) else ("away" if re.search(r"\b(away|^2\b)", val, re.I) else None)
+        line = None
+        for tok in re.findall(r"[+-]?\d+(?:\.\d+)?", val.replace(":", " ")):
+            try:
+                float(tok)
+                line = tok
+                break
+            except Exception:
+                pass
+        if side and line is not None:
+            d = res.setdefault(line, {"home": "", "away": ""})
+            d[side] = odd
+    return res
+
+def legacy_extract_markets(odds_payload):
+    books = {}
+    for entry in odds_payload:
+        for bm in entry.get("bookmakers", []):
+            bm_id = bm.get("id")
+            acc = books.setdefault(str(bm_id), {"1x2": {}, "ou": {}, "hcp": {}})
+            for bet in bm.get("bets", []):
+                name = (bet.get("name") or "").lower()
+                if "match winner" in name or name.strip() in ("1x2", "winner", "win/lose", "win-draw-win"):
+                    acc["1x2"] = legacy_parse_1x2(bet)
+                elif "over/under" in name or "total goals" in name or "goals over" in name:
+                    acc["ou"] = legacy_parse_ou(bet)
+                elif "handicap" in name:
+                    acc["hcp"] = legacy_parse_hcp(bet)
+    return books
+
+# ---------- payload จำลอง ----------
+def _odd(r):
+    return f"{r.uniform(1.05, 9.0):.2f}"
+
+def fake_payload(n_fixtures: int, n_books: int, seed: int = 7) -> list:
+    r = random.Random(seed)
+    ou_lines = ["0.5", "1.5", "1.75", "2", "2.25", "2.5", "2.75", "3", "3.5", "4.5", "5.5"]
+    ah_lines = ["-2", "-1.5", "-1.25", "-1", "-0.75", "-0.5", "-0.25", "0", "+0.25", "+0.5", "+1"]
+    entries = []
+    for i in range(n_fixtures):
+        books = []
+        for b in range(1, n_books + 1):
+            bets = [
+                {"id": 1, "name": "Match Winner", "values": [
+                    {"value": "Home", "odd": _odd(r)}, {"value": "Draw", "odd": _odd(r)}, {"value": "Away", "odd": _odd(r)}]},
+                {"id": 5, "name": "Goals Over/Under", "values": [
+                    {"value": f"{s} {ln}", "odd": _odd(r)} for ln in r.sample(ou_lines, 6) for s in ("Over", "Under")]},
+                {"id": 4, "name": "Asian Handicap", "values": [
+                    {"value": f"{s} {ln}", "odd": _odd(r)} for ln in r.sample(ah_lines, 6) for s in ("Home", "Away")]},
+                {"id": 8, "name": "Both Teams Score", "values": [
+                    {"value": "Yes", "odd": _odd(r)}, {"value": "No", "odd": _odd(r)}]},
+                {"id": 10, "name": "Exact Score", "values": [
+                    {"value": f"{h}:{a}", "odd": _odd(r)} for h in range(4) for a in range(4)]},
+                {"id": 12, "name": "Double Chance", "values": [
+                    {"value": v, "odd": _odd(r)} for v in ("Home/Draw", "Home/Away", "Draw/Away")]},
+            ]
+            if b % 3 == 0:
+                bets.append({"id": 6, "name": "Goals Over/Under First Half", "values": [
+                    {"value": f"{s} {ln}", "odd": _odd(r)} for ln in ("0.5", "1.5") for s in ("Over", "Under")]})
+            books.append({"id": b, "name": f"Book {b}", "bets": bets})
+        entries.append({"fixture": {"id": 1000 + i}, "league": {"id": 39}, "bookmakers": books})
+    return entries
+
+def count_values(entries) -> int:
+    return sum(len(bet.get("values") or []) for e in entries for bm in e.get("bookmakers", []) for bet in bm.get("bets", []))
+
+def bench(fn, entries, repeat: int) -> float:
+    """เวลาดีที่สุด (วินาที) ของการแปลงทุก fixture ทีละ entry แบบที่ af_today_odds ทำ"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for e in entries:
+            fn([e])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--payload", help="JSON ของ /odds ที่บันทึกไว้")
+    ap.add_argument("--fixtures", type=int, default=300)
+    ap.add_argument("--bookmakers", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get("response", []) if isinstance(data, dict) else data
+    else:
+        entries = fake_payload(args.fixtures, args.bookmakers)
+    n_values = count_values(entries)
+
+    for e in entries:
+        if legacy_extract_markets([e]) != odds_markets.extract_markets([e]):
+            sys.exit(f"❌ ผลไม่ตรงกันที่ fixture {(e.get('fixture') or {}).get('id')}")
+
+    t_old = bench(legacy_extract_markets, entries, args.repeat)
+    t_new = bench(odds_markets.extract_markets, entries, args.repeat)
+    print(f"fixtures={len(entries)} values={n_values}")
+    print(f"{'parser':>10s} {'seconds':>8s} {'values/s':>12s}")
+    print(f"{'legacy':>10s} {t_old:8.3f} {n_values / t_old:12,.0f}")
+    print(f"{'table':>10s} {t_new:8.3f} {n_values / t_new:12,.0f}  (x{t_old / t_new:.1f})")
+    print("✅ ผลลัพธ์ตรงกันทุก fixture")
+
+if __name__ == "__main__":
+    main()
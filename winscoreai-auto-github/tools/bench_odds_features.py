@@ -0,0 +1,248 @@
+# tools/bench_odds_features.py
+# -*- coding: utf-8 -*-
+"""
+วัดเวลาคำนวณ odds_features ของทั้ง slate: patch_odds.build_features_per_fixture ทีละตัว (statistics/loop)
+เทียบ patch_odds.build_features_batch (odds_vec / NumPy) และตรวจว่าผลเท่ากัน
+(โครงสร้าง/สตริงต้องเหมือนเป๊ะ, float ต่างได้ไม่เกิน rel 1e-12 — ไม่นับ meta.updated_at)
+
+เส้น OU/HCP (*_all + เส้นหลัก) ของฝั่ง python มาจาก reference_lines ในไฟล์นี้ (loop + statistics, ไม่แตะ odds_vec)
+ไม่ใช่ patch_odds.build_lines — ไม่งั้นจะเทียบ LineMatrix กับตัวเอง
+legacy_lines = ตัวเลือกเส้นแบบเดิมก่อน line matrix (เจ้าแรกที่เจอ) แช่แข็งไว้: fixture ที่มีเจ้ามือเดียว
+ต้องได้เส้นหลักเดียวกัน (consensus ของเจ้าเดียว = ราคาของเจ้านั้น)
+
+input:
+  --json FILE   odds_full_*.json จาก af_today_odds
+  (ไม่ระบุ)     slate จำลอง: หลาย bookmaker, หลายเส้น OU/HCP (FT/HT), ราคาว่าง/0/ขาดฝั่งปนบ้าง
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_odds_features.py [--json odds_full.json] [--fixtures 2000] [--bookmakers 15] [--repeat 3]
+"""
+
+import sys
+import math
+import statistics
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT / "API-Football-auto" / "scripts"))
+
+import patch_odds  # noqa: E402
+from json_stream import FixtureStream  # noqa: E402
+
+def _odd(r):
+    x = r.random()
+    if x < 0.02:
+        return ""        # ราคาว่าง
+    if x < 0.03:
+        return "0"       # ราคา 0 (ถูกตัดทิ้งใน stats)
+    return f"{r.uniform(1.05, 9.0):.2f}"
+
+def _lines(r, pool, sides, k):
+    out = {}
+    for ln in r.sample(pool, k):
+        d = {s: _odd(r) for s in sides}
+        if r.random() < 0.05:
+            d.pop(sides[1])  # ขาดฝั่ง
+        out[ln] = d
+    return out
+
+def fake_slate(n_fixtures: int, n_books: int, seed: int = 11) -> list:
+    r = random.Random(seed)
+    ou_pool = ["0.5", "1.5", "1.75", "2", "2.25", "2.5", "2.75", "3", "3.5", "4.5"]
+    ah_pool = ["-2", "-1.5", "-1", "-0.75", "-0.5", "-0.25", "0", "0.25", "0.5", "1"]
+    recs = []
+    for i in range(n_fixtures):
+        books = {}
+        for b in range(1, r.randint(0, n_books) + 1):
+            mk = {"1x2": {s: _odd(r) for s in ("home", "draw", "away")} if r.random() > 0.05 else {},
+                  "ou": _lines(r, ou_pool, ("over", "under"), r.randint(0, 5)),
+                  "hcp": _lines(r, ah_pool, ("home", "away"), r.randint(0, 5))}
+            if r.random() < 0.3:
+                mk["ou_ht"] = _lines(r, ["0.5", "1", "1.5"], ("over", "under"), 2)
+                mk["hcp_ht"] = _lines(r, ["-0.5", "0", "0.5"], ("home", "away"), 2)
+            books[str(b)] = mk
+        recs.append({"date": "2030-01-01", "league_id": 39, "fixture_id": 9000 + i, "bookmakers": books})
+    return recs
+
+# ---------- reference: เส้น OU/HCP แบบ loop (แช่แข็ง ไม่ import odds_vec) ----------
+def _price(x):
+    try:
+        o = float(str(x))
+    except Exception:
+        return None
+    return o if 0 < o < math.inf else None
+
+def _line_num(x):
+    try:
+        return float(str(x))
+    except Exception:
+        return None
+
+def _r(v, nd):
+    return 0 if v is None else round(v, nd)
+
+def _fmt(imp):
+    return "" if imp is None or imp <= 0 else f"{round(1.0 / imp, 3):g}"
+
+def _ref_market(books: dict, key: str, sides, anchor):
+    """(all_encoded, (main_line, main_sel)) ของตลาดเดียว — ความหมายเดียวกับ odds_vec.LineMatrix"""
+    quotes = {}  # line -> {side: [odds]} เรียงตามที่เจอครั้งแรก
+    for mk in (books or {}).values():
+        for line, v in ((mk or {}).get(key) or {}).items():
+            q = quotes.setdefault(str(line), {s: [] for s in sides})
+            for side in sides:
+                o = _price(v.get(side))
+                if o is not None:
+                    q[side].append(o)
+    if not quotes:
+        return {}, (None, None)
+
+    med = {ln: {s: (statistics.median([1.0 / o for o in q[s]]) if q[s] else None) for s in sides}
+           for ln, q in quotes.items()}
+    enc = {"line": list(quotes)}
+    for s in sides:
+        col = [q[s] for q in quotes.values()]
+        enc[s] = {
+            "n": [len(c) for c in col],
+            "imp_med": [_r(med[ln][s], 4) for ln in quotes],
+            "imp_mean": [_r(statistics.fmean([1.0 / o for o in c]) if c else None, 4) for c in col],
+            "best": [_r(max(c) if c else None, 3) for c in col],
+            "spread": [_r(max(c) - min(c) if c else None, 3) for c in col],
+        }
+
+    def sel(ln):
+        return {s: _fmt(med[ln][s]) for s in sides}
+
+    best = None
+    for pos, ln in enumerate(quotes):
+        x = _line_num(ln)
+        m0, m1 = med[ln][sides[0]], med[ln][sides[1]]
+        if x is None or m0 is None or m1 is None:
+            continue
+        gap = abs(m0 - m1)
+        cand = (abs(x), gap, x, pos) if anchor is None else (gap, abs(x - anchor), x, pos)
+        if best is None or cand < best[0]:
+            best = (cand, ln, x)
+    if best:
+        return enc, (str(best[2]), sel(best[1]))
+    # ไม่มีเส้นที่ราคาครบสองฝั่ง → เส้นใกล้ anchor (HCP ใกล้ 0) ที่สุด; แปลงเป็นเลขไม่ได้เลย → เส้นแรก
+    nums = [(abs(x - (anchor or 0)), pos, ln) for pos, ln in enumerate(quotes)
+            if (x := _line_num(ln)) is not None]
+    ln = min(nums)[2] if nums else next(iter(quotes))
+    return enc, (ln, sel(ln))
+
+def reference_lines(books: dict) -> dict:
+    return {k: _ref_market(books, k, *patch_odds.LINE_MARKETS[k]) for k in patch_odds.LINE_KEYS}
+
+# ---------- legacy: เลือกเส้นแบบก่อน line matrix (merge เจ้าแรกที่เจอ) ----------
+def _imp(odd):
+    try:
+        o = float(str(odd))
+        return 1.0 / o if o > 0 else None
+    except Exception:
+        return None
+
+def _legacy_choose(line_map: dict, sides, anchor):
+    best = None
+    for line, v in line_map.items():
+        p0, p1 = _imp(v.get(sides[0])), _imp(v.get(sides[1]))
+        if p0 is None or p1 is None:
+            continue
+        x = float(line)
+        cand = (abs(x), abs(p0 - p1), x) if anchor is None else (abs(p0 - p1), abs(x - anchor), x)
+        if best is None or cand < best:
+            best = cand
+    if best:
+        return str(best[2])
+    try:
+        return str(min(line_map, key=lambda x: abs(float(x) - float(anchor or 0))))
+    except Exception:
+        return str(next(iter(line_map)))
+
+def legacy_lines(books: dict) -> dict:
+    """{key: main_line} แบบเดิม: merge_all_lines (เจ้าแรกที่เจอ) + choose_ou/hcp_balanced"""
+    out = {}
+    for k in patch_odds.LINE_KEYS:
+        merged = {}
+        for mk in (books or {}).values():
+            for line, val in (mk.get(k) or {}).items():
+                merged.setdefault(str(line), val)
+        out[k] = _legacy_choose(merged, *patch_odds.LINE_MARKETS[k]) if merged else None
+    return out
+
+def same(a, b, path="") -> str:
+    """"" = เท่ากัน, ไม่งั้นคืน path แรกที่ต่าง"""
+    if isinstance(a, float) and isinstance(b, float):
+        return "" if (a == b or math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-15)) else path
+    if type(a) is not type(b):
+        return path or "/"
+    if isinstance(a, dict):
+        if list(a) != list(b):
+            return path + " (keys)"
+        for k in a:
+            if path + "/" + k == "/meta/updated_at":
+                continue
+            d = same(a[k], b[k], path + "/" + k)
+            if d:
+                return d
+        return ""
+    if isinstance(a, list):
+        if len(a) != len(b):
+            return path + " (len)"
+        return next((d for d in (same(x, y, f"{path}[{i}]") for i, (x, y) in enumerate(zip(a, b))) if d), "")
+    return "" if a == b else path
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--json", help="odds_full_*.json")
+    ap.add_argument("--fixtures", type=int, default=2000)
+    ap.add_argument("--bookmakers", type=int, default=15)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    recs = list(FixtureStream(args.json)) if args.json else fake_slate(args.fixtures, args.bookmakers)
+
+    def python_engine():
+        return [patch_odds.build_features_per_fixture(r, lines=reference_lines(r.get("bookmakers") or {}))
+                for r in recs]
+
+    old = python_engine()
+    new = patch_odds.build_features_batch(recs)
+    for a, b in zip(old, new):
+        d = same(a, b)
+        if d:
+            sys.exit(f"❌ fixture {a['_ids']['fixture_id']} ต่างที่ {d}")
+
+    # เจ้ามือเดียว: consensus = ราคาของเจ้านั้น → เส้นหลักต้องตรงกับตัวเลือกแบบเดิม
+    single = 0
+    for r, f in zip(recs, new):
+        books = r.get("bookmakers") or {}
+        if len(books) != 1:
+            continue
+        single += 1
+        for k, line in legacy_lines(books).items():
+            if f[k]["line"] != line:
+                sys.exit(f"❌ fixture {r['fixture_id']} เส้นหลัก {k}: {f[k]['line']} ≠ แบบเดิม {line}")
+
+    t_old = best_of(python_engine, args.repeat)
+    t_new = best_of(lambda: patch_odds.build_features_batch(recs), args.repeat)
+    n = len(recs)
+    print(f"fixtures={n}")
+    print(f"{'engine':>8s} {'seconds':>8s} {'fixtures/s':>12s}")
+    print(f"{'python':>8s} {t_old:8.3f} {n / t_old:12,.0f}")
+    print(f"{'numpy':>8s} {t_new:8.3f} {n / t_new:12,.0f}  (x{t_old / t_new:.1f})")
+    print(f"✅ ผลเท่ากันทุก fixture (reference แบบ loop) และเส้นหลักตรงกับแบบเดิมใน {single} fixture ที่มีเจ้ามือเดียว")
+
+if __name__ == "__main__":
+    main()
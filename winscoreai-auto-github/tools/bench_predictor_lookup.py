@@ -0,0 +1,74 @@
+# tools/bench_predictor_lookup.py
+# -*- coding: utf-8 -*-
+"""
+เทียบการหาแถวฟอร์มล่าสุดต่อทีมใน run_prediction:
+เดิม (boolean mask ทั้ง frame ต่อทีม) กับ latest_form_by_team (dict ครั้งเดียว)
+ขยาย win_data เป็น N เท่า (ทีมใหม่ต่อชุด) เพื่อดูการโตของเวลา — ไม่ต่อ Firebase
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_predictor_lookup.py [--win-data understat_scraper_auto/data/win_data.csv] [--scale 10]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT))
+
+from win_data import latest_form_by_team  # noqa: E402
+
+def legacy_pairs(df: pd.DataFrame) -> list:
+    df_home = df[df["side"] == "home"]
+    df_away = df[df["side"] == "away"]
+    out = []
+    for home_en in df_home["team"].unique():
+        if home_en not in df_away["team"].values:
+            continue
+        h = df_home[df_home["team"] == home_en].iloc[0]
+        a = df_away[df_away["team"] == home_en].iloc[0]
+        out.append((home_en, h["latest_date"], h["avg_xG"], a["avg_xG"]))
+    return out
+
+def indexed_pairs(df: pd.DataFrame) -> list:
+    latest_home, latest_away = latest_form_by_team(df)
+    out = []
+    for home_en, h in latest_home.items():
+        a = latest_away.get(home_en)
+        if a is None:
+            continue
+        out.append((home_en, h["latest_date"], h["avg_xG"], a["avg_xG"]))
+    return out
+
+def scale_up(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    """ต่อ win_data n ชุด แต่ละชุดเปลี่ยนชื่อทีม → จำนวนทีมและแถวโต n เท่า"""
+    parts = [df] + [df.assign(team=df["team"].astype(str) + f" #{i}") for i in range(1, n)]
+    return pd.concat(parts, ignore_index=True)
+
+def timed(fn, df):
+    t0 = time.perf_counter()
+    out = fn(df)
+    return time.perf_counter() - t0, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--win-data", default="understat_scraper_auto/data/win_data.csv")
+    ap.add_argument("--scale", type=int, default=10)
+    args = ap.parse_args()
+
+    base = pd.read_csv(args.win_data)
+    print(f"{'size':>6s} {'rows':>8s} {'teams':>6s} {'legacy s':>9s} {'indexed s':>10s} {'x':>7s}")
+    for n in sorted({1, args.scale}):
+        df = scale_up(base, n)
+        t_old, old = timed(legacy_pairs, df)
+        t_new, new = timed(indexed_pairs, df)
+        if old != new:
+            sys.exit(f"❌ ผลไม่ตรงกันที่ {n}x")
+        print(f"{n:>5d}x {len(df):8d} {df['team'].nunique():6d} {t_old:9.3f} {t_new:10.4f} {t_old / t_new:7.1f}")
+    print("✅ คู่ทีม/แถวล่าสุดตรงกันทุกขนาด")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# tools/bench_storage.py
+# -*- coding: utf-8 -*-
+"""
+เทียบเวลาโหลด + หน่วยความจำ ระหว่าง CSV เดิมกับ parquet (understat_*.csv ทุกลีก + win_data)
+จะ migrate ไฟล์ CSV ไปเป็น parquet ในโฟลเดอร์ชั่วคราว (ไม่แตะ data จริง)
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_storage.py [--data-dir understat_scraper_auto/data] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT))
+
+from understat_scraper_auto import storage  # noqa: E402
+
+def best_of(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+def mem_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+def load_csv_understat(data_dir):
+    files = [f for f in os.listdir(data_dir) if f.startswith("understat_") and f.endswith(".csv")]
+    df = pd.concat([pd.read_csv(os.path.join(data_dir, f)) for f in files])
+    df["date"] = storage.parse_understat_dates(df["date"])
+    return df
+
+def load_parquet_understat(data_dir):
+    return pd.read_parquet(os.path.join(data_dir, storage.PARQUET_SUBDIR))
+
+def dir_size_mb(paths) -> float:
+    return sum(os.path.getsize(p) for p in paths) / 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data-dir", default=storage.DATA_DIR)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if not storage.parquet_available():
+        sys.exit("❌ ต้องติดตั้ง pyarrow ก่อน (pip install pyarrow)")
+    if not any(f.startswith("understat_") and f.endswith(".csv") for f in os.listdir(args.data_dir)):
+        sys.exit(f"❌ ไม่พบ understat_*.csv ใน {args.data_dir} (รัน understat_scraper_auto/main.py ก่อน หรือระบุ --data-dir)")
+
+    tmp = tempfile.mkdtemp(prefix="bench_storage_")
+    try:
+        for f in os.listdir(args.data_dir):
+            if (f.startswith("understat_") or f == "win_data.csv") and f.endswith(".csv"):
+                shutil.copy(os.path.join(args.data_dir, f), tmp)
+        storage.migrate_csv_to_parquet(tmp)
+
+        csv_files = [os.path.join(tmp, f) for f in os.listdir(tmp) if f.startswith("understat_")]
+        pq_files = [str(p) for p in Path(tmp, storage.PARQUET_SUBDIR).rglob("*.parquet")]
+
+        rows = []
+        t, df = best_of(lambda: load_csv_understat(tmp), args.repeat)
+        rows.append(("understat CSV", t, mem_mb(df), dir_size_mb(csv_files), len(df)))
+        t, df = best_of(lambda: load_parquet_understat(tmp), args.repeat)
+        rows.append(("understat parquet", t, mem_mb(df), dir_size_mb(pq_files), len(df)))
+
+        wcsv, wpq = storage.win_data_csv_path(tmp), storage.win_data_parquet_path(tmp)
+        if os.path.exists(wcsv):
+            t, df = best_of(lambda: pd.read_csv(wcsv), args.repeat)
+            rows.append(("win_data CSV", t, mem_mb(df), dir_size_mb([wcsv]), len(df)))
+            t, df = best_of(lambda: pd.read_parquet(wpq), args.repeat)
+            rows.append(("win_data parquet", t, mem_mb(df), dir_size_mb([wpq]), len(df)))
+
+        print(f"\n{'dataset':20s} {'load ms':>9s} {'mem MB':>8s} {'disk MB':>8s} {'rows':>8s}")
+        for name, t, mem, disk, n in rows:
+            print(f"{name:20s} {t*1e3:9.1f} {mem:8.2f} {disk:8.2f} {n:8d}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# tools/bench_understat_fetch.py
+# -*- coding: utf-8 -*-
+"""
+ทดสอบ fetch_seasons (thread pool) ของ understat_scraper_auto กับ stand-in ในเครื่อง (UNDERSTAT_BASE_URL):
+- เสิร์ฟหน้า /league/<code>/<year> จาก PAGES_DIR ที่บันทึกไว้ หรือหน้าจำลองที่สร้างเอง
+- ดึงแบบทีละหน้า (เหมือนเดิม) เทียบกับ fetch_seasons แล้วตรวจว่า DataFrame ต่อลีกเท่ากันทุกแถว
+- ตรวจ HostRateLimiter แบบ deterministic: นาฬิกาจำลองที่ sleep ตื่นช้าแบบสุ่ม + หลาย thread
+  ช่องว่างระหว่างเวลาปล่อย (ตามนาฬิกาของ limiter) ต้อง >= min_interval ทุกคู่
+- ตอน fetch จริง ใช้เวลาที่ limiter ปล่อยตรวจแบบเดียวกัน
+  (เวลาปล่อย = ค่านาฬิกาล่าสุดที่ thread นั้นอ่านใน wait → เก็บผ่าน clock ที่ส่งเข้า limiter)
+  (ฝั่ง server มี jitter ของ network/thread ปนอยู่ จึงแสดงไว้ดูเฉย ๆ)
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_understat_fetch.py [--pages PAGES_DIR] [--seasons 6] [--latency 0.15] [--workers 6] [--interval 0.05]
+  PAGES_DIR = หน้า HTML ที่บันทึกไว้แบบ PAGES_DIR/league/EPL/2024
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT))
+
+def fake_page(code: str, year: int, n_teams: int = 20, seed: int = 0) -> bytes:
+    """หน้า league จำลองที่มี teamsData รูปแบบเดียวกับ Understat (JSON.parse + \\xNN escape)"""
+    r = random.Random(f"{code}-{year}-{seed}")
+    teams = {}
+    for t in range(n_teams):
+        hist = []
+        for m in range(38):
+            sc, mi = r.randint(0, 4), r.randint(0, 4)
+            hist.append({
+                "h_a": "h" if m % 2 == 0 else "a", "xG": round(r.uniform(0, 3), 5), "xGA": round(r.uniform(0, 3), 5),
+                "npxG": round(r.uniform(0, 3), 5), "deep": r.randint(0, 15), "ppda": {"att": r.randint(50, 400), "def": 30},
+                "scored": sc, "missed": mi, "xpts": round(r.uniform(0, 3), 4),
+                "result": "w" if sc > mi else ("l" if sc < mi else "d"),
+                "date": (date(year, 8, 10) + timedelta(days=7 * m)).strftime("%Y-%m-%d 15:00:00"),
+            })
+        teams[str(100 + t)] = {"id": str(100 + t), "title": f"{code} Team {t}", "history": hist}
+    enc = "".join(c if c.isalnum() or c == " " else f"\\x{ord(c):02x}" for c in json.dumps(teams))
+    return f"<html><script>\n\tvar teamsData\t= JSON.parse('{enc}');\n</script></html>".encode()
+
+def load_pages(pages_dir, codes, n_seasons) -> dict:
+    """{(code, year): bytes}"""
+    if pages_dir:
+        out = {}
+        for p in Path(pages_dir).glob("league/*/*"):
+            if p.is_file() and p.name.isdigit():
+                out[(p.parent.name, int(p.name))] = p.read_bytes()
+        return out
+    return {(c, y): fake_page(c, y) for c in codes for y in range(2024 - n_seasons + 1, 2025)}
+
+def serve(pages: dict, latency: float):
+    """stand-in ของ understat.com → (server, hits) ; hits = [(monotonic, path)]"""
+    hits, lock = [], threading.Lock()
+
+    class H(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits.append((time.monotonic(), self.path))
+            parts = self.path.strip("/").split("/")
+            body = pages.get((parts[1], int(parts[2]))) if len(parts) == 3 and parts[2].isdigit() else None
+            time.sleep(latency)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, hits
+
+def min_release_gap(ts) -> float:
+    ts = sorted(ts)
+    return min((b - a for a, b in zip(ts, ts[1:])), default=float("inf"))
+
+def recording_limiter(limiter_cls, interval: float, clock=time.monotonic, **kw):
+    """
+    limiter ที่ห่อ clock/wait ไว้เก็บเวลาปล่อย → (limiter, released)
+    wait คืนค่าทันทีที่ปล่อย ด้วยค่านาฬิกาล่าสุดที่ thread นั้นอ่านใต้ lock
+    """
+    seen, released, lock = threading.local(), [], threading.Lock()
+
+    def read_clock():
+        seen.t = clock()
+        return seen.t
+
+    lim = limiter_cls(interval, clock=read_clock, **kw)
+    wait = lim.wait
+
+    def recorded_wait(url):
+        wait(url)
+        with lock:
+            released.append(seen.t)
+
+    lim.wait = recorded_wait
+    return lim, released
+
+def check_limiter_fake_clock(limiter_cls, interval: float, threads: int = 8, per_thread: int = 25) -> float:
+    """
+    limiter บนนาฬิกาจำลอง: sleep เลื่อนนาฬิกาไปเท่าที่ขอ + ตื่นช้าแบบสุ่ม (0..2×interval)
+    ผลไม่ขึ้นกับ scheduler ของเครื่อง → คืนช่องว่างน้อยสุดระหว่างเวลาปล่อย
+    """
+    clock = {"t": 0.0}
+    clock_lock = threading.Lock()
+    rnd = random.Random(0)
+
+    def now():
+        with clock_lock:
+            return clock["t"]
+
+    def sleep(dt):
+        with clock_lock:
+            clock["t"] += max(dt, 0.0) + rnd.uniform(0, 2 * interval)
+        time.sleep(0)
+
+    lim, released = recording_limiter(limiter_cls, interval, clock=now, sleep=sleep)
+    workers = [threading.Thread(target=lambda: [lim.wait("http://stand-in/x") for _ in range(per_thread)])
+               for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert len(released) == threads * per_thread
+    return min_release_gap(released)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", help="PAGES_DIR (league/<code>/<year>); ไม่ระบุ = หน้าจำลอง")
+    ap.add_argument("--seasons", type=int, default=6, help="จำนวนฤดูกาลต่อลีกของหน้าจำลอง")
+    ap.add_argument("--latency", type=float, default=0.15, help="หน่วงต่อ request ของ stand-in (วินาที)")
+    ap.add_argument("--workers", type=int, default=6)
+    ap.add_argument("--interval", type=float, default=0.05, help="UNDERSTAT_HOST_MIN_INTERVAL ที่ใช้ทดสอบ")
+    args = ap.parse_args()
+
+    codes = ["EPL", "La_liga", "Serie_A", "Bundesliga", "Ligue_1"]
+    pages = load_pages(args.pages, codes, args.seasons)
+    if not pages:
+        sys.exit(f"❌ ไม่พบหน้าใน {args.pages}")
+    srv, hits = serve(pages, args.latency)
+
+    # main.py อ่าน env ตอน import → ตั้งก่อน import
+    os.environ["UNDERSTAT_BASE_URL"] = f"http://127.0.0.1:{srv.server_address[1]}"
+    os.environ["UNDERSTAT_HOST_MIN_INTERVAL"] = str(args.interval)
+    import pandas as pd
+    from understat_scraper_auto import main as us
+
+    pairs = sorted(pages)
+
+    # ใช้เวลาที่ limiter ปล่อยแต่ละ request เอง (ไม่ใช่เวลาที่ server ได้รับ)
+    us._RATE_LIMITER, released = recording_limiter(us.HostRateLimiter, args.interval)
+
+    def frames(seasons: dict) -> dict:
+        by_code = {}
+        for (code, year), td in seasons.items():
+            by_code.setdefault(code, {})[year] = td
+        return {code: pd.DataFrame([r for y in sorted(ys) for r in us.season_rows(ys[y], y, set())])
+                for code, ys in by_code.items()}
+
+    t0 = time.perf_counter()
+    seq = {p: us.parse_teams_data(us.fetch_season_page(*p), us.season_url(*p)) for p in pairs}
+    t_seq = time.perf_counter() - t0
+
+    hits.clear()
+    released.clear()
+    t0 = time.perf_counter()
+    par = us.fetch_seasons(pairs, workers=args.workers)
+    t_par = time.perf_counter() - t0
+    min_gap = min_release_gap(released)
+    hit_ts = sorted(t for t, _ in hits)
+    wire_gap = min_release_gap(hit_ts)
+    srv.shutdown()
+    fake_gap = check_limiter_fake_clock(us.HostRateLimiter, args.interval)
+
+    f_seq, f_par = frames(seq), frames(par)
+    bad = [c for c in f_seq if c not in f_par or not f_seq[c].equals(f_par[c])]
+    print(f"pages={len(pairs)} latency={args.latency}s workers={args.workers} min_interval={args.interval}s")
+    print(f"sequential {t_seq:6.2f}s | parallel {t_par:6.2f}s (x{t_seq / t_par:.1f})")
+    print(f"server hits (parallel)={len(hits)} | ช่องว่างน้อยสุด: limiter={min_gap * 1e3:.1f} ms, "
+          f"ฝั่ง server={wire_gap * 1e3:.1f} ms (ไม่ตรวจ), นาฬิกาจำลอง={fake_gap * 1e3:.1f} ms")
+    if bad:
+        sys.exit(f"❌ DataFrame ไม่ตรงกัน: {bad}")
+    if fake_gap < args.interval - 1e-9:  # ปัดเศษ float เท่านั้น
+        sys.exit(f"❌ rate limiter (นาฬิกาจำลอง) ไม่คุม: {fake_gap * 1e3:.1f} ms < {args.interval * 1e3:.0f} ms")
+    if len(hits) != len(pairs) or min_gap < args.interval - 1e-9:
+        sys.exit(f"❌ rate limiter ไม่คุม: {min_gap * 1e3:.1f} ms < {args.interval * 1e3:.0f} ms (hits={len(hits)})")
+    print(f"✅ DataFrame ตรงกันทุกลีก ({sum(len(f) for f in f_par.values())} แถว) และ rate limit คุมได้")
+
+if __name__ == "__main__":
+    main()
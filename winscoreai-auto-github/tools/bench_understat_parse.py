@@ -0,0 +1,61 @@
+# tools/bench_understat_parse.py
+# -*- coding: utf-8 -*-
+"""
+micro-benchmark การ parse teamsData จากหน้า Understat ที่บันทึกไว้:
+BeautifulSoup (เดิม) เทียบกับ regex บน bytes (fast path) — เวลา parse ต่อฤดูกาล + ตรวจผลตรงกัน
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_understat_parse.py PAGES_DIR [--repeat 5]
+  PAGES_DIR = โฟลเดอร์หน้า HTML ที่บันทึกไว้ (เช่น PAGES_DIR/league/EPL/2024) ค้นทุกไฟล์แบบ recursive
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT))
+
+from understat_scraper_auto.main import parse_teams_data_fast, parse_teams_data_soup  # noqa: E402
+
+def best_of(fn, arg, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pages_dir")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    pages = sorted(p for p in Path(args.pages_dir).rglob("*") if p.is_file())
+    if not pages:
+        sys.exit(f"❌ ไม่พบไฟล์ใน {args.pages_dir}")
+
+    print(f"{'page':40s} {'KB':>7s} {'soup ms':>9s} {'fast ms':>9s} {'x':>6s}")
+    tot_soup = tot_fast = 0.0
+    mismatch = 0
+    for p in pages:
+        raw = p.read_bytes()
+        t_soup, d_soup = best_of(lambda b: parse_teams_data_soup(b.decode("utf-8"), str(p)), raw, args.repeat)
+        t_fast, d_fast = best_of(parse_teams_data_fast, raw, args.repeat)
+        tot_soup += t_soup; tot_fast += t_fast
+        ok = d_soup == d_fast
+        mismatch += 0 if ok else 1
+        name = str(p.relative_to(args.pages_dir))
+        print(f"{name:40s} {len(raw)/1024:7.0f} {t_soup*1e3:9.2f} {t_fast*1e3:9.2f} {t_soup/t_fast:6.1f}{'' if ok else '  ❌ mismatch'}")
+
+    n = len(pages)
+    print(f"\nseasons={n} | soup avg={tot_soup/n*1e3:.2f} ms | fast avg={tot_fast/n*1e3:.2f} ms | speedup={tot_soup/tot_fast:.1f}x")
+    if mismatch:
+        sys.exit(f"❌ ผลไม่ตรงกัน {mismatch} หน้า")
+    print("✅ teamsData ตรงกันทุกหน้า")
+
+if __name__ == "__main__":
+    main()
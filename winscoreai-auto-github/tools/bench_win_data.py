@@ -0,0 +1,113 @@
+# tools/bench_win_data.py
+# -*- coding: utf-8 -*-
+"""
+เทียบความเร็ว generate_win_data แบบเดิม (วน iloc ต่อแถว) กับแบบ vectorized (compute_form_rows)
+บนไฟล์ understat_*.csv ทั้ง 5 ลีก และตรวจว่า CSV ที่ได้ตรงกันทุกไบต์
+หลังเรียงบล็อกทีมของแบบเดิมด้วย key ใหม่ (วันล่าสุด ใหม่→เก่า แล้วชื่อทีม)
+— แถว/ค่า/ลำดับในทีมต้องเหมือนเดิม; ลำดับบล็อกทีมที่วันล่าสุดเท่ากันเปลี่ยนโดยตั้งใจ (แสดงจำนวนแถวที่ย้าย)
+
+Usage (รันจากโฟลเดอร์ winscoreai-auto-github/):
+  python tools/bench_win_data.py [--data-dir understat_scraper_auto/data] [--repeat 3]
+"""
+
+import io
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]  # -> winscoreai-auto-github/
+sys.path.insert(0, str(ROOT))
+
+from win_data import DATA_DIR, load_understat, compute_form_rows  # noqa: E402
+
+LEAGUE_FILES = [
+    "understat_epl.csv",
+    "understat_la_liga.csv",
+    "understat_serie_a.csv",
+    "understat_bundesliga.csv",
+    "understat_ligue_1.csv",
+]
+
+def legacy_form_rows(df_all: pd.DataFrame) -> pd.DataFrame:
+    """implementation เดิมก่อน vectorize (เก็บไว้เป็น reference สำหรับ benchmark)"""
+    all_rows = []
+    for is_home in ["h", "a"]:
+        df_side = df_all[df_all["h_a"] == is_home]
+        for team in df_side["team"].unique():
+            df_team = df_side[df_side["team"] == team].copy()
+            df_team = df_team.sort_values(by="date", ascending=False)
+
+            for i in range(len(df_team)):
+                recent = df_team.iloc[i+1:i+6]
+                if len(recent) < 3:
+                    continue
+
+                row = {
+                    "team": team,
+                    "latest_date": df_team.iloc[i]["date"].strftime("%Y-%m-%d"),
+                    "side": "home" if is_home == "h" else "away",
+                    "avg_xG": recent["xG"].mean(),
+                    "avg_xGA": recent["xGA"].mean(),
+                    "avg_scored": recent["scored"].mean(),
+                    "avg_missed": recent["missed"].mean(),
+                    "avg_xpts": recent["xpts"].mean(),
+                    "games_count": len(recent)
+                }
+                all_rows.append(row)
+    return pd.DataFrame(all_rows)
+
+def reorder_blocks(df: pd.DataFrame) -> pd.DataFrame:
+    """เรียงบล็อก (side, team) ด้วย key ของ compute_form_rows: home→away, วันล่าสุด ใหม่→เก่า, ชื่อทีม"""
+    latest = df.groupby(["side", "team"], sort=False)["latest_date"].transform("max")
+    key = df.assign(_side=(df["side"] != "home").astype(int), _latest=latest)
+    key = key.sort_values(by=["_side", "_latest", "team"], ascending=[True, False, True], kind="mergesort")
+    return df.loc[key.index].reset_index(drop=True)
+
+def to_csv_text(df: pd.DataFrame) -> str:
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+def timed(fn, df_all, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df_all)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    missing = [f for f in LEAGUE_FILES if not (Path(args.data_dir) / f).exists()]
+    if missing:
+        print(f"⚠️ ไม่พบไฟล์ลีก: {', '.join(missing)} (รัน understat_scraper_auto/main.py ก่อน)")
+    if len(missing) == len(LEAGUE_FILES):
+        sys.exit(1)
+
+    df_all = load_understat(args.data_dir)
+    print(f"📦 understat rows={len(df_all)} | teams={df_all['team'].nunique()}")
+
+    t_old, old = timed(legacy_form_rows, df_all, 1)
+    t_new, new = timed(compute_form_rows, df_all, args.repeat)
+
+    same = to_csv_text(reorder_blocks(old)) == to_csv_text(new)
+    old_lines, new_lines = to_csv_text(old).splitlines(), to_csv_text(new).splitlines()
+    moved = sum(a != b for a, b in zip(old_lines, new_lines))
+    print(f"legacy     : {t_old:8.3f}s  rows={len(old)}")
+    print(f"vectorized : {t_new:8.3f}s  rows={len(new)}  (best of {args.repeat})")
+    print(f"speedup    : {t_old / t_new:8.1f}x")
+    print(f"block order: {moved} แถวย้ายตำแหน่งจากลำดับเดิม (ทีมที่วันล่าสุดเท่ากัน เรียงตามชื่อแทน)")
+    print("✅ CSV ตรงกันทุกไบต์ (หลังเรียงบล็อกแบบใหม่)" if same else "❌ CSV ไม่ตรงกัน")
+    if not same:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
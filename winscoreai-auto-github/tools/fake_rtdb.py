@@ -0,0 +1,216 @@
+# tools/fake_rtdb.py
+# -*- coding: utf-8 -*-
+"""
+Fake Firebase Realtime Database (REST) แบบ in-memory สำหรับทดสอบ/วัดผลในเครื่อง
+รองรับ GET / PUT / PATCH (multi-location) / DELETE บน /<path>.json
++ query: shallow=true, orderBy="$key" หรือ child path กับ startAt/endAt/equalTo
+  orderBy child ต้องมี .indexOn ใน rules (default database.rules.json ของ repo) ไม่งั้นตอบ 400 แบบ Firebase จริง
++ หน่วงเวลา (--latency) และสุ่ม error 503 (--fail-rate) เพื่อทดสอบ retry
+
+ใช้กับ firebase_admin ผ่าน emulator mode:
+  python tools/fake_rtdb.py --port 9000 [--seed dump.json] [--latency 0.2] [--rules database.rules.json]
+  export FIREBASE_DATABASE_EMULATOR_HOST=127.0.0.1:9000
+ดูจำนวน request ที่รับไป: GET http://127.0.0.1:9000/__stats
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RULES_PATH = Path(__file__).resolve().parents[1] / "database.rules.json"
+
+def load_rules(path=RULES_PATH) -> dict:
+    """rules tree (ใต้ "rules") — ไม่มีไฟล์ = ไม่มี index เลย"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("rules") or {}
+    except FileNotFoundError:
+        return {}
+
+def indexed(rules: dict, path: str, child: str) -> bool:
+    """มี .indexOn ของ child ที่ path นี้ไหม (รองรับ $wildcard)"""
+    node = rules
+    for seg in [s for s in path.strip("/").split("/") if s]:
+        if not isinstance(node, dict):
+            return False
+        nxt = node.get(seg)
+        if nxt is None:
+            nxt = next((v for k, v in node.items() if k.startswith("$")), None)
+        node = nxt
+    idx = node.get(".indexOn") if isinstance(node, dict) else None
+    return child in ([idx] if isinstance(idx, str) else (idx or []))
+
+class Store:
+    def __init__(self, data=None):
+        self.root = data if isinstance(data, dict) else {}
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    @staticmethod
+    def _segs(path):
+        return [s for s in path.strip("/").split("/") if s]
+
+    def get(self, path):
+        cur = self.root
+        for s in self._segs(path):
+            if not isinstance(cur, dict) or s not in cur:
+                return None
+            cur = cur[s]
+        return cur
+
+    def set(self, path, value):
+        segs = self._segs(path)
+        if not segs:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        cur = self.root
+        for s in segs[:-1]:
+            nxt = cur.get(s)
+            if not isinstance(nxt, dict):
+                nxt = cur[s] = {}
+            cur = nxt
+        if value is None:
+            cur.pop(segs[-1], None)
+        else:
+            cur[segs[-1]] = value
+
+    def update(self, path, patch):
+        base = path.strip("/")
+        for k, v in (patch or {}).items():
+            self.set(f"{base}/{k}" if base else k, v)
+
+def _query(value, qs):
+    if not isinstance(value, dict):
+        return value
+    if qs.get("shallow", [""])[0] == "true":
+        return {k: True for k in value}
+    order_by = json.loads(qs["orderBy"][0]) if "orderBy" in qs else None
+    if order_by == "$key":
+        keys = sorted(value)
+        if "equalTo" in qs:
+            eq = str(json.loads(qs["equalTo"][0]))
+            keys = [k for k in keys if k == eq]
+        if "startAt" in qs:
+            lo = str(json.loads(qs["startAt"][0]))
+            keys = [k for k in keys if k >= lo]
+        if "endAt" in qs:
+            hi = str(json.loads(qs["endAt"][0]))
+            keys = [k for k in keys if k <= hi]
+        if "limitToFirst" in qs:
+            keys = keys[:int(qs["limitToFirst"][0])]
+        if "limitToLast" in qs:
+            keys = keys[-int(qs["limitToLast"][0]):]
+        return {k: value[k] for k in keys}
+    if order_by:
+        # orderByChild: เก็บเฉพาะลูกที่มีค่า child (รองรับ path ลึก a/b/c)
+        def child(v):
+            for p in order_by.split("/"):
+                v = v.get(p) if isinstance(v, dict) else None
+            return v
+        vals = {k: child(v) for k, v in value.items()}
+        lo = json.loads(qs["startAt"][0]) if "startAt" in qs else None
+        hi = json.loads(qs["endAt"][0]) if "endAt" in qs else None
+        eq = json.loads(qs["equalTo"][0]) if "equalTo" in qs else None
+        keys = []
+        for k in sorted(value, key=lambda k: (str(type(vals[k])), str(vals[k]), k)):
+            cv = vals[k]
+            if cv is None and (lo is not None or hi is not None or eq is not None):
+                continue
+            if eq is not None and cv != eq:
+                continue
+            if lo is not None and (type(cv) is not type(lo) or cv < lo):
+                continue
+            if hi is not None and (type(cv) is not type(hi) or cv > hi):
+                continue
+            keys.append(k)
+        return {k: value[k] for k in keys}
+    return value
+
+def make_handler(store: Store, latency: float, fail_rate: float, rules: dict):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _send(self, code, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(n) or b"null")
+
+        def _handle(self, method):
+            u = urlparse(self.path)
+            if u.path == "/__stats":
+                return self._send(200, dict(store.stats))
+            if not u.path.endswith(".json"):
+                return self._send(404, {"error": "not found"})
+            path = u.path[:-len(".json")]
+            qs = parse_qs(u.query)
+            store.stats[method] += 1
+            store.stats["bytes_in"] += int(self.headers.get("Content-Length") or 0)
+            if latency:
+                time.sleep(latency)
+            if fail_rate and method != "GET" and random.random() < fail_rate:
+                store.stats["injected_errors"] += 1
+                return self._send(503, {"error": "injected failure"})
+            order_by = json.loads(qs["orderBy"][0]) if method == "GET" and "orderBy" in qs else None
+            if order_by and not order_by.startswith("$") and not indexed(rules, path, order_by):
+                store.stats["unindexed_queries"] += 1
+                return self._send(400, {"error": f'Index not defined, add ".indexOn": "{order_by}", '
+                                                 f'for path "/{path.strip("/")}", to the rules'})
+            with store.lock:
+                if method == "GET":
+                    out = _query(store.get(path), qs)
+                elif method == "PUT":
+                    out = self._read_body()
+                    store.set(path, out)
+                elif method == "PATCH":
+                    out = self._read_body()
+                    store.update(path, out)
+                else:
+                    store.set(path, None)
+                    out = None
+            self._send(200, out)
+
+        def do_GET(self): self._handle("GET")
+        def do_PUT(self): self._handle("PUT")
+        def do_PATCH(self): self._handle("PATCH")
+        def do_DELETE(self): self._handle("DELETE")
+    return Handler
+
+def serve(port=9000, seed=None, latency=0.0, fail_rate=0.0, rules=None):
+    """rules: rules tree สำหรับตรวจ .indexOn (None = โหลดจาก database.rules.json)"""
+    store = Store(seed)
+    rules = load_rules() if rules is None else rules
+    srv = ThreadingHTTPServer(("127.0.0.1", port), make_handler(store, latency, fail_rate, rules))
+    return srv, store
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--seed", help="JSON dump ของ DB เริ่มต้น")
+    ap.add_argument("--latency", type=float, default=0.0, help="หน่วงทุก request (วินาที)")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="สัดส่วน write ที่ตอบ 503")
+    ap.add_argument("--rules", default=str(RULES_PATH), help="rules JSON ที่มี .indexOn")
+    args = ap.parse_args()
+    seed = None
+    if args.seed:
+        with open(args.seed, encoding="utf-8") as f:
+            seed = json.load(f)
+    srv, _ = serve(args.port, seed, args.latency, args.fail_rate, load_rules(args.rules))
+    print(f"🧪 fake RTDB on http://127.0.0.1:{args.port} (latency={args.latency}s, fail_rate={args.fail_rate})")
+    srv.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 # tools/inspect_matches.py
-import os, json, re
+import os, sys, json, re
+from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import credentials
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # -> winscoreai-auto-github/
+import match_cache  # noqa: E402
 
 DBURL = "https://winscoreai-app-default-rtdb.asia-southeast1.firebasedatabase.app/"
 LOOKBACK_DAYS = int(os.getenv("LOOKBACK_DAYS", "14"))
@@ -47,21 +51,19 @@ def unwrap(node):
     return node.get("results", node) if isinstance(node, dict) else {}
 
 def fetch_matches():
-    ref = db.reference("matches")
-    data = ref.get() or {}
+    # อ่านจาก match cache ในเครื่อง (MATCH_CACHE เปิด → sync แบบ delta, ปิด → โหลดเต็ม)
+    match_cache.sync()
     items = []
     cutoff = (datetime.utcnow() - timedelta(days=LOOKBACK_DAYS)).date()
-    for season, fixtures in (data or {}).items():
-        if not isinstance(fixtures, dict): continue
-        for fid, node in fixtures.items():
-            body = unwrap(node)
-            date = body.get("date")
-            try:
-                d = datetime.fromisoformat(date).date()
-            except Exception:
-                continue
-            if d >= cutoff:
-                items.append((str(fid), body))
+    for _, fid, _, _, _, node in match_cache.iter_fixtures():
+        body = unwrap(node)
+        date = body.get("date")
+        try:
+            d = datetime.fromisoformat(date).date()
+        except Exception:
+            continue
+        if d >= cutoff:
+            items.append((str(fid), body))
     return items
 
 def main():
@@ -1,22 +1,18 @@
 # tools/suggest_aliases.py
 # -*- coding: utf-8 -*-
 import pandas as pd
-from firebase_admin import db
 from firebase_push import firebase_admin  # ensure initialized
+import match_cache
 
 WIN_DATA = "understat_scraper_auto/data/win_data.csv"
 
 def get_match_names():
-    root = db.reference("matches").get() or {}
+    # ชื่อทีมจาก match cache ในเครื่อง (MATCH_CACHE เปิด → sync เฉพาะ fixture ที่เปลี่ยน, ปิด → โหลดเต็ม)
+    match_cache.sync()
     names = set()
-    for _, seasons in (root or {}).items():
-        for _, fixtures in (seasons or {}).items():
-            for _, obj in (fixtures or {}).items():
-                res = (obj or {}).get("results", {})
-                h = res.get("teams", {}).get("home", {}).get("name")
-                a = res.get("teams", {}).get("away", {}).get("name")
-                if isinstance(h, str): names.add(h.strip())
-                if isinstance(a, str): names.add(a.strip())
+    for _, _, _, h, a, _ in match_cache.iter_fixtures(with_body=False):
+        if isinstance(h, str): names.add(h.strip())
+        if isinstance(a, str): names.add(a.strip())
     return names
 
 if __name__ == "__main__":
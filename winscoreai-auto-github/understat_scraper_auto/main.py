@@ -8,6 +8,14 @@ from datetime import datetime
 from dateutil import parser
 import schedule
 import time
+import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from understat_scraper_auto import storage
 
 LEAGUE_SCHEDULE = ["EPL", "La Liga", "Serie A", "Bundesliga", "Ligue 1"]
 LEAGUE_MAPPING = {
@@ -21,6 +29,11 @@ DATA_DIR = "understat_scraper_auto/data"
 MAPPING_FILE = "understat_scraper_auto/team_mapping/eng_to_th.csv"
 START_YEAR = 2014
 CURRENT_YEAR = datetime.now().year
+# ชี้ไป stand-in ในเครื่องได้ (เช่น python -m http.server --directory recorded_pages
+# โดยเก็บหน้าไว้ที่ recorded_pages/league/EPL/2024)
+UNDERSTAT_BASE_URL = os.getenv("UNDERSTAT_BASE_URL", "https://understat.com").rstrip("/")
+FETCH_WORKERS = int(os.getenv("UNDERSTAT_WORKERS", "6"))
+HOST_MIN_INTERVAL = float(os.getenv("UNDERSTAT_HOST_MIN_INTERVAL", "0.2"))  # วินาทีขั้นต่ำระหว่าง request ต่อ host
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs("team_mapping", exist_ok=True)
 os.makedirs(os.path.dirname(MAPPING_FILE), exist_ok=True)
@@ -48,63 +61,262 @@ def extract_xg(team_obj):
     except:
         return None
 
-def fetch_league_data(league):
-    league_code = LEAGUE_MAPPING[league]
-    csv_path = f"{DATA_DIR}/understat_{league_code.lower()}.csv"
-    if os.path.exists(csv_path):
-        print(f"⏭ ข้าม {league} (มีไฟล์อยู่แล้ว)")
-        return
-    print(f"📥 กำลังดึงข้อมูล {league} ...")
+# ---------- HTTP (pooled session + per-host rate limit) ----------
+class HostRateLimiter:
+    """
+    เว้นระยะ request ต่อ host อย่างน้อย min_interval วินาที (thread-safe)
+    นับจากเวลาที่ปล่อย request ก่อนหน้าจริง: thread ที่ตื่นช้าจะไม่ไปชิด request ถัดไป
+    """
+    def __init__(self, min_interval: float, clock=time.monotonic, sleep=time.sleep):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def wait(self, url: str):
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                now = self._clock()
+                ready_at = self._last.get(host, now - self.min_interval) + self.min_interval
+                if now >= ready_at:
+                    self._last[host] = now
+                    return
+            # ตื่นแล้วต้องเช็คใหม่ใต้ lock (อาจมี thread อื่นได้ช่องไปก่อน)
+            self._sleep(ready_at - now)
+
+_RATE_LIMITER = HostRateLimiter(HOST_MIN_INTERVAL)
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session() -> requests.Session:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(FETCH_WORKERS, 1), max_retries=retry)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _SESSION = s
+        return _SESSION
+
+def season_url(league_code, year):
+    return f"{UNDERSTAT_BASE_URL}/league/{league_code}/{year}"
+
+def fetch_season_page(league_code, year) -> bytes:
+    url = season_url(league_code, year)
+    _RATE_LIMITER.wait(url)
+    res = get_session().get(url, timeout=30)
+    res.raise_for_status()
+    return res.content
+
+# fast path: หา payload ใน bytes ตรง ๆ ไม่ต้องสร้าง DOM
+_TEAMS_DATA_RE = re.compile(rb"var\s+teamsData\s+=\s+JSON\.parse\('(.*?)'\);", re.S)
+
+def parse_teams_data_fast(raw: bytes) -> dict | None:
+    m = _TEAMS_DATA_RE.search(raw)
+    if not m:
+        return None
+    return json.loads(m.group(1).decode("unicode_escape"))
+
+def parse_teams_data_soup(html: str, url: str = "") -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    script = soup.find("script", text=lambda t: t and "teamsData" in t)
+    pattern = re.search(r"var\s+teamsData\s+=\s+JSON\.parse\('(.*?)'\);", script.text) if script else None
+    if not pattern:
+        raise Exception(f"❌ ไม่พบข้อมูล teamsData จาก {url}")
+    json_str = pattern.group(1).encode("utf8").decode("unicode_escape")
+    return json.loads(json_str)
+
+def parse_teams_data(raw: bytes, url: str = "") -> dict:
+    """regex บน bytes ก่อน; ถ้าหน้าเปลี่ยนรูปแบบค่อย fallback ไป BeautifulSoup"""
+    try:
+        teams_data = parse_teams_data_fast(raw)
+    except ValueError:
+        teams_data = None
+    if teams_data is not None:
+        return teams_data
+    return parse_teams_data_soup(raw.decode("utf-8", errors="replace"), url)
+
+def fetch_seasons(pairs, workers=None) -> dict:
+    """
+    ดึง+parse หลาย (league_code, year) พร้อมกันด้วย thread pool ที่ใช้ session เดียวกัน
+    คืน {(league_code, year): teams_data}
+    """
+    def _one(pair):
+        league_code, year = pair
+        return parse_teams_data(fetch_season_page(league_code, year), season_url(league_code, year))
+
+    pairs = list(pairs)
+    with ThreadPoolExecutor(max_workers=workers or FETCH_WORKERS) as ex:
+        return dict(zip(pairs, ex.map(_one, pairs)))
+
+def league_csv_path(league):
+    return storage.league_csv_path(LEAGUE_MAPPING[league], DATA_DIR)
+
+def save_league(league, df: pd.DataFrame):
+    """เขียนข้อมูลลีกตาม backend (UNDERSTAT_STORAGE=csv|parquet)"""
+    if storage.use_parquet():
+        storage.write_league_parquet(LEAGUE_MAPPING[league], df, DATA_DIR)
+    else:
+        df.to_csv(league_csv_path(league), index=False, encoding="utf-8-sig")
+
+def season_rows(teams_data: dict, year: int, team_names: set) -> list:
+    rows = []
+    for team_id, team_obj in teams_data.items():
+        team_name_en = team_obj["title"]
+        team_names.add(team_name_en)
+        team_name_th = ENG2TH.get(team_name_en, team_name_en)
+        for match in team_obj["history"]:
+            row = {
+                "date": parser.parse(match["date"]).strftime("%#d %b %Y"),
+                "season": year,
+                "team": team_name_th,
+                "xG": extract_xg(match),
+                "xGA": float(match.get("xGA", 0)),
+                "scored": int(match["scored"]),
+                "missed": int(match["missed"]),
+                "result": match["result"],
+                "npxG": float(match.get("npxG", 0)),
+                "deep": int(match.get("deep", 0)),
+                "ppda": float(match.get("ppda", {}).get("att", 0)),
+                "xpts": float(match.get("xpts", 0)),
+                "h_a": match["h_a"]
+            }
+            rows.append(row)
+    return rows
+
+def write_league(league, seasons: dict):
+    """seasons = {year: teams_data} → understat_{league}.csv (เรียงตามปีเหมือนเดิม)"""
     all_data = []
     all_team_names = set()
-
-    for year in range(START_YEAR, CURRENT_YEAR + 1):
-        url = f"https://understat.com/league/{league_code}/{year}"
-        res = requests.get(url)
-        soup = BeautifulSoup(res.text, "html.parser")
-        script = soup.find("script", text=lambda t: t and "teamsData" in t)
-        pattern = re.search(r"var\s+teamsData\s+=\s+JSON\.parse\('(.*?)'\);", script.text)
-        if not pattern:
-            raise Exception(f"❌ ไม่พบข้อมูล teamsData จาก {url}")
-        json_str = pattern.group(1).encode("utf8").decode("unicode_escape")
-        teams_data = json.loads(json_str)
-
-        for team_id, team_obj in teams_data.items():
-            team_name_en = team_obj["title"]
-            all_team_names.add(team_name_en)
-            team_name_th = ENG2TH.get(team_name_en, team_name_en)
-            for match in team_obj["history"]:
-                row = {
-                    "date": parser.parse(match["date"]).strftime("%#d %b %Y"),
-                    "season": year,
-                    "team": team_name_th,
-                    "xG": extract_xg(match),
-                    "xGA": float(match.get("xGA", 0)),
-                    "scored": int(match["scored"]),
-                    "missed": int(match["missed"]),
-                    "result": match["result"],
-                    "npxG": float(match.get("npxG", 0)),
-                    "deep": int(match.get("deep", 0)),
-                    "ppda": float(match.get("ppda", {}).get("att", 0)),
-                    "xpts": float(match.get("xpts", 0)),
-                    "h_a": match["h_a"]
-                }
-
-               
-                all_data.append(row)
+    for year in sorted(seasons):
+        all_data.extend(season_rows(seasons[year], year, all_team_names))
 
     save_team_mapping(all_team_names)
-    df = pd.DataFrame(all_data)
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    save_league(league, pd.DataFrame(all_data))
     print(f"✅ ดึงข้อมูล {league} ครบแล้ว")
 
+# ---------- incremental refresh (ฤดูกาลล่าสุดเท่านั้น) ----------
+MERGE_KEY = ["team", "date", "h_a"]
+
+def current_season(d=None):
+    d = d or datetime.now()
+    return d.year if d.month >= 7 else d.year - 1
+
+def read_league_csv(league) -> pd.DataFrame:
+    # อ่านเป็น string ทั้งหมด → แถวเดิมเขียนกลับได้ตรงตัว (ไม่มี float ปัดเศษ)
+    return pd.read_csv(league_csv_path(league), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+def read_league_existing(league) -> pd.DataFrame:
+    """parquet mode → frame มี type; csv mode → string ทั้งหมด (ดู read_league_csv)"""
+    if storage.use_parquet():
+        return storage.read_league_typed(LEAGUE_MAPPING[league], DATA_DIR)
+    return read_league_csv(league)
+
+def refresh_seasons(df_existing: pd.DataFrame) -> list:
+    """ฤดูกาลของแถวที่ใหม่ที่สุด (+ ฤดูกาลถัดไปถ้าขึ้นฤดูกาลใหม่แล้ว)"""
+    if df_existing.empty:
+        return list(range(START_YEAR, CURRENT_YEAR + 1))
+    dates = pd.to_datetime(df_existing["date"], format="%d %b %Y", errors="coerce")
+    newest = int(df_existing.loc[dates.idxmax(), "season"]) if dates.notna().any() else int(df_existing["season"].astype(int).max())
+    return list(range(newest, max(newest, current_season()) + 1))
+
+def merge_league(league, seasons: dict):
+    """merge แถวจากฤดูกาลที่ดึงใหม่เข้าไฟล์เดิมด้วย key (team, date, h_a): แทนที่แถวเดิม/ต่อท้ายแถวใหม่"""
+    df_old = read_league_existing(league)
+    team_names = set()
+    rows = []
+    for year in sorted(seasons):
+        rows.extend(season_rows(seasons[year], year, team_names))
+    save_team_mapping(team_names)
+    if not rows:
+        print(f"⏭ {league}: ไม่มีแถวใหม่")
+        return
+
+    df_new = pd.DataFrame(rows).drop_duplicates(subset=MERGE_KEY, keep="last")
+    if storage.use_parquet():
+        df_new = storage.to_typed_understat(df_new)
+    else:
+        df_new = df_new.astype({c: str for c in df_new.columns if c != "xG"})
+        df_new["xG"] = df_new["xG"].map(lambda v: "" if v is None or pd.isna(v) else str(v))
+    new_keys = pd.MultiIndex.from_frame(df_new[MERGE_KEY])
+    old_keys = pd.MultiIndex.from_frame(df_old[MERGE_KEY])
+
+    # แถวเดิมที่มี key ซ้ำ → แทนที่ในตำแหน่งเดิม, key ใหม่ → ต่อท้าย
+    df_new_idx = df_new.set_index(new_keys)
+    hit = old_keys.isin(new_keys)
+    cols = list(df_new.columns)
+    df_out = df_old.copy()
+    changed = 0
+    if hit.any():
+        for c in cols:
+            df_out.loc[hit, c] = df_new_idx.loc[old_keys[hit], c].to_numpy()
+        a, b = df_out.loc[hit, cols], df_old.loc[hit, cols]
+        changed = int((~((a == b) | (a.isna() & b.isna()))).any(axis=1).sum())
+    appended = df_new[~new_keys.isin(old_keys)]
+    df_out = pd.concat([df_out, appended], ignore_index=True)
+    if changed == 0 and appended.empty:
+        print(f"⏭ {league}: ข้อมูลล่าสุดแล้ว (ฤดูกาล {', '.join(map(str, sorted(seasons)))})")
+        return
+    save_league(league, df_out)
+    print(f"✅ อัปเดต {league}: +{len(appended)} แถวใหม่, แก้ {changed} แถว (ฤดูกาล {', '.join(map(str, sorted(seasons)))})")
+
+def fetch_leagues(leagues, workers=None, refresh=False):
+    """
+    backfill หลายลีกพร้อมกัน — ทุกฤดูกาลของทุกลีกเข้า pool เดียว
+    refresh=True: ลีกที่มีไฟล์อยู่แล้วจะดึงเฉพาะฤดูกาลล่าสุดแล้ว merge (ปกติ 1 request ต่อลีก)
+    """
+    pending, refreshing = [], {}
+    for league in leagues:
+        if not storage.league_exists(LEAGUE_MAPPING[league], DATA_DIR):
+            pending.append(league)
+        elif refresh:
+            refreshing[league] = refresh_seasons(read_league_existing(league))
+        else:
+            print(f"⏭ ข้าม {league} (มีไฟล์อยู่แล้ว)")
+    if not pending and not refreshing:
+        return
+    if pending:
+        print(f"📥 กำลังดึงข้อมูล {', '.join(pending)} ...")
+    for league, years in refreshing.items():
+        print(f"🔄 refresh {league} ฤดูกาล {', '.join(map(str, years))} ...")
+
+    years = range(START_YEAR, CURRENT_YEAR + 1)
+    pairs = [(LEAGUE_MAPPING[lg], y) for lg in pending for y in years]
+    pairs += [(LEAGUE_MAPPING[lg], y) for lg, ys in refreshing.items() for y in ys]
+    pages = fetch_seasons(pairs, workers)
+    for league in pending:
+        code = LEAGUE_MAPPING[league]
+        write_league(league, {y: pages[(code, y)] for y in years})
+    for league, ys in refreshing.items():
+        code = LEAGUE_MAPPING[league]
+        merge_league(league, {y: pages[(code, y)] for y in ys})
+
+def fetch_league_data(league, refresh=False):
+    fetch_leagues([league], refresh=refresh)
+
+def fetch_all_leagues(workers=None, refresh=False):
+    fetch_leagues(LEAGUE_SCHEDULE, workers, refresh=refresh)
+
 def job():
     today_index = datetime.today().weekday() % len(LEAGUE_SCHEDULE)
     league_today = LEAGUE_SCHEDULE[today_index]
-    fetch_league_data(league_today)
+    fetch_league_data(league_today, refresh=True)
     print("🎯 ระบบอัปเดตเรียบร้อย")
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--all", action="store_true", help="backfill ทุกลีกใน LEAGUE_SCHEDULE พร้อมกันแล้วจบ")
+    ap.add_argument("--workers", type=int, default=None, help=f"จำนวน thread (default={FETCH_WORKERS})")
+    ap.add_argument("--refresh", action="store_true", help="ลีกที่มีไฟล์แล้ว: ดึงเฉพาะฤดูกาลล่าสุดแล้ว merge")
+    args = ap.parse_args()
+    if args.all:
+        fetch_all_leagues(args.workers, refresh=args.refresh)
+        raise SystemExit(0)
+
     job()  # Run once immediately
     schedule.every().day.at("06:00").do(job)
     while True:
@@ -0,0 +1,187 @@
+# understat_scraper_auto/storage.py
+# -*- coding: utf-8 -*-
+"""
+storage backend ของข้อมูล Understat + win_data
+
+- csv (default): understat_{league}.csv / win_data.csv แบบเดิม (UTF-8-BOM)
+- parquet: UNDERSTAT_STORAGE=parquet (ต้องมี pyarrow)
+    {DATA_DIR}/understat/league={league}/data.parquet   (1 partition ต่อ 1 ลีก, คอลัมน์มี type)
+    {DATA_DIR}/win_data.parquet
+  ตัวอ่านทุกตัวใช้ parquet ถ้ามีไฟล์ ไม่งั้น fallback ไป CSV เดิม → เปลี่ยน backend ได้โดยไม่ต้อง migrate ก่อน
+
+Migrate CSV เดิมเป็น parquet:
+  python -m understat_scraper_auto.storage --migrate
+"""
+
+import os
+import argparse
+
+import pandas as pd
+
+DATA_DIR = "understat_scraper_auto/data"
+STORAGE = os.getenv("UNDERSTAT_STORAGE", "csv").strip().lower()
+PARQUET_SUBDIR = "understat"
+
+UNDERSTAT_DTYPES = {
+    "season": "int16",
+    "team": "string",
+    "xG": "float64",
+    "xGA": "float64",
+    "scored": "int16",
+    "missed": "int16",
+    "result": "string",
+    "npxG": "float64",
+    "deep": "int32",
+    "ppda": "float64",
+    "xpts": "float64",
+    "h_a": "string",
+}
+WIN_DATA_DTYPES = {
+    "team": "string",
+    "side": "string",
+    "games_count": "int8",
+}
+
+_warned = False
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+def use_parquet() -> bool:
+    global _warned
+    if STORAGE != "parquet":
+        return False
+    if parquet_available():
+        return True
+    if not _warned:
+        print("⚠️ UNDERSTAT_STORAGE=parquet แต่ไม่มี pyarrow — ใช้ CSV แทน")
+        _warned = True
+    return False
+
+# ---------- Understat (per league) ----------
+def league_csv_path(league_code: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f"understat_{league_code.lower()}.csv")
+
+def league_parquet_path(league_code: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, PARQUET_SUBDIR, f"league={league_code.lower()}", "data.parquet")
+
+def league_exists(league_code: str, data_dir: str = DATA_DIR) -> bool:
+    if use_parquet() and os.path.exists(league_parquet_path(league_code, data_dir)):
+        return True
+    return os.path.exists(league_csv_path(league_code, data_dir))
+
+def parse_understat_dates(s: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(s, format="%d %b %Y")
+    except:
+        return pd.to_datetime(s)
+
+def to_typed_understat(df: pd.DataFrame) -> pd.DataFrame:
+    """แปลง frame จาก CSV/scraper ให้มี type (date เป็น datetime64)"""
+    df = df.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = parse_understat_dates(df["date"])
+    for col, dtype in UNDERSTAT_DTYPES.items():
+        if col in df.columns:
+            if dtype.startswith("float") or dtype.startswith("int"):
+                df[col] = pd.to_numeric(df[col].replace("", None), errors="coerce").astype(dtype)
+            else:
+                df[col] = df[col].astype(dtype)
+    return df
+
+def write_league_parquet(league_code: str, df: pd.DataFrame, data_dir: str = DATA_DIR):
+    path = league_parquet_path(league_code, data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    to_typed_understat(df).to_parquet(path, index=False, compression="zstd")
+
+def read_league_typed(league_code: str, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    path = league_parquet_path(league_code, data_dir)
+    if use_parquet() and os.path.exists(path):
+        return pd.read_parquet(path)
+    return to_typed_understat(pd.read_csv(league_csv_path(league_code, data_dir)))
+
+def list_understat_sources(data_dir: str = DATA_DIR) -> list[str]:
+    """
+    path (relative กับ data_dir) ของไฟล์ต้นทางทุกลีก
+    parquet mode: ใช้ partition ที่มี + CSV ของลีกที่ยังไม่มี partition
+    """
+    csv_files = [f for f in os.listdir(data_dir) if f.startswith("understat_") and f.endswith(".csv")]
+    if not use_parquet():
+        return csv_files
+    part_root = os.path.join(data_dir, PARQUET_SUBDIR)
+    parts = []
+    if os.path.isdir(part_root):
+        for d in sorted(os.listdir(part_root)):
+            if d.startswith("league=") and os.path.exists(os.path.join(part_root, d, "data.parquet")):
+                parts.append(os.path.join(PARQUET_SUBDIR, d, "data.parquet"))
+    have = {p.split(os.sep)[1][len("league="):] for p in parts}
+    return parts + [f for f in csv_files if f[len("understat_"):-len(".csv")] not in have]
+
+def read_understat_source(rel_path: str, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """อ่านไฟล์ต้นทาง 1 ไฟล์ — CSV คืนแบบดิบ (date เป็น string) เหมือนเดิม, parquet มี type แล้ว"""
+    path = os.path.join(data_dir, rel_path)
+    if rel_path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+# ---------- win_data ----------
+def win_data_csv_path(data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, "win_data.csv")
+
+def win_data_parquet_path(data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, "win_data.parquet")
+
+def win_data_path(data_dir: str = DATA_DIR) -> str:
+    """ไฟล์ win_data ที่ backend ปัจจุบันเขียน"""
+    return win_data_parquet_path(data_dir) if use_parquet() else win_data_csv_path(data_dir)
+
+def _write_win_data_parquet(df: pd.DataFrame, path: str):
+    typed = df.astype(WIN_DATA_DTYPES)
+    typed["latest_date"] = pd.to_datetime(typed["latest_date"], format="%Y-%m-%d")
+    typed.to_parquet(path, index=False, compression="zstd")
+
+def write_win_data(df: pd.DataFrame, data_dir: str = DATA_DIR) -> str:
+    path = win_data_path(data_dir)
+    if path.endswith(".parquet"):
+        _write_win_data_parquet(df, path)
+    else:
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+def read_win_data(data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """
+    คืน frame หน้าตาเดียวกับ pd.read_csv(win_data.csv) ไม่ว่า backend ไหน
+    (latest_date เป็น string YYYY-MM-DD, team/side เป็น str)
+    """
+    ppath = win_data_parquet_path(data_dir)
+    if use_parquet() and os.path.exists(ppath):
+        df = pd.read_parquet(ppath)
+        df["latest_date"] = df["latest_date"].dt.strftime("%Y-%m-%d")
+        return df.astype({"team": object, "side": object, "games_count": "int64"})
+    return pd.read_csv(win_data_csv_path(data_dir), float_precision="round_trip")
+
+# ---------- migrate ----------
+def migrate_csv_to_parquet(data_dir: str = DATA_DIR):
+    if not parquet_available():
+        raise SystemExit("❌ ต้องติดตั้ง pyarrow ก่อน (pip install pyarrow)")
+    for f in sorted(os.listdir(data_dir)):
+        if f.startswith("understat_") and f.endswith(".csv"):
+            code = f[len("understat_"):-len(".csv")]
+            write_league_parquet(code, pd.read_csv(os.path.join(data_dir, f), float_precision="round_trip"), data_dir)
+            print(f"✅ {f} → {league_parquet_path(code, data_dir)}")
+    wcsv = win_data_csv_path(data_dir)
+    if os.path.exists(wcsv):
+        _write_win_data_parquet(pd.read_csv(wcsv, float_precision="round_trip"), win_data_parquet_path(data_dir))
+        print(f"✅ win_data.csv → {win_data_parquet_path(data_dir)}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--migrate", action="store_true", help="แปลง understat_*.csv + win_data.csv เป็น parquet")
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    args = ap.parse_args()
+    if args.migrate:
+        migrate_csv_to_parquet(args.data_dir)
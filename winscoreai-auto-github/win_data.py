@@ -1,48 +1,258 @@
 # understat_scraper_auto/win_data.py
 
 import pandas as pd
+import numpy as np
 import os
+import json
+import hashlib
+import argparse
 from datetime import datetime
 
-def generate_win_data():
-    DATA_DIR = "understat_scraper_auto/data"
-    OUTPUT_FILE = os.path.join(DATA_DIR, "win_data.csv")
+from understat_scraper_auto import storage
 
-    csv_files = [f for f in os.listdir(DATA_DIR) if f.startswith("understat_") and f.endswith(".csv")]
-    df_all = pd.concat([pd.read_csv(os.path.join(DATA_DIR, f)) for f in csv_files])
+DATA_DIR = "understat_scraper_auto/data"
+OUTPUT_FILE = storage.win_data_path(DATA_DIR)  # win_data.csv หรือ win_data.parquet ตาม UNDERSTAT_STORAGE
+# manifest สำหรับ rebuild แบบ incremental (ลายเซ็นไฟล์ + digest ต่อทีมต่อไฟล์)
+STATE_FILE = os.path.join(DATA_DIR, "win_data_state.json")
+STATE_VERSION = 1
 
-    try:
-        df_all["date"] = pd.to_datetime(df_all["date"], format="%d %b %Y")
-    except:
-        df_all["date"] = pd.to_datetime(df_all["date"])
+# ค่าเฉลี่ยฟอร์มจาก N นัดก่อนหน้า (ไม่รวมนัดปัจจุบัน) ต้องมีอย่างน้อย MIN_GAMES นัด
+FORM_WINDOW = 5
+MIN_GAMES = 3
+AVG_COLUMNS = {
+    "avg_xG": "xG",
+    "avg_xGA": "xGA",
+    "avg_scored": "scored",
+    "avg_missed": "missed",
+    "avg_xpts": "xpts",
+}
+OUTPUT_COLUMNS = ["team", "latest_date", "side", *AVG_COLUMNS, "games_count"]
+
+def list_understat_files(data_dir: str = DATA_DIR) -> list[str]:
+    return storage.list_understat_sources(data_dir)
+
+def load_understat(data_dir: str = DATA_DIR, csv_files: list[str] | None = None) -> pd.DataFrame:
+    """รวมข้อมูล Understat ทุกลีก (หรือเฉพาะ csv_files) + แปลง date เป็น datetime แล้วเรียงใหม่→เก่า"""
+    if csv_files is None:
+        csv_files = list_understat_files(data_dir)
+    frames = []
+    for f in csv_files:
+        df = storage.read_understat_source(f, data_dir)
+        if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+            df["date"] = storage.parse_understat_dates(df["date"])
+        frames.append(df.assign(_source=f))
+    df_all = pd.concat(frames)
+
+    return df_all.sort_values(by="date", ascending=False)
 
-    df_all = df_all.sort_values(by="date", ascending=False)
+def _block_codes(df_side: pd.DataFrame) -> np.ndarray:
+    """
+    ลำดับบล็อกทีม: วันที่ล่าสุด (ระดับวัน = latest_date) ใหม่→เก่า แล้วชื่อทีม
+    ใช้ key เดียวกับ _splice → incremental กับ full rebuild ได้ไฟล์เดียวกัน (ทีมแข่งวันเดียวกันเป็นเรื่องปกติ)
+    ต่างจาก win_data.csv แบบเดิม (ลำดับที่เจอหลัง sort วันเวลาแบบ unstable) เฉพาะลำดับบล็อกของทีมที่วันล่าสุดเท่ากัน
+    แถว/ค่า/ลำดับในทีมเหมือนเดิม — ตรวจด้วย tools/bench_win_data.py
+    ทีมที่เป็น NaN = -1
+    """
+    latest = df_side.groupby("team")["date"].max().dt.strftime("%Y-%m-%d")
+    order = latest.reset_index().sort_values(by=["date", "team"], ascending=[False, True], kind="mergesort")
+    codes = dict(zip(order["team"], range(len(order))))
+    return df_side["team"].map(codes).fillna(-1).astype(int).to_numpy()
 
-    all_rows = []
+def compute_form_rows(df_all: pd.DataFrame) -> pd.DataFrame:
+    """
+    คำนวณ avg_* ทุกแถวในครั้งเดียว (groupby team/h_a + shift) แทนการวน iloc ต่อแถว
+    df_all ต้องเรียง date ใหม่→เก่าแล้ว (จาก load_understat) — ลำดับแถวผลลัพธ์เหมือนเดิม:
+    side (home→away) → ทีมตามวันที่ล่าสุด ใหม่→เก่า (วันเดียวกันเรียงตามชื่อทีม) → วันที่ใหม่→เก่า
+    """
+    frames = []
     for is_home in ["h", "a"]:
         df_side = df_all[df_all["h_a"] == is_home]
-        for team in df_side["team"].unique():
-            df_team = df_side[df_side["team"] == team].copy()
-            df_team = df_team.sort_values(by="date", ascending=False)
-
-            for i in range(len(df_team)):
-                recent = df_team.iloc[i+1:i+6]
-                if len(recent) < 3:
-                    continue
-
-                row = {
-                    "team": team,
-                    "latest_date": df_team.iloc[i]["date"].strftime("%Y-%m-%d"),
-                    "side": "home" if is_home == "h" else "away",
-                    "avg_xG": recent["xG"].mean(),
-                    "avg_xGA": recent["xGA"].mean(),
-                    "avg_scored": recent["scored"].mean(),
-                    "avg_missed": recent["missed"].mean(),
-                    "avg_xpts": recent["xpts"].mean(),
-                    "games_count": len(recent)
-                }
-                all_rows.append(row)
-
-    win_data = pd.DataFrame(all_rows)
-    win_data.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
-    print(f"✅ สร้างไฟล์ win_data.csv เรียบร้อยแล้ว → {OUTPUT_FILE}")
+        df_side = df_side.assign(_team_code=_block_codes(df_side))
+        df_side = df_side[df_side["_team_code"] >= 0]
+        df_side = df_side.sort_values(by=["_team_code", "date"], ascending=[True, False], kind="mergesort")
+        grouped = df_side.groupby("_team_code", sort=False)
+
+        # จำนวนนัดก่อนหน้าที่อยู่ในหน้าต่าง (นับแถว ไม่สนว่าค่าเป็น NaN) = len(iloc[i+1:i+6])
+        remaining = grouped.cumcount(ascending=False).to_numpy()
+        games_count = np.minimum(remaining, FORM_WINDOW)
+        keep = games_count >= MIN_GAMES
+
+        out = pd.DataFrame({
+            "team": df_side["team"].to_numpy()[keep],
+            "latest_date": df_side["date"].dt.strftime("%Y-%m-%d").to_numpy()[keep],
+            "side": "home" if is_home == "h" else "away",
+        })
+        for avg_col, src_col in AVG_COLUMNS.items():
+            # lag k = นัดที่เก่ากว่า k นัด; บวกเรียง lag1..lag5 ตามลำดับเดียวกับ Series.mean() เดิม
+            # (rolling().mean() ใช้ผลรวมสะสม ทำให้ทศนิยมหลักท้ายไม่ตรงกับไฟล์เดิม)
+            total = np.zeros(len(df_side))
+            count = np.zeros(len(df_side))
+            for k in range(1, FORM_WINDOW + 1):
+                lag = grouped[src_col].shift(-k).to_numpy(dtype=float)
+                has = ~np.isnan(lag)
+                total = total + np.where(has, lag, 0.0)
+                count = count + has
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[avg_col] = np.where(count > 0, total / count, np.nan)[keep]
+        out["games_count"] = games_count[keep]
+        frames.append(out)
+
+    return pd.concat(frames, ignore_index=True)[OUTPUT_COLUMNS]
+
+def latest_form_by_team(df: pd.DataFrame) -> tuple[dict, dict]:
+    """
+    แถวฟอร์มล่าสุด (แถวแรกของแต่ละทีมใน win_data) แยก home/away เป็น dict team -> record
+    ลำดับ key = ลำดับทีมใน win_data (เหมือน df["team"].unique())
+    """
+    out = []
+    for side in ("home", "away"):
+        df_side = df[(df["side"] == side) & df["team"].notna()]
+        latest = df_side.drop_duplicates(subset="team", keep="first")
+        out.append({r["team"]: r for r in latest.to_dict("records")})
+    return out[0], out[1]
+
+# =========================
+# Incremental state
+# =========================
+def _sha1_file(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _file_signature(path: str, prev: dict | None = None) -> dict:
+    """mtime/size ไม่เปลี่ยน → ใช้ sha1 เดิม (ไม่ต้องอ่านไฟล์ซ้ำ)"""
+    st = os.stat(path)
+    if prev and prev.get("mtime") == st.st_mtime and prev.get("size") == st.st_size:
+        return prev
+    return {"mtime": st.st_mtime, "size": st.st_size, "sha1": _sha1_file(path)}
+
+def _team_digests(df_all: pd.DataFrame) -> dict:
+    """
+    digest ต่อ (side, team, ไฟล์) จากคอลัมน์ที่มีผลกับ win_data
+    คืน {side: {team: {"last_date": ..., "files": {source: digest}}}}
+    """
+    cols = ["date", *AVG_COLUMNS.values()]
+    row_hash = pd.util.hash_pandas_object(df_all[cols], index=False).to_numpy()
+    keys = df_all[["h_a", "team", "_source"]].assign(_hash=row_hash, date=df_all["date"])
+    teams: dict = {}
+    for (h_a, team, source), g in keys.groupby(["h_a", "team", "_source"], sort=False):
+        side = "home" if h_a == "h" else "away"
+        entry = teams.setdefault(side, {}).setdefault(team, {"last_date": None, "files": {}})
+        entry["files"][source] = hashlib.sha1(np.sort(g["_hash"].to_numpy()).tobytes()).hexdigest()
+        last = g["date"].max().strftime("%Y-%m-%d")
+        entry["last_date"] = max(entry["last_date"] or last, last)
+    return teams
+
+def _load_state() -> dict | None:
+    if not os.path.exists(STATE_FILE):
+        return None
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception:
+        return None
+    if state.get("version") != STATE_VERSION or state.get("window") != [FORM_WINDOW, MIN_GAMES]:
+        return None
+    if state.get("output") != OUTPUT_FILE:
+        return None
+    return state
+
+def _save_state(files: dict, teams: dict):
+    state = {
+        "version": STATE_VERSION,
+        "window": [FORM_WINDOW, MIN_GAMES],
+        "output": OUTPUT_FILE,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+        "teams": teams,
+    }
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+def _splice(old: pd.DataFrame, fresh: pd.DataFrame, changed: set) -> pd.DataFrame:
+    """
+    แทนแถวของทีมที่เปลี่ยนด้วยแถวที่คำนวณใหม่ แล้วเรียงบล็อกทีมแบบเดียวกับ full rebuild
+    (home→away แล้วตามวันที่ล่าสุดของทีม ใหม่→เก่า, วันเดียวกันเรียงตามชื่อทีม; แถวในทีมเรียงใหม่→เก่าอยู่แล้ว)
+    """
+    old_keys = pd.Series(list(zip(old["side"], old["team"])), index=old.index)
+    kept = old[~old_keys.isin(changed)]
+    merged = pd.concat([kept, fresh], ignore_index=True)
+    block_latest = merged.groupby(["side", "team"], sort=False)["latest_date"].transform("max")
+    merged = merged.assign(_side=(merged["side"] != "home").astype(int), _latest=block_latest)
+    merged = merged.sort_values(by=["_side", "_latest", "team"], ascending=[True, False, True], kind="mergesort")
+    return merged[OUTPUT_COLUMNS].reset_index(drop=True)
+
+def _rebuild_full(files: list[str], file_sigs: dict):
+    df_all = load_understat(DATA_DIR, files)
+    win_data = compute_form_rows(df_all)
+    storage.write_win_data(win_data, DATA_DIR)
+    _save_state(file_sigs, _team_digests(df_all))
+    print(f"✅ สร้างไฟล์ win_data เรียบร้อยแล้ว → {OUTPUT_FILE}")
+
+def generate_win_data(full: bool = False):
+    """
+    ค่าเริ่มต้นเป็น incremental: คำนวณใหม่เฉพาะทีมที่แถวในไฟล์ Understat เปลี่ยน
+    แล้ว splice เข้า win_data เดิม; full=True หรือไม่มี state/ไฟล์ผลลัพธ์ → สร้างใหม่ทั้งหมด
+    """
+    files = list_understat_files(DATA_DIR)
+    state = None if full else _load_state()
+    prev_files = (state or {}).get("files", {})
+    file_sigs = {f: _file_signature(os.path.join(DATA_DIR, f), prev_files.get(f)) for f in files}
+
+    if state is None or not os.path.exists(OUTPUT_FILE) or set(prev_files) - set(files):
+        _rebuild_full(files, file_sigs)
+        return
+
+    changed_files = [f for f in files if file_sigs[f]["sha1"] != prev_files.get(f, {}).get("sha1")]
+    if not changed_files:
+        _save_state(file_sigs, state["teams"])
+        print(f"⏭ understat ไม่มีข้อมูลใหม่ — ใช้ win_data เดิม → {OUTPUT_FILE}")
+        return
+
+    # หาทีมที่ digest ในไฟล์ที่เปลี่ยนต่างจากเดิม (รวมทีมใหม่/ทีมที่แถวหายไป)
+    old_teams = state["teams"]
+    new_partial = _team_digests(load_understat(DATA_DIR, changed_files))
+    changed: set = set()
+    for side in ("home", "away"):
+        names = set(old_teams.get(side, {})) | set(new_partial.get(side, {}))
+        for team in names:
+            old_f = old_teams.get(side, {}).get(team, {}).get("files", {})
+            new_f = new_partial.get(side, {}).get(team, {}).get("files", {})
+            if any(old_f.get(src) != new_f.get(src) for src in changed_files):
+                changed.add((side, team))
+
+    teams = {side: dict(v) for side, v in old_teams.items()}
+    if changed:
+        # โหลดทุกไฟล์ที่ทีมเหล่านี้มีแถวอยู่ (ปกติคือไฟล์ลีกเดียว)
+        need = set(changed_files)
+        for side, team in changed:
+            need |= set(old_teams.get(side, {}).get(team, {}).get("files", {}))
+        need_files = [f for f in files if f in need]
+        df_need = load_understat(DATA_DIR, need_files)
+        side_of = df_need["h_a"].map({"h": "home", "a": "away"})
+        mask = pd.Series(list(zip(side_of, df_need["team"])), index=df_need.index).isin(changed)
+        df_need = df_need[mask.to_numpy()]
+
+        fresh = compute_form_rows(df_need)
+        old = storage.read_win_data(DATA_DIR)
+        win_data = _splice(old, fresh, changed)
+        storage.write_win_data(win_data, DATA_DIR)
+
+        fresh_digests = _team_digests(df_need) if len(df_need) else {}
+        for side, team in changed:
+            entry = fresh_digests.get(side, {}).get(team)
+            if entry:
+                teams.setdefault(side, {})[team] = entry
+            else:
+                teams.get(side, {}).pop(team, None)
+
+    _save_state(file_sigs, teams)
+    print(f"✅ อัปเดต win_data แบบ incremental ({len(changed)} ทีม/ฝั่ง จาก {len(changed_files)} ไฟล์) → {OUTPUT_FILE}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="rebuild win_data ทั้งหมด (ไม่ใช้ state)")
+    args = ap.parse_args()
+    generate_win_data(full=args.full)